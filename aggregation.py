@@ -0,0 +1,222 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+from database import (
+    get_tables_for_timerange,
+    get_partition_version,
+    is_closed_partition,
+    get_rollup_source,
+    build_partition_bucket_query,
+    build_rollup_bucket_query,
+    get_table_bounds
+)
+
+# Laad environment variabelen
+load_dotenv()
+logger = logging.getLogger(__name__)
+QUERY_MEMORY_BUDGET_MB = int(os.getenv('QUERY_MEMORY_BUDGET_MB', '64'))
+
+if QUERY_MEMORY_BUDGET_MB < 1:
+    logger.warning("QUERY_MEMORY_BUDGET_MB moet minimaal 1 zijn (%s), gebruik 1", QUERY_MEMORY_BUDGET_MB)
+    QUERY_MEMORY_BUDGET_MB = 1
+
+MEMORY_BUDGET_BYTES = QUERY_MEMORY_BUDGET_MB * 1024 * 1024
+
+# Bewaartijd van aggregaten in de gedeelde (disk) cache
+SHARED_CACHE_EXPIRE = 7 * 86400  # seconden
+
+
+class PartitionAggregateCache:
+    """LRU cache voor bucket aggregaten van afgesloten partities, begrensd op geheugengebruik
+    
+    Optioneel met een gedeelde diskcache (shared) als tweede niveau, zodat background callback
+    processen de aggregaten van elkaar kunnen hergebruiken.
+    """
+
+    def __init__(self, budget_bytes):
+        self.budget_bytes = budget_bytes
+        self.shared = None
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._size = 0
+
+    def get(self, key):
+        with self._lock:
+            partial = self._entries.get(key)
+            if partial is not None:
+                self._entries.move_to_end(key)
+                return partial
+        if self.shared is not None:
+            partial = self.shared.get(('partition-aggregate',) + key)
+            if partial is not None:
+                self._store(key, partial)
+        return partial
+
+    def put(self, key, partial):
+        self._store(key, partial)
+        if self.shared is not None:
+            self.shared.set(('partition-aggregate',) + key, partial, expire=SHARED_CACHE_EXPIRE)
+
+    def _store(self, key, partial):
+        size = _partial_nbytes(partial)
+        if size > self.budget_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._size -= _partial_nbytes(self._entries.pop(key))
+            self._entries[key] = partial
+            self._size += size
+            while self._size > self.budget_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= _partial_nbytes(evicted)
+
+    def retain_tables(self, table_names):
+        """Verwijder aggregaten van tabellen die niet meer bestaan (retentie, compactie)"""
+        table_names = set(table_names)
+        with self._lock:
+            for key in [key for key in self._entries if key[0] not in table_names]:
+                self._size -= _partial_nbytes(self._entries.pop(key))
+
+
+partition_cache = PartitionAggregateCache(MEMORY_BUDGET_BYTES // 2)
+
+
+def _partial_nbytes(partial):
+    return sum(array.nbytes for array in partial.values())
+
+
+def _partial_from_rows(rows, columns):
+    """Zet rijen uit build_partition_bucket_query om naar een dict met numpy arrays"""
+    data = np.array(rows, dtype=np.float64).reshape(-1, 2 + 4 * len(columns))
+    partial = {'bucket': data[:, 0].astype(np.int64), 'n': data[:, 1]}
+    for i, column in enumerate(columns):
+        offset = 2 + 4 * i
+        partial[f'{column}_sum'] = np.nan_to_num(data[:, offset])
+        partial[f'{column}_n'] = data[:, offset + 1]
+        partial[f'{column}_min'] = data[:, offset + 2]
+        partial[f'{column}_max'] = data[:, offset + 3]
+    return partial
+
+
+def _merge_partials(partials):
+    """Vouw meerdere deelaggregaten samen tot één aggregaat per bucket"""
+    partials = [partial for partial in partials if len(partial['bucket'])]
+    if not partials:
+        return None
+    if len(partials) == 1:
+        return partials[0]
+
+    combined = {key: np.concatenate([partial[key] for partial in partials]) for key in partials[0]}
+    order = np.argsort(combined['bucket'], kind='stable')
+    buckets = combined['bucket'][order]
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+
+    merged = {'bucket': buckets[starts]}
+    for key, values in combined.items():
+        if key == 'bucket':
+            continue
+        values = values[order]
+        if key.endswith('_min'):
+            merged[key] = np.fmin.reduceat(values, starts)
+        elif key.endswith('_max'):
+            merged[key] = np.fmax.reduceat(values, starts)
+        else:
+            merged[key] = np.add.reduceat(values, starts)
+    return merged
+
+
+def _fold_query(cursor, query, columns, chunk_rows):
+    """Voer een bucket query (partitie of rollup tier) uit en haal het resultaat in begrensde stukken op"""
+    cursor.execute(query)
+    running = None
+    while True:
+        rows = cursor.fetchmany(chunk_rows)
+        if not rows:
+            break
+        running = _merge_partials([p for p in (running, _partial_from_rows(rows, columns)) if p is not None])
+    return running if running is not None else _partial_from_rows([], columns)
+
+
+def aggregate_all_buckets(cursor, columns, bucket_seconds):
+    """Bucket aggregaten over de volledige historie, partitie voor partitie samengevouwen
+
+    Afgesloten partities worden één keer geaggregeerd en daarna uit de cache gehaald, zodat per
+    refresh alleen de actieve partitie opnieuw wordt gelezen. Het lopende aggregaat wordt steeds
+    samengevouwen zodra er meer dan een chunk aan deelresultaten klaarligt. Met tiered retentie komt
+    alles vóór de rollup watermark uit de rollup tier en worden alleen nieuwere ruwe rijen gelezen.
+    Resultaat: DataFrame met dezelfde kolommen als build_bucket_query.
+    """
+    tables = get_tables_for_timerange(cursor)
+    partition_cache.retain_tables(tables)
+
+    row_bytes = 8 * (2 + 4 * len(columns))
+    chunk_rows = max(1000, MEMORY_BUDGET_BYTES // 4 // row_bytes)
+    now = time.time()
+
+    running = None
+    pending = []
+    pending_rows = 0
+    cache_hits = 0
+
+    rolled_until = None
+    rollup = get_rollup_source(cursor, bucket_seconds)
+    if rollup is not None:
+        rollup_table, rolled_until = rollup
+        query = build_rollup_bucket_query(cursor, rollup_table, columns, bucket_seconds, None, rolled_until)
+        if query:
+            pending.append(_fold_query(cursor, query, columns, chunk_rows))
+            pending_rows += len(pending[0]['bucket'])
+
+    for table_name in tables:
+        key = None
+        partial = None
+        where_clause = ''
+        if rolled_until is not None:
+            try:
+                table_start, table_end = get_table_bounds(table_name)
+            except ValueError:
+                table_start = table_end = None
+            if table_end is not None and table_end <= rolled_until:
+                continue  # Volledig in de rollup tier
+            if table_start is not None and table_start < rolled_until:
+                where_clause = f' WHERE timestamp >= {rolled_until}'
+        # Alleen afgesloten partities zijn cachebaar; de versie vangt retentie en compactie af
+        if not where_clause and is_closed_partition(table_name, now):
+            key = (table_name, get_partition_version(cursor, table_name), tuple(columns), bucket_seconds)
+            partial = partition_cache.get(key)
+        if partial is not None:
+            cache_hits += 1
+        else:
+            query = build_partition_bucket_query(table_name, columns, bucket_seconds, where_clause)
+            partial = _fold_query(cursor, query, columns, chunk_rows)
+            if key is not None:
+                partition_cache.put(key, partial)
+
+        pending.append(partial)
+        pending_rows += len(partial['bucket'])
+        if pending_rows >= chunk_rows:
+            running = _merge_partials([running] + pending if running is not None else pending)
+            pending, pending_rows = [], 0
+
+    running = _merge_partials([running] + pending if running is not None else pending)
+
+    logger.debug("aggregate_all_buckets: %d tabel(len), %d uit cache, %d buckets",
+                 len(tables), cache_hits, 0 if running is None else len(running['bucket']))
+
+    result_columns = ['bucket', 'count'] + [f'{column}{suffix}' for column in columns for suffix in ('', '_min', '_max')]
+    if running is None:
+        return pd.DataFrame(columns=result_columns)
+
+    result = {'bucket': running['bucket'], 'count': running['n']}
+    with np.errstate(invalid='ignore', divide='ignore'):
+        for column in columns:
+            counts = running[f'{column}_n']
+            result[column] = np.where(counts > 0, running[f'{column}_sum'] / counts, np.nan)
+            result[f'{column}_min'] = running[f'{column}_min']
+            result[f'{column}_max'] = running[f'{column}_max']
+    return pd.DataFrame(result, columns=result_columns)
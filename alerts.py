@@ -0,0 +1,342 @@
+"""Alerting direct vanuit de acquisitie: drempel, rate-of-change en z-score regels per meting
+
+Regels staan in ALERT_RULES, gescheiden door ';', elk als [soort:]<kolom><operator><waarde>[/<venster>]
+met optioneel ',<optie>=<waarde>':
+
+    temperature>28,hysteresis=0.5,delay=2m     drempel, pas na 2 minuten boven 28 en weer weg onder 27.5
+    humidity<30                                drempel
+    rate:temperature>2/10m                     stijging van meer dan 2 °C per 10 minuten
+    rate:humidity<-10/1h                       daling van meer dan 10 %RH per uur
+    zscore:humidity>4/1h                       meting meer dan 4 standaarddeviaties van het gemiddelde (1 uur)
+
+Opties: hysteresis (zelfde eenheid als de waarde), delay (hoe lang de conditie moet aanhouden) en
+holdoff (minimale tijd tussen twee meldingen van dezelfde regel, standaard ALERT_HOLDOFF).
+
+Elke regel houdt alleen een paar getallen bij (EWMA helling, EWMA gemiddelde en variantie), de
+evaluatie kost per meting per regel een paar vergelijkingen. Meldingen (log, file:<pad>,
+webhook:<url>) gaan via een queue naar een eigen thread, zodat de Modbus loop nooit op schijf of
+netwerk wacht.
+"""
+import json
+import logging
+import math
+import operator
+import os
+import queue
+import re
+import threading
+import urllib.request
+from datetime import datetime
+from dotenv import load_dotenv
+from database import DURATION_UNITS
+from metrics import registry
+
+# Laad environment variabelen
+load_dotenv()
+ALERT_RULES = os.getenv('ALERT_RULES', '').strip()
+ALERT_NOTIFY = os.getenv('ALERT_NOTIFY', 'log').strip()
+ALERT_HOLDOFF = int(os.getenv('ALERT_HOLDOFF', '300'))  # seconden
+logger = logging.getLogger(__name__)
+
+if ALERT_HOLDOFF < 0:
+    logger.warning("ALERT_HOLDOFF kan niet negatief zijn (%s), gebruik 0", ALERT_HOLDOFF)
+    ALERT_HOLDOFF = 0
+
+# Rijen zijn (timestamp, temperature, humidity, dewpoint, absolute_humidity), zie modbus_reader
+FIELD_INDEX = {'temperature': 1, 'humidity': 2, 'dewpoint': 3, 'absolute_humidity': 4}
+OPERATORS = {'>': operator.gt, '>=': operator.ge, '<': operator.lt, '<=': operator.le}
+DEFAULT_WINDOWS = {'rate': 600, 'zscore': 3600}  # seconden
+# Z-score: eerst genoeg metingen voor een bruikbaar gemiddelde, en een ondergrens voor de
+# standaarddeviatie (register resolutie), anders geeft een constante reeks bij de eerste stap z = oneindig
+ZSCORE_MIN_SAMPLES = 60
+ZSCORE_MIN_STD = 0.1
+# Wachtende meldingen, daarna vallen nieuwe meldingen weg (en worden geteld)
+NOTIFY_QUEUE_SIZE = 100
+WEBHOOK_TIMEOUT = 5  # seconden
+
+RULE_PATTERN = re.compile(r'^(?:(threshold|rate|zscore):)?([a-z_]+)(>=|<=|>|<)(-?\d+(?:\.\d+)?)(?:/(\d+[smhd]?))?$')
+
+registry.describe('alerts_active', 'gauge', 'Actieve alerts per regel (1 = actief)')
+registry.describe('alerts_notifications_total', 'counter', 'Verstuurde alert meldingen per regel en status')
+registry.describe('alerts_dropped_total', 'counter', 'Meldingen die niet in de queue pasten')
+registry.describe('alerts_notify_errors_total', 'counter', 'Mislukte meldingen per notifier')
+
+
+def _parse_duration(value):
+    """'90', '90s', '10m', '1h' -> seconden"""
+    unit = DURATION_UNITS.get(value[-1:])
+    return int(value[:-1]) * unit if unit else int(value)
+
+
+class Rule:
+    """Drempel op een waarde per meting, met delay, hysteresis en holdoff (basis voor de andere soorten)"""
+    kind = 'threshold'
+    __slots__ = ('name', 'field', 'index', 'op', 'compare', 'threshold', 'clear_threshold', 'window',
+                 'delay', 'holdoff', 'active', 'notified', 'pending_since', 'last_notified', 'metric')
+
+    def __init__(self, name, field, op, threshold, window=None, hysteresis=0.0, delay=0, holdoff=ALERT_HOLDOFF):
+        self.name = name
+        self.field = field
+        self.index = FIELD_INDEX[field]
+        self.op = op
+        self.compare = OPERATORS[op]
+        self.threshold = threshold
+        # Alert is pas voorbij als de waarde de hysteresis aan de andere kant van de drempel passeert
+        self.clear_threshold = threshold - hysteresis if op[0] == '>' else threshold + hysteresis
+        self.window = window
+        self.delay = delay
+        self.holdoff = holdoff
+        self.active = False
+        self.notified = False
+        self.pending_since = None
+        self.last_notified = None
+        self.metric = None
+
+    def measure(self, timestamp, value):
+        """Waarde waarop de drempel wordt toegepast (hier de meting zelf)"""
+        return value
+
+    def update(self, timestamp, value):
+        """Verwerk een meting, geeft 'alert' of 'resolved' bij een te melden overgang, anders None"""
+        metric = self.measure(timestamp, value)
+        self.metric = metric
+        if metric is None:
+            return None
+
+        if not self.active:
+            if not self.compare(metric, self.threshold):
+                self.pending_since = None
+                return None
+            if self.pending_since is None:
+                self.pending_since = timestamp
+            if timestamp - self.pending_since < self.delay:
+                return None
+            self.active = True
+            self.pending_since = None
+            # Holdoff: een regel die blijft klapperen meldt niet bij elke overgang
+            self.notified = self.last_notified is None or timestamp - self.last_notified >= self.holdoff
+            if self.notified:
+                self.last_notified = timestamp
+                return 'alert'
+            return None
+
+        if self.compare(metric, self.clear_threshold):
+            if not self.notified and timestamp - self.last_notified >= self.holdoff:
+                # Onderdrukt door de holdoff maar nog steeds actief: alsnog melden
+                self.notified = True
+                self.last_notified = timestamp
+                return 'alert'
+            return None
+        self.active = False
+        return 'resolved' if self.notified else None
+
+
+class RateRule(Rule):
+    """Verandering per venster: EWMA van de helling (tijdconstante = venster) maal het venster"""
+    kind = 'rate'
+    __slots__ = ('previous_timestamp', 'previous_value', 'slope')
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.previous_timestamp = None
+        self.previous_value = None
+        self.slope = 0.0
+
+    def measure(self, timestamp, value):
+        if self.previous_timestamp is not None:
+            elapsed = timestamp - self.previous_timestamp
+            if elapsed <= 0:
+                return self.slope * self.window
+            alpha = min(1.0, elapsed / self.window)
+            self.slope += alpha * ((value - self.previous_value) / elapsed - self.slope)
+        self.previous_timestamp = timestamp
+        self.previous_value = value
+        return self.slope * self.window
+
+
+class ZScoreRule(Rule):
+    """Afstand tot het EWMA gemiddelde in EWMA standaarddeviaties (|z|), incrementeel bijgewerkt"""
+    kind = 'zscore'
+    __slots__ = ('count', 'mean', 'variance', 'previous_timestamp')
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.count = 0
+        self.mean = 0.0
+        self.variance = 0.0
+        self.previous_timestamp = None
+
+    def measure(self, timestamp, value):
+        self.count += 1
+        if self.count == 1:
+            self.mean = value
+            self.previous_timestamp = timestamp
+            return None
+
+        # Score ten opzichte van de statistiek vóór deze meting
+        score = abs(value - self.mean) / max(math.sqrt(self.variance), ZSCORE_MIN_STD)
+
+        alpha = min(1.0, max(timestamp - self.previous_timestamp, 1) / self.window)
+        self.previous_timestamp = timestamp
+        difference = value - self.mean
+        increment = alpha * difference
+        self.mean += increment
+        self.variance = (1 - alpha) * (self.variance + difference * increment)
+        return score if self.count > ZSCORE_MIN_SAMPLES else None
+
+
+RULE_TYPES = {'threshold': Rule, 'rate': RateRule, 'zscore': ZScoreRule}
+
+
+def parse_rule(text):
+    """'rate:temperature>2/10m,delay=30' -> Rule, ValueError bij een ongeldige regel"""
+    condition, *options = [part.strip() for part in text.strip().lower().split(',')]
+    match = RULE_PATTERN.match(condition)
+    if not match:
+        raise ValueError("verwacht [threshold|rate|zscore:]<kolom><operator><waarde>[/<venster>]")
+    kind, field, op, threshold, window = match.groups()
+    kind = kind or 'threshold'
+    if field not in FIELD_INDEX:
+        raise ValueError(f"onbekende kolom '{field}' (beschikbaar: {', '.join(FIELD_INDEX)})")
+    if kind == 'threshold' and window:
+        raise ValueError('een drempel heeft geen venster')
+    window = _parse_duration(window) if window else DEFAULT_WINDOWS.get(kind)
+    if window is not None and window < 1:
+        raise ValueError('venster moet minimaal 1 seconde zijn')
+
+    settings = {}
+    for option in options:
+        key, _, value = option.partition('=')
+        if key == 'hysteresis':
+            settings[key] = float(value)
+        elif key in ('delay', 'holdoff'):
+            settings[key] = _parse_duration(value)
+        else:
+            raise ValueError(f"onbekende optie '{key}' (hysteresis, delay, holdoff)")
+        if settings[key] < 0:
+            raise ValueError(f'{key} kan niet negatief zijn')
+    return RULE_TYPES[kind](condition, field, op, float(threshold), window, **settings)
+
+
+def parse_rules(setting):
+    """ALERT_RULES -> lijst met regels, ongeldige regels worden met een waarschuwing overgeslagen"""
+    rules = []
+    for text in setting.split(';'):
+        if not text.strip():
+            continue
+        try:
+            rules.append(parse_rule(text))
+        except ValueError as e:
+            logger.warning("Ongeldige alert regel '%s' (%s), overgeslagen", text.strip(), e)
+    return rules
+
+
+def _notify_log(event):
+    level = logging.WARNING if event['state'] == 'alert' else logging.INFO
+    logger.log(level, "Alert %s: %s op %s", event['state'], event['rule'], event['device'], extra={'fields': event})
+
+
+def _file_notifier(path):
+    def notify(event):
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(event) + '\n')
+    return notify
+
+
+def _webhook_notifier(url):
+    def notify(event):
+        request = urllib.request.Request(url, data=json.dumps(event).encode('utf-8'),
+                                         headers={'Content-Type': 'application/json'}, method='POST')
+        with urllib.request.urlopen(request, timeout=WEBHOOK_TIMEOUT):
+            pass
+    return notify
+
+
+def parse_notifiers(setting):
+    """'log,file:alerts.jsonl,webhook:http://127.0.0.1:8123/hook' -> [(naam, functie)]"""
+    notifiers = []
+    for entry in setting.split(','):
+        entry = entry.strip()
+        kind, _, target = entry.partition(':')
+        if kind == 'log':
+            notifiers.append(('log', _notify_log))
+        elif kind == 'file' and target:
+            notifiers.append(('file', _file_notifier(target)))
+        elif kind == 'webhook' and target:
+            notifiers.append(('webhook', _webhook_notifier(target)))
+        elif entry:
+            logger.warning("Onbekende ALERT_NOTIFY '%s' (verwacht: log, file:<pad>, webhook:<url>), overgeslagen", entry)
+    return notifiers
+
+
+class AlertDispatcher:
+    """Verstuurt meldingen vanuit een eigen thread (gestart bij de eerste melding)"""
+
+    def __init__(self, notifiers):
+        self.notifiers = notifiers
+        self._queue = queue.Queue(maxsize=NOTIFY_QUEUE_SIZE)
+        self._thread = None
+
+    def submit(self, event):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='alert-notifier', daemon=True)
+            self._thread.start()
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            registry.inc('alerts_dropped_total')
+
+    def _run(self):
+        while True:
+            event = self._queue.get()
+            for name, notify in self.notifiers:
+                try:
+                    notify(event)
+                except Exception as e:
+                    registry.inc('alerts_notify_errors_total', notifier=name)
+                    logger.warning("Alert melding via %s mislukt: %s", name, e)
+
+
+class AlertEngine:
+    """Evalueert alle regels voor één apparaat, aangeroepen met elke geldige meting"""
+
+    def __init__(self, rules, dispatcher, device):
+        self.rules = rules
+        self.dispatcher = dispatcher
+        self.device = device
+
+    def evaluate(self, row):
+        """row: (timestamp, temperature, humidity, dewpoint, absolute_humidity)"""
+        timestamp = row[0]
+        for rule in self.rules:
+            state = rule.update(timestamp, row[rule.index])
+            if state is not None:
+                self._emit(rule, state, timestamp, row[rule.index])
+
+    def _emit(self, rule, state, timestamp, measurement):
+        registry.set('alerts_active', int(rule.active), rule=rule.name, device=self.device)
+        registry.inc('alerts_notifications_total', rule=rule.name, state=state, device=self.device)
+        self.dispatcher.submit({
+            'rule': rule.name,
+            'kind': rule.kind,
+            'state': state,
+            'device': self.device,
+            'field': rule.field,
+            'value': round(rule.metric, 3),
+            'threshold': rule.threshold,
+            'measurement': measurement,
+            'timestamp': timestamp,
+            'time': datetime.fromtimestamp(timestamp).isoformat(timespec='seconds')
+        })
+
+
+def create_alert_engine(device, rules_setting=None, notify_setting=None):
+    """AlertEngine voor ALERT_RULES / ALERT_NOTIFY (of de meegegeven waarden), None zonder regels"""
+    rules = parse_rules(ALERT_RULES if rules_setting is None else rules_setting)
+    if not rules:
+        return None
+    notifiers = parse_notifiers(ALERT_NOTIFY if notify_setting is None else notify_setting)
+    if not notifiers:
+        logger.warning("ALERT_RULES zonder geldige ALERT_NOTIFY, meldingen gaan naar de log")
+        notifiers = [('log', _notify_log)]
+    return AlertEngine(rules, AlertDispatcher(notifiers), device)
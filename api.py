@@ -0,0 +1,335 @@
+"""Versioned JSON API voor integraties: /api/v1/measurements
+
+Parameters (allemaal optioneel):
+- start, end: epoch seconden of ISO 8601 (zonder offset = lokale tijd, TIMEZONE), tot MAX_TIMESTAMP;
+  standaard het laatste uur
+- resolution: 'raw' (bewaarde metingen), 'auto' (zelfde bucket keuze als de grafieken) of een bucket
+  grootte in seconden of met eenheid ('300', '5m', '1h', '1d'), hooguit MAX_RESOLUTION
+- fields: komma gescheiden kolommen (standaard alle)
+- limit: maximaal aantal rijen/buckets per pagina (standaard en maximaal API_PAGE_SIZE)
+- cursor: next_cursor van de vorige pagina
+
+Pagineren gaat met een keyset op timestamp: per partitie (oplopend, zie get_tables_for_timerange)
+één geïndexeerde range query met LIMIT, en stoppen zodra de pagina vol is. Buckets worden per
+pagina over een vast tijdvenster geaggregeerd (build_bucket_query, dus ook uit de rollup tiers).
+
+Elke response krijgt een ETag uit de partitie versies (en rollup watermark) van het venster, plus
+Last-Modified. Vensters die volledig in het verleden liggen mogen door HTTP caches bewaard worden
+(Cache-Control max-age), de rest wordt steeds gevalideerd; een gelijke ETag geeft 304 zonder query.
+"""
+import base64
+import binascii
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+from datetime import datetime, timezone
+from urllib.parse import urlencode
+from flask import Blueprint, Response, jsonify, request
+from dotenv import load_dotenv
+from database import (DB_FILE, DURATION_UNITS, CLOSED_PARTITION_GRACE, get_tables_for_timerange, get_table_bounds,
+                      get_partition_version, get_rollup_source, get_latest_measurement, build_bucket_query,
+                      get_bucket_seconds)
+from timeutils import LOCAL_ZONE, to_local_epoch, utc_offset
+from compression import INGEST_COMPRESSION, MEASUREMENT_COLUMNS
+from metrics import track_query
+
+# Laad environment variabelen
+load_dotenv()
+logger = logging.getLogger(__name__)
+API_ENABLED = os.getenv('API_ENABLED', 'True').lower() == 'true'
+API_PAGE_SIZE = int(os.getenv('API_PAGE_SIZE', '5000'))  # Maximaal aantal rijen per pagina
+API_CACHE_MAX_AGE = int(os.getenv('API_CACHE_MAX_AGE', '86400'))  # seconden, voor vensters in het verleden
+
+if API_PAGE_SIZE < 1:
+    logger.warning("API_PAGE_SIZE moet minimaal 1 zijn (%s), gebruik 1", API_PAGE_SIZE)
+    API_PAGE_SIZE = 1
+
+API_PREFIX = '/api/v1'
+FIELDS = ['temperature', 'humidity', 'dewpoint', 'absolute_humidity']
+DEFAULT_RANGE_SECONDS = 3600
+# Afronding van bucket gemiddelden (ruwe metingen gaan ongewijzigd door)
+AVERAGE_DECIMALS = 3
+# Grenzen voor start/end en resolution, zodat elke bucketgrens nog een geldige datetime is
+MAX_TIMESTAMP = int(datetime(9000, 1, 1, tzinfo=timezone.utc).timestamp())
+MAX_RESOLUTION = 366 * 86400  # seconden
+
+
+class ApiError(ValueError):
+    """Ongeldige request parameter, wordt een 400 response"""
+
+
+def _parse_time(name, value, default):
+    if value is None or value == '':
+        return default
+    try:
+        timestamp = int(float(value))
+    except (ValueError, OverflowError):  # OverflowError: 'inf', '1e400'
+        try:
+            moment = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except ValueError:
+            raise ApiError(f"{name} moet epoch seconden of ISO 8601 zijn: '{value}'")
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=LOCAL_ZONE)
+        timestamp = int(moment.timestamp())
+    if not 0 <= timestamp <= MAX_TIMESTAMP:
+        raise ApiError(f"{name} valt buiten het ondersteunde bereik (0 tot {MAX_TIMESTAMP}): '{value}'")
+    return timestamp
+
+
+def _parse_resolution(value, start, end):
+    """Bucket grootte in seconden, None = ruwe metingen"""
+    value = (value or 'auto').strip().lower()
+    if value == 'raw':
+        return None
+    if value == 'auto':
+        return get_bucket_seconds(max(1, (end - start) // 60))
+    unit = DURATION_UNITS.get(value[-1:])
+    try:
+        seconds = int(value[:-1]) * unit if unit else int(value)
+    except ValueError:
+        raise ApiError(f"resolution moet 'raw', 'auto' of een duur zijn (bijv. 300, 5m, 1h): '{value}'")
+    if not 1 <= seconds <= MAX_RESOLUTION:
+        raise ApiError(f'resolution moet tussen 1 en {MAX_RESOLUTION} seconden liggen')
+    return seconds
+
+
+def _parse_fields(value):
+    if not value:
+        return list(FIELDS)
+    fields = [field.strip() for field in value.split(',') if field.strip()]
+    unknown = [field for field in fields if field not in FIELDS]
+    if unknown or not fields:
+        raise ApiError(f"Onbekende fields: {', '.join(unknown) or value} (beschikbaar: {', '.join(FIELDS)})")
+    return list(dict.fromkeys(fields))
+
+
+def encode_cursor(kind, timestamp):
+    """Opaque cursor: 'after' (ruw, exclusief) of 'from' (buckets, inclusief) plus timestamp"""
+    payload = json.dumps({kind: int(timestamp)}, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip('=')
+
+
+def decode_cursor(value, kind):
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(value + '=' * (-len(value) % 4)))
+        return int(payload[kind])
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        raise ApiError('Ongeldige cursor (hoort bij een andere resolution of is beschadigd)')
+
+
+def parse_request(args):
+    """Request parameters -> dict met start, end, bucket_seconds, fields, limit en page_start"""
+    now = int(time.time())
+    end = _parse_time('end', args.get('end'), now)
+    start = _parse_time('start', args.get('start'), end - DEFAULT_RANGE_SECONDS)
+    if start > end:
+        raise ApiError('start ligt na end')
+
+    try:
+        limit = min(int(args.get('limit', API_PAGE_SIZE)), API_PAGE_SIZE)
+    except ValueError:
+        raise ApiError(f"limit moet een geheel getal zijn: '{args.get('limit')}'")
+    if limit < 1:
+        raise ApiError('limit moet minimaal 1 zijn')
+
+    bucket_seconds = _parse_resolution(args.get('resolution'), start, end)
+    cursor_value = args.get('cursor')
+    if bucket_seconds is None:
+        # Ruw: cursor is de laatst geleverde timestamp, de pagina begint erna
+        page_start = decode_cursor(cursor_value, 'after') + 1 if cursor_value else start
+    else:
+        page_start = decode_cursor(cursor_value, 'from') if cursor_value else start
+    if page_start < start or page_start > end + 1:
+        raise ApiError('cursor valt buiten [start, end]')
+
+    return {
+        'start': start,
+        'end': end,
+        'bucket_seconds': bucket_seconds,
+        'fields': _parse_fields(args.get('fields')),
+        'limit': limit,
+        'page_start': page_start,
+        'now': now
+    }
+
+
+def _partitions_in_range(cursor, start, end):
+    """Partities die [start, end] overlappen, oplopend in tijd: [(tabel, begin, eind)]"""
+    partitions = []
+    for table_name in get_tables_for_timerange(cursor, start, end):
+        try:
+            table_start, table_end = get_table_bounds(table_name)
+        except ValueError:
+            continue
+        # get_tables_for_timerange valt zonder overlap terug op alle tabellen
+        if table_end > start and table_start <= end:
+            partitions.append((table_name, table_start, table_end))
+    return sorted(partitions, key=lambda partition: partition[1])
+
+
+def _bucket_page_end(params):
+    """Eind (inclusief) van het tijdvenster van een bucket pagina: limit buckets, uitgelijnd op lokale tijd"""
+    bucket_seconds = params['bucket_seconds']
+    boundary = params['page_start'] + params['limit'] * bucket_seconds
+    if boundary > params['end'] + bucket_seconds:
+        return params['end']  # Uitgelijnd valt de grens ook na end
+    boundary -= to_local_epoch(boundary) % bucket_seconds
+    return min(params['end'], boundary - 1)
+
+
+def compute_etag(cursor, params, partitions, latest=None):
+    """ETag uit de parameters en de versies van de partities (en rollup tier) in het venster, plus de
+    timestamp van de nog niet bewaarde laatste meting als die op de pagina komt (zie read_raw_page)"""
+    state = [request.full_path, params['end'], params['page_start'], INGEST_COMPRESSION]
+    state += [(table_name, get_partition_version(cursor, table_name)) for table_name, _, _ in partitions]
+    if params['bucket_seconds'] is not None:
+        state.append(get_rollup_source(cursor, params['bucket_seconds']))
+    elif latest is not None:
+        state.append(latest[0])
+    return hashlib.sha1(repr(state).encode()).hexdigest()
+
+
+def _etag_matches(etag):
+    """If-None-Match, ook als Flask-Compress er ':gzip' (of ':br') aan heeft toegevoegd"""
+    if_none_match = request.if_none_match
+    if if_none_match.star_tag:
+        return True
+    return any(tag.split(':', 1)[0] == etag for tag in if_none_match.as_set())
+
+
+def read_raw_page(cursor, params, partitions, latest=None):
+    """Bewaarde metingen vanaf page_start, per partitie met LIMIT tot de pagina vol is
+
+    Metingen met dezelfde timestamp als de laatste rij gaan mee in deze pagina, zodat de cursor
+    (timestamp > laatste) niets overslaat. Met INGEST_COMPRESSION eindigt de laatste pagina van een
+    open venster op latest, de laatste meting van de Modbus thread die nog niet bewaard hoeft te zijn.
+    """
+    columns = ', '.join(['timestamp'] + params['fields'])
+    limit = params['limit']
+    rows = []
+    last_table = None
+    for table_name, _, _ in partitions:
+        remaining = limit - len(rows)
+        if remaining <= 0:
+            break
+        rows += cursor.execute(
+            f'SELECT {columns} FROM {table_name} WHERE timestamp >= ? AND timestamp <= ? '
+            f'ORDER BY timestamp, rowid LIMIT ?', (params['page_start'], params['end'], remaining)
+        ).fetchall()
+        last_table = table_name
+
+    has_more = len(rows) >= limit
+    if has_more:
+        last_timestamp = rows[-1][0]
+        tied = sum(1 for row in rows if row[0] == last_timestamp)
+        rows += cursor.execute(
+            f'SELECT {columns} FROM {last_table} WHERE timestamp = ? ORDER BY rowid LIMIT -1 OFFSET ?', (last_timestamp, tied)
+        ).fetchall()
+        has_more = last_timestamp < params['end']
+
+    if not has_more and latest is not None and params['page_start'] <= latest[0] <= params['end'] and \
+            (not rows or latest[0] > rows[-1][0]):
+        values = dict(zip(MEASUREMENT_COLUMNS, latest))
+        rows.append(tuple(values[column] for column in ['timestamp'] + params['fields']))
+
+    data = [dict(zip(['timestamp'] + params['fields'], row)) for row in rows]
+    next_cursor = encode_cursor('after', rows[-1][0]) if has_more else None
+    return data, next_cursor
+
+
+def _bucket_start_utc(bucket, bucket_seconds):
+    """Kolom bucket (lokale epoch / bucket_seconds) -> UTC epoch van het begin van de bucket"""
+    local_start = bucket * bucket_seconds
+    return local_start - utc_offset(local_start - utc_offset(local_start))
+
+
+def read_bucket_page(cursor, params):
+    """Buckets in het venster [page_start, page_end] (gemiddelde, min, max en aantal per veld)"""
+    bucket_seconds = params['bucket_seconds']
+    page_end = _bucket_page_end(params)
+    query, _ = build_bucket_query(cursor, params['fields'], bucket_seconds, params['page_start'], page_end)
+
+    data = []
+    if query:
+        cursor.execute(query)
+        names = [description[0] for description in cursor.description]
+        for row in cursor.fetchall():
+            item = dict(zip(names, row))
+            entry = {'timestamp': _bucket_start_utc(item.pop('bucket'), bucket_seconds), 'count': item.pop('count')}
+            for field in params['fields']:
+                value = item[field]
+                entry[field] = round(value, AVERAGE_DECIMALS) if value is not None else None
+                entry[f'{field}_min'] = item[f'{field}_min']
+                entry[f'{field}_max'] = item[f'{field}_max']
+            data.append(entry)
+
+    next_cursor = encode_cursor('from', page_end + 1) if page_end < params['end'] else None
+    return data, next_cursor
+
+
+def register_api_routes(server):
+    """Registreer de JSON API (/api/v1/...) op de Flask server"""
+    if not API_ENABLED:
+        return
+
+    api = Blueprint('api_v1', __name__, url_prefix=API_PREFIX)
+
+    @api.errorhandler(ApiError)
+    def bad_request(error):
+        return jsonify({'error': str(error)}), 400
+
+    @api.route('/measurements')
+    def measurements():
+        params = parse_request(request.args)
+        window_end = params['end'] if params['bucket_seconds'] is None else _bucket_page_end(params)
+        # Het venster verandert niet meer als het eind voorbij is (plus de laatste batch commit)
+        closed = window_end + CLOSED_PARTITION_GRACE < params['now']
+
+        conn = sqlite3.connect(DB_FILE)
+        try:
+            cursor = conn.cursor()
+            partitions = _partitions_in_range(cursor, params['page_start'], window_end)
+            latest = None if closed else get_latest_measurement(cursor)
+            # Gecomprimeerde opslag loopt achter: de laatste meting komt los mee (zie read_raw_page)
+            unstored = latest if INGEST_COMPRESSION != 'off' and params['bucket_seconds'] is None else None
+            etag = compute_etag(cursor, params, partitions, unstored)
+            if closed:
+                last_modified = window_end
+            else:
+                last_modified = min(window_end, latest[0]) if latest else params['now']
+
+            if _etag_matches(etag):
+                response = Response(status=304)
+            else:
+                with track_query('api') as tracked:
+                    if params['bucket_seconds'] is None:
+                        data, next_cursor = read_raw_page(cursor, params, partitions, unstored)
+                    else:
+                        data, next_cursor = read_bucket_page(cursor, params)
+                    tracked.rows = len(data)
+                response = jsonify({
+                    'start': params['start'],
+                    'end': params['end'],
+                    'resolution': params['bucket_seconds'] or 'raw',
+                    'fields': params['fields'],
+                    'compression': INGEST_COMPRESSION,
+                    'count': len(data),
+                    'data': data,
+                    'next_cursor': next_cursor
+                })
+                if next_cursor:
+                    args = request.args.to_dict()
+                    args['cursor'] = next_cursor
+                    response.headers['Link'] = f'<{request.base_url}?{urlencode(args)}>; rel="next"'
+        finally:
+            conn.close()
+
+        response.set_etag(etag)
+        response.last_modified = datetime.fromtimestamp(last_modified, timezone.utc)
+        response.headers['Cache-Control'] = f'public, max-age={API_CACHE_MAX_AGE}' if closed else 'no-cache'
+        return response
+
+    server.register_blueprint(api)
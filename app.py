@@ -1,62 +1,166 @@
-﻿from dash import Dash
-from waitress import serve
+﻿"""Entry point: de poort gaat direct open, de rest van de app start in de achtergrond
+
+Waitress luistert al voordat pandas, plotly en Dash geïmporteerd zijn en voordat de database
+initialisatie klaar is; tot dan antwoordt startup.StartupGate (503, plus /healthz en /ready).
+Retentie cleanup (met VACUUM), rollups en compactie lopen daarna in de onderhoudsthread.
+
+Het WSGI object is `server` (bijv. waitress-serve app:server). Zonder main() start de
+initialisatie bij de eerste request, laat een health check dus direct na het starten /healthz aanroepen.
+"""
+import time
+STARTED = time.perf_counter()
+
 import logging
+import os
+import sys
+from dotenv import load_dotenv
+from waitress.server import create_server
+from startup import StartupGate, HEALTH_PATH, READY_PATH
+from logutils import setup_logging, stop_logging
+from stream import LIVE_STREAM_ENABLED, LIVE_STREAM_MAX_CLIENTS
+
+# Laad environment variabelen
+load_dotenv()
+HOST = os.getenv('APP_HOST', '0.0.0.0')
+PORT = int(os.getenv('APP_PORT', '8050'))
 
-# Import modules
-from database import init_database, cleanup_old_data, DATA_RETENTION_DAYS
-from modbus_reader import start_modbus_thread
-from layout import create_layout, HTML_TEMPLATE
-from callbacks import register_callbacks
+# Response compressie (gzip/brotli) voor callback responses, vereist Flask-Compress
+ENABLE_COMPRESSION = os.getenv('ENABLE_COMPRESSION', 'True').lower() == 'true'
 
 # Zet Waitress logging op ERROR niveau (onderdruk warnings)
 logging.getLogger('waitress').setLevel(logging.ERROR)
+# Vaste naam, ook als app.py als __main__ draait
+logger = logging.getLogger('app')
 
-# Initialiseer database
-print("=== XY-MD02 WebApp Startup ===")
-init_database()
 
-# Voer cleanup uit (indien retention policy actief)
-if DATA_RETENTION_DAYS > 0:
-    cleanup_old_data()
+def create_app():
+    """Bouw de Dash app met layout, callbacks en extra routes (de zware imports zitten hier)"""
+    global ENABLE_COMPRESSION
+    from dash import Dash
+    from layout import create_layout, HTML_TEMPLATE
+    from callbacks import register_callbacks
+    from background import background_manager
+    from stream import register_stream_routes
+    from metrics import register_metrics_routes, METRICS_ENABLED
+    from api import register_api_routes, API_ENABLED, API_PREFIX
 
-# Start Modbus thread
-modbus_thread = start_modbus_thread()
+    if ENABLE_COMPRESSION:
+        try:
+            import flask_compress  # noqa: F401
+        except ImportError:
+            logger.warning("ENABLE_COMPRESSION=True maar Flask-Compress is niet geïnstalleerd, compressie uitgeschakeld")
+            ENABLE_COMPRESSION = False
 
-# Dash app initialisatie
-print("→ Initialiseren Dash applicatie...")
-app = Dash(__name__, title="XY-MD02 Temperature & Humidity Monitor")
-server = app.server
-app.index_string = HTML_TEMPLATE
-print("✓ Dash applicatie geïnitialiseerd")
+    # Dash app initialisatie
+    logger.info("Initialiseren Dash applicatie...")
+    app = Dash(__name__, title="XY-MD02 Temperature & Humidity Monitor", compress=ENABLE_COMPRESSION,
+               background_callback_manager=background_manager)
+    server = app.server
+    app.index_string = HTML_TEMPLATE
+    logger.info("Dash applicatie geïnitialiseerd (compressie: %s, background callbacks: %s)",
+                'aan' if ENABLE_COMPRESSION else 'uit', 'aan' if background_manager is not None else 'uit')
 
-# Layout instellen
-print("→ Layout configureren...")
-app.layout = create_layout()
-print("✓ Layout geconfigureerd")
+    # Layout instellen
+    logger.info("Layout configureren...")
+    app.layout = create_layout()
+    logger.info("Layout geconfigureerd")
 
-# Callbacks registreren
-print("→ Callbacks registreren...")
-register_callbacks(app)
-print("✓ Callbacks geregistreerd")
+    # Callbacks registreren
+    logger.info("Callbacks registreren...")
+    register_callbacks(app)
+    logger.info("Callbacks geregistreerd")
 
-# Main entry point
-if __name__ == '__main__':
-    print("\n=== Server wordt gestart ===")
-    print("→ Waitress WSGI server starten op 0.0.0.0:8050...")
-    print("✓ Server actief - Open browser op: http://127.0.0.1:8050")
-    print("Druk CTRL+C om te stoppen\n")
+    # Live stream endpoint (Server-Sent Events)
+    register_stream_routes(server)
+    if LIVE_STREAM_ENABLED:
+        logger.info("Live stream actief op /stream (max %d clients)", LIVE_STREAM_MAX_CLIENTS)
+
+    # Performance metrics (JSON en Prometheus)
+    register_metrics_routes(server)
+    if METRICS_ENABLED:
+        logger.info("Performance metrics actief op /debug/perf en /metrics")
+
+    # JSON API voor integraties
+    register_api_routes(server)
+    if API_ENABLED:
+        logger.info("JSON API actief op %s/measurements", API_PREFIX)
+
+    return app
+
+
+def initialize(gate):
+    """Achtergrond initialisatie: database, Modbus thread en Dash app, daarna het onderhoud"""
+    # Ook als een andere WSGI server het module importeert (main() heeft dit dan niet gedaan)
+    setup_logging()
+    try:
+        with gate.phase('database'):
+            from database import init_database, start_maintenance_thread, DATA_RETENTION_DAYS
+            init_database()
+
+        # Start Modbus thread
+        with gate.phase('modbus'):
+            from modbus_reader import start_modbus_thread
+            start_modbus_thread()
+
+        with gate.phase('dash'):
+            app = create_app()
+
+        from metrics import registry
+        registry.describe('startup_seconds', 'gauge', 'Duur van de opstartfasen in seconden')
+        gate.set_ready(app.server)
+        for phase, seconds in gate.status()['startup'].items():
+            registry.set('startup_seconds', seconds, phase=phase)
+        logger.info("App klaar na %.1fs (database %.1fs, Modbus %.1fs, Dash %.1fs)", gate.phases['ready'],
+                    gate.phases['database'], gate.phases['modbus'], gate.phases['dash'])
+
+        # Retentie cleanup (met VACUUM), rollups en compactie pas als de app al antwoordt
+        start_maintenance_thread(cleanup=DATA_RETENTION_DAYS > 0)
+    except Exception as e:
+        gate.set_failed(e)
+        logger.error("FOUT bij opstarten: %s", e, exc_info=True)
+        stop_logging()
+        sys.stdout.flush()
+        sys.stderr.flush()
+        # Zelfde gedrag als een fout vóór het starten van de server: proces stopt (service manager herstart)
+        os._exit(1)
+
+
+# WSGI callable: /healthz en /ready direct, de Dash app zodra initialize() klaar is
+server = StartupGate(STARTED, initializer=initialize)
+
+
+def main():
+    # Logging via een queue en listener thread (zie logutils.py), vóór de eerste threads starten
+    setup_logging()
+    logger.info("=== XY-MD02 WebApp Startup ===")
+    gate = server
     
+    # Eerst de poort openen: /healthz en /ready antwoorden direct, de rest 503 tot de app klaar is
+    # Verhoog threads en channel_timeout voor Dash's frequente callbacks
+    wsgi_server = create_server(
+        gate,
+        host=HOST,
+        port=PORT,
+        # Meer threads voor concurrent requests, plus één per open live stream verbinding
+        threads=8 + (LIVE_STREAM_MAX_CLIENTS if LIVE_STREAM_ENABLED else 0),
+        channel_timeout=60,           # Timeout voor idle connections
+        cleanup_interval=10,          # Cleanup interval voor oude connections
+        asyncore_use_poll=True        # Betere performance op Windows
+    )
+    gate.mark('listening')
+    logger.info("Waitress luistert op %s:%s na %.2fs (%s en %s beschikbaar, app wordt geladen)",
+                HOST, PORT, gate.phases['listening'], HEALTH_PATH, READY_PATH)
+    
+    gate.start()
+    
+    logger.info("Server actief - Open browser op: http://127.0.0.1:%s (CTRL+C om te stoppen)", PORT)
     try:
         # Gebruik Waitress production server (cross-platform)
-        # Verhoog threads en channel_timeout voor Dash's frequente callbacks
-        serve(
-            server, 
-            host='0.0.0.0', 
-            port=8050, 
-            threads=8,                    # Meer threads voor concurrent requests
-            channel_timeout=60,           # Timeout voor idle connections
-            cleanup_interval=10,          # Cleanup interval voor oude connections
-            asyncore_use_poll=True        # Betere performance op Windows
-        )
+        wsgi_server.run()
     except KeyboardInterrupt:
-        print("\n\n=== Server gestopt ===")
+        logger.info("=== Server gestopt ===")
+
+
+# Main entry point
+if __name__ == '__main__':
+    main()
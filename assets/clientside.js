@@ -0,0 +1,369 @@
+/*
+ * Clientside callbacks voor de XY-MD02 WebApp.
+ *
+ * Deze functies draaien volledig in de browser: de historische slider verplaatst
+ * alleen de marker trace van het Mollier diagram op basis van de (base64 gecodeerde)
+ * arrays die al in 'historical-data-store' staan, zonder round trip naar de server.
+ *
+ * De live stream (Server-Sent Events op /stream) zet elke nieuwe meting in
+ * 'live-sample-store'; de 'live' callbacks verwerken die lokaal in de cards, de
+ * Mollier marker en de grafiek, zodat polling uit kan zolang de verbinding open is.
+ */
+(function () {
+    'use strict';
+
+    // Moeten gelijk zijn aan MARKER_UID en DENSITY_UID in psychrometric.py
+    var MARKER_UID = 'condition-marker';
+    var DENSITY_UID = 'density-overlay';
+
+    // Aantal frames voor een volledige time-lapse (100 ms per frame = ~60 seconden)
+    var PLAYBACK_FRAMES = 600;
+
+    // Live stream endpoint (stream.py) en wachttijd na een geweigerde verbinding
+    var LIVE_STREAM_URL = '/stream';
+    var LIVE_RETRY_DELAY = 30000;
+
+    // Grafieken tot en met 60 minuten tonen ruwe punten (zie downsampling in update_graph)
+    var RAW_RANGE_MAX_MINUTES = 60;
+    // Langere bereiken (en 'alle data') ververst update_graph_long (zie LONG_RANGE_MINUTES in callbacks.py)
+    var LONG_RANGE_MINUTES = 1440;
+
+    // Y-as padding per grafiek (temperatuur, vochtigheid, dauwpunt, abs. vochtigheid, comfort), null = vaste as
+    var Y_AXIS_PADDING = [5, null, 5, 2, null];
+
+    // Vochtigheidsratio (g/kg) - zelfde August-Roche-Magnus formule als psychrometric.py
+    function humidityRatio(temp, rh, pressure) {
+        var pws = 611.2 * Math.exp(17.62 * temp / (243.12 + temp));
+        var pw = pws * (rh / 100.0);
+        return 0.622 * pw / (pressure - pw) * 1000;
+    }
+
+    // Humidex comfort classificatie - zelfde grenzen als get_comfort_level in callbacks.py
+    function comfortLevel(temp, humidity) {
+        var dewpointKelvin = temp - ((100 - humidity) / 5.0) + 273.15;
+        var e = 6.11 * Math.exp(5417.7530 * ((1 / 273.16) - (1 / dewpointKelvin)));
+        var humidex = temp + 0.5555 * (e - 10);
+
+        if (humidex < 20) { return {score: 0, icon: '🥶'}; }
+        if (humidex < 27) { return {score: 4, icon: '🙂'}; }
+        if (humidex < 30) { return {score: 5, icon: '😊'}; }
+        if (humidex < 35) { return {score: 6, icon: '✨'}; }
+        if (humidex < 40) { return {score: 3, icon: '😓'}; }
+        if (humidex < 46) { return {score: 2, icon: '😟'}; }
+        if (humidex < 54) { return {score: 1, icon: '🔥'}; }
+        return {score: 0, icon: '⚠️'};
+    }
+
+    var TYPED_ARRAYS = {
+        'f4': Float32Array,
+        'f8': Float64Array,
+        'i4': Int32Array,
+        'u4': Uint32Array,
+        'i2': Int16Array,
+        'u1': Uint8Array
+    };
+
+    // Base64 typed array ({dtype, bdata}) -> TypedArray
+    function decodeTypedArray(encoded) {
+        var binary = window.atob(encoded.bdata);
+        var bytes = new Uint8Array(binary.length);
+        for (var i = 0; i < binary.length; i++) {
+            bytes[i] = binary.charCodeAt(i);
+        }
+        return new TYPED_ARRAYS[encoded.dtype](bytes.buffer);
+    }
+
+    // Trace data (gewone array of typed array spec) -> gewone array, null als er geen array is (x0 + dx)
+    function toPlainArray(values) {
+        if (Array.isArray(values)) {
+            return values;
+        }
+        if (values && values.bdata) {
+            return Array.prototype.slice.call(decodeTypedArray(values));
+        }
+        return null;
+    }
+
+    // Marker trace met dezelfde eigenschappen als get_marker_properties in psychrometric.py
+    function markerTrace(trace, temp, rh, pressure, label) {
+        var w = humidityRatio(temp, rh, pressure);
+        return Object.assign({}, trace, {
+            x: [temp],
+            y: [w],
+            name: label,
+            visible: true,
+            text: [temp.toFixed(1) + '°C<br>' + rh.toFixed(0) + '%'],
+            hovertemplate: label + '<br>T: ' + temp.toFixed(1) + '°C<br>RH: ' + rh.toFixed(0) +
+                '%<br>ω: ' + w.toFixed(1) + ' g/kg<extra></extra>'
+        });
+    }
+
+    // Gedecodeerde store arrays worden hergebruikt zolang de store niet verandert
+    var decodedStore = {source: null};
+
+    function decodeStore(storedData) {
+        if (decodedStore.source !== storedData.temperatures.bdata) {
+            var time = storedData.time;
+            decodedStore = {
+                source: storedData.temperatures.bdata,
+                temperatures: decodeTypedArray(storedData.temperatures),
+                humidities: decodeTypedArray(storedData.humidities),
+                offsets: time.offsets ? decodeTypedArray(time.offsets) : null
+            };
+        }
+        return decodedStore;
+    }
+
+    // Lokale epoch seconden van punt 'index' (start + stap of start + offset)
+    function epochAt(storedData, decoded, index) {
+        var time = storedData.time;
+        return time.start + (decoded.offsets ? decoded.offsets[index] : index * time.step);
+    }
+
+    function pad(value) {
+        return (value < 10 ? '0' : '') + value;
+    }
+
+    // Lokale epoch seconden -> 'dd-mm-YYYY HH:MM:SS' (UTC getters: tijdzone is al op de server toegepast)
+    function formatEpoch(epoch) {
+        var d = new Date(epoch * 1000);
+        return pad(d.getUTCDate()) + '-' + pad(d.getUTCMonth() + 1) + '-' + d.getUTCFullYear() + ' ' +
+            pad(d.getUTCHours()) + ':' + pad(d.getUTCMinutes()) + ':' + pad(d.getUTCSeconds());
+    }
+
+    function triggeredProps() {
+        var ctx = window.dash_clientside.callback_context;
+        return (ctx && ctx.triggered ? ctx.triggered : []).map(function (t) { return t.prop_id; });
+    }
+
+    // Live stream verbinding: elke meting gaat via set_props naar 'live-sample-store'
+    var liveSource = null;
+    var liveConnected = false;
+
+    function setLiveConnected(connected) {
+        if (connected !== liveConnected) {
+            liveConnected = connected;
+            window.dash_clientside.set_props('live-stream-status', {data: {enabled: true, connected: connected}});
+        }
+    }
+
+    function startLiveStream() {
+        if (liveSource || typeof window.EventSource === 'undefined') {
+            return;
+        }
+
+        liveSource = new window.EventSource(LIVE_STREAM_URL);
+        liveSource.onopen = function () {
+            setLiveConnected(true);
+        };
+        liveSource.onmessage = function (event) {
+            window.dash_clientside.set_props('live-sample-store', {data: JSON.parse(event.data)});
+        };
+        liveSource.onerror = function () {
+            // Polling neemt het over; EventSource probeert zelf opnieuw, behalve na een geweigerde verbinding
+            setLiveConnected(false);
+            if (liveSource.readyState === window.EventSource.CLOSED) {
+                liveSource = null;
+                window.setTimeout(startLiveStream, LIVE_RETRY_DELAY);
+            }
+        };
+    }
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        historical: {
+            // Verplaats de marker naar het geselecteerde historische punt
+            update_view: function (sliderValue, dragValue, storedData, figure) {
+                var noUpdate = window.dash_clientside.no_update;
+
+                // Gebruik drag_value alleen als er daadwerkelijk gesleept wordt
+                var index = sliderValue;
+                if (triggeredProps().indexOf('historical-time-slider.drag_value') !== -1 &&
+                        dragValue !== null && dragValue !== undefined) {
+                    index = dragValue;
+                }
+
+                if (!storedData || !figure || !figure.data || index === null || index === undefined) {
+                    return [noUpdate, noUpdate];
+                }
+                if (index < 0 || index >= storedData.count) {
+                    return [noUpdate, noUpdate];
+                }
+
+                var decoded = decodeStore(storedData);
+                var temp = decoded.temperatures[index];
+                var rh = decoded.humidities[index];
+
+                var data = figure.data.map(function (trace) {
+                    if (trace.uid !== MARKER_UID) {
+                        return trace;
+                    }
+                    return markerTrace(trace, temp, rh, storedData.pressure, storedData.marker_label);
+                });
+
+                var display = '📅 ' + formatEpoch(epochAt(storedData, decoded, index));
+                return [display, Object.assign({}, figure, {data: data})];
+            },
+
+            // Vul (of wis) de dichtheid overlay heatmap onder de isolijnen
+            apply_density: function (density, figure) {
+                if (!figure || !figure.data) {
+                    return window.dash_clientside.no_update;
+                }
+
+                var data = figure.data.map(function (trace) {
+                    if (trace.uid !== DENSITY_UID) {
+                        return trace;
+                    }
+                    if (!density) {
+                        return Object.assign({}, trace, {x: [], y: [], z: [], visible: false});
+                    }
+                    return Object.assign({}, trace, {
+                        x: density.x,
+                        y: density.y,
+                        z: density.z,
+                        visible: true,
+                        hovertemplate: trace.name + '<br>T: %{x:.1f}°C<br>ω: %{y:.1f} g/kg<br>%{z:.2f}%<extra></extra>'
+                    });
+                });
+
+                return Object.assign({}, figure, {data: data});
+            },
+
+            // Start/pauzeer de time-lapse
+            toggle_playback: function (nClicks, disabled) {
+                var playing = disabled;  // was gepauzeerd -> nu afspelen
+                return [!playing, playing ? '⏸️' : '▶️'];
+            },
+
+            // Schuif de slider een stap op tijdens de time-lapse
+            advance_playback: function (nIntervals, value, maxValue) {
+                var noUpdate = window.dash_clientside.no_update;
+                if (maxValue === null || maxValue === undefined || maxValue <= 0) {
+                    return [noUpdate, true, '▶️'];
+                }
+
+                var step = Math.max(1, Math.ceil((maxValue + 1) / PLAYBACK_FRAMES));
+                var current = value || 0;
+                var next = current >= maxValue ? 0 : Math.min(current + step, maxValue);
+
+                if (next >= maxValue) {
+                    return [maxValue, true, '▶️'];  // einde bereikt: stop
+                }
+                return [next, false, noUpdate];
+            }
+        },
+
+        live: {
+            // Start de live stream en zet polling uit zolang die verbonden is
+            // Lange bereiken verversen via hun eigen (tragere) interval, de gewone refresh staat dan uit
+            toggle_polling: function (status, timeRange) {
+                var hasRange = timeRange !== null && timeRange !== undefined;
+                var longRange = hasRange && (timeRange === -1 || timeRange > LONG_RANGE_MINUTES);
+                if (!status || !status.enabled) {
+                    return [false, longRange, !longRange];
+                }
+                startLiveStream();
+                if (!status.connected) {
+                    return [false, longRange, !longRange];
+                }
+
+                // Ruwe grafieken worden lokaal aangevuld, gedownsamplede grafieken blijven periodiek verversen
+                var rawWindow = hasRange && timeRange > 0 && timeRange <= RAW_RANGE_MAX_MINUTES;
+                return [true, rawWindow || longRange, !longRange];
+            },
+
+            // Actuele waarden in de cards
+            update_cards: function (sample, labels) {
+                var noUpdate = window.dash_clientside.no_update;
+                if (!sample || !labels) {
+                    return [noUpdate, noUpdate, noUpdate, noUpdate, noUpdate, noUpdate, noUpdate];
+                }
+
+                var comfort = comfortLevel(sample.temperature, sample.humidity);
+                return [
+                    sample.temperature.toFixed(1) + ' °C',
+                    sample.humidity.toFixed(1) + ' %',
+                    sample.dewpoint.toFixed(1) + ' °C',
+                    sample.absolute_humidity.toFixed(1) + ' g/m³',
+                    labels.comfort[comfort.score],
+                    String(comfort.score),
+                    comfort.icon
+                ];
+            },
+
+            // Live marker in het Mollier diagram
+            update_marker: function (sample, labels, figure) {
+                if (!sample || !labels || !figure || !figure.data) {
+                    return window.dash_clientside.no_update;
+                }
+
+                var data = figure.data.map(function (trace) {
+                    if (trace.uid !== MARKER_UID) {
+                        return trace;
+                    }
+                    return markerTrace(trace, sample.temperature, sample.humidity, labels.pressure,
+                        labels.current_condition);
+                });
+                return Object.assign({}, figure, {data: data});
+            },
+
+            // Voeg de meting toe aan de ruwe grafieken en schuif het tijdvenster op
+            extend_graph: function (sample, figure, timeRange) {
+                var noUpdate = window.dash_clientside.no_update;
+                if (!sample || !figure || !figure.data || !timeRange || timeRange < 0 ||
+                        timeRange > RAW_RANGE_MAX_MINUTES) {
+                    return noUpdate;
+                }
+
+                var values = [
+                    sample.temperature,
+                    sample.humidity,
+                    sample.dewpoint,
+                    sample.absolute_humidity,
+                    comfortLevel(sample.temperature, sample.humidity).score
+                ];
+                if (figure.data.length !== values.length) {
+                    return noUpdate;
+                }
+
+                var x = toPlainArray(figure.data[0].x);
+                if (!x || (x.length && sample.local_ms <= x[x.length - 1])) {
+                    return noUpdate;  // regelmatig grid (server ververst) of meting al aanwezig
+                }
+
+                var cutoff = sample.local_ms - timeRange * 60000;
+                var start = 0;
+                while (start < x.length && x[start] < cutoff) {
+                    start++;
+                }
+                var newX = x.slice(start);
+                newX.push(sample.local_ms);
+
+                var data = figure.data.map(function (trace, i) {
+                    var y = (toPlainArray(trace.y) || []).slice(start);
+                    y.push(values[i]);
+                    return Object.assign({}, trace, {x: newX, y: y});
+                });
+
+                // Vergroot de y-as als de nieuwe waarde buiten het huidige bereik valt
+                var layout = Object.assign({}, figure.layout);
+                Y_AXIS_PADDING.forEach(function (padding, i) {
+                    var key = i === 0 ? 'yaxis' : 'yaxis' + (i + 1);
+                    var axis = layout[key];
+                    if (padding === null || !axis || !axis.range) {
+                        return;
+                    }
+                    var range = axis.range;
+                    if (values[i] < range[0] || values[i] > range[1]) {
+                        layout[key] = Object.assign({}, axis, {range: [
+                            Math.min(range[0], Math.max(0, values[i] - padding)),
+                            Math.max(range[1], values[i] + padding)
+                        ]});
+                    }
+                });
+
+                return Object.assign({}, figure, {data: data, layout: layout});
+            }
+        }
+    });
+})();
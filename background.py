@@ -0,0 +1,45 @@
+import logging
+import os
+import tempfile
+from dotenv import load_dotenv
+from aggregation import partition_cache
+from metrics import registry, SHARED_QUEUE_SIZE
+
+# Laad environment variabelen
+load_dotenv()
+BACKGROUND_CALLBACKS = os.getenv('BACKGROUND_CALLBACKS', 'True').lower() == 'true'
+# Standaard buiten de repository: de cache bestaat uit SQLite bestanden die bij elke start veranderen
+BACKGROUND_CACHE_DIR = os.getenv('BACKGROUND_CACHE_DIR') or os.path.join(tempfile.gettempdir(), 'xy-md02-webapp-cache')
+# Hoe lang resultaten van afgeronde jobs bewaard blijven
+BACKGROUND_RESULT_EXPIRE = 600  # seconden
+
+# Zware callbacks (lange tijdsbereiken, historische data) draaien in een apart proces zodat de
+# Waitress request threads vrij blijven voor de live updates. Vereist diskcache, multiprocess en psutil;
+# zonder die packages draaien de callbacks gewoon in de request thread.
+background_manager = None
+logger = logging.getLogger(__name__)
+
+if BACKGROUND_CALLBACKS:
+    try:
+        import diskcache
+        import multiprocess
+        from dash import DiskcacheManager
+        
+        # Alleen met 'fork': bij 'spawn' (Windows, macOS) importeert elke job app.py opnieuw,
+        # inclusief database init en een tweede Modbus thread op dezelfde seriële poort
+        if multiprocess.get_start_method() != 'fork':
+            raise RuntimeError(f"start methode '{multiprocess.get_start_method()}' wordt niet ondersteund")
+        
+        background_cache = diskcache.Cache(BACKGROUND_CACHE_DIR)
+        background_manager = DiskcacheManager(background_cache, expire=BACKGROUND_RESULT_EXPIRE)
+        
+        # Aggregaten van afgesloten dagen delen tussen de worker processen
+        partition_cache.shared = background_cache
+        # Metrics uit de worker processen komen via een queue terug in het hoofdproces
+        registry.shared = diskcache.Deque(directory=os.path.join(BACKGROUND_CACHE_DIR, 'metrics'), maxlen=SHARED_QUEUE_SIZE)
+    except ImportError:
+        logger.warning("BACKGROUND_CALLBACKS=True maar diskcache/multiprocess/psutil zijn niet geïnstalleerd, "
+                       "lange tijdsbereiken, historie en dichtheid overlay draaien synchroon in de request thread")
+    except RuntimeError as e:
+        logger.warning("Background callbacks uitgeschakeld (%s), lange tijdsbereiken, historie en dichtheid overlay "
+                       "draaien synchroon in de request thread", e)
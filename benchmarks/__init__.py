@@ -0,0 +1 @@
+"""Benchmarks en synthetische testdata (zie README, sectie Benchmarks)"""
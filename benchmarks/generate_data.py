@@ -0,0 +1,151 @@
+"""Genereer een synthetische meetreeks (1 Hz) in measurements_YYYYMMDD partities
+
+Gebruik:
+    python -m benchmarks.generate_data --days 365 --db src/benchmark.db
+
+De reeks eindigt nu, zodat de tijdsbereiken van de grafieken ("laatste 24 uur", ...) data vinden.
+Dagen die al in de database staan worden opnieuw gegenereerd (ook maandtabellen die ze overlappen).
+Met --compact worden afgesloten maanden daarna samengevoegd, zoals de app dat doet. Met --compression
+gaan de metingen eerst door dezelfde ingest compressie als in modbus_reader (zie compression.py).
+"""
+import argparse
+import math
+import os
+import sqlite3
+import time
+from datetime import datetime, timedelta
+import numpy as np
+from derived import dewpoint, absolute_humidity
+
+DEFAULT_DB = 'src/benchmark.db'
+INSERT_COLUMNS = '(timestamp, temperature, humidity, dewpoint, absolute_humidity)'
+# Drift: stapgrootte (°C per minuut) en terugtrekking naar 0 per minuut
+DRIFT_STEP = 0.03
+DRIFT_REVERSION = 0.002
+
+
+def generate_day(rng, start_timestamp, end_timestamp, interval, state):
+    """Realistische metingen voor [start, end): dag- en seizoenscyclus, trage drift en sensorruis
+
+    state bevat de drift aan het eind van de vorige dag, zodat de reeks doorloopt over de dagwissel.
+    Waarden zijn afgerond op 0.1 (zoals de registers van de XY-MD02).
+    """
+    timestamps = np.arange(start_timestamp, end_timestamp, interval, dtype=np.int64)
+    n = len(timestamps)
+    if not n:
+        return timestamps, None
+
+    local_start = datetime.fromtimestamp(int(start_timestamp))
+    seconds_of_day = local_start.hour * 3600 + local_start.minute * 60 + local_start.second
+    day_fraction = (timestamps - start_timestamp + seconds_of_day) / 86400
+    year_fraction = local_start.timetuple().tm_yday / 365.25
+
+    # Trage drift per minuut (mean-reverting random walk), doorlopend over de dagen heen
+    minutes = (timestamps - start_timestamp) // 60
+    drift_per_minute = np.empty(int(minutes[-1]) + 1)
+    drift = state['drift']
+    for i, step in enumerate(rng.normal(0, DRIFT_STEP, len(drift_per_minute))):
+        drift += step - DRIFT_REVERSION * drift
+        drift_per_minute[i] = drift
+    state['drift'] = drift
+    drift = drift_per_minute[minutes]
+
+    seasonal = math.sin(2 * math.pi * (year_fraction - 0.3))
+    daily = np.sin(2 * np.pi * (day_fraction - 0.375))  # Maximum rond 15:00
+
+    temperature = 20.5 + 2.5 * seasonal + 1.8 * daily + drift + rng.normal(0, 0.05, n)
+    humidity = 50 + 10 * seasonal - 4 * daily - 1.5 * drift + rng.normal(0, 0.3, n)
+
+    temperature = np.round(np.clip(temperature, -20, 60), 1)
+    humidity = np.round(np.clip(humidity, 5, 99), 1)
+
+    # Zelfde afgeleide waarden als modbus_reader
+    return timestamps, (temperature, humidity, dewpoint(temperature, humidity), absolute_humidity(temperature, humidity))
+
+
+def generate(db_file, days, interval=1, seed=42, compression=None):
+    """Schrijf days dagen aan metingen (één transactie en één executemany per dag)"""
+    # Database module pas importeren nadat DATABASE_FILE is gezet
+    os.environ['DATABASE_FILE'] = db_file
+    from database import ensure_table_exists, get_table_name, get_month_table_name
+    from compression import create_compressor
+
+    compressor = create_compressor(compression) if compression else None
+    generated_rows = 0
+
+    os.makedirs(os.path.dirname(db_file) or '.', exist_ok=True)
+    conn = sqlite3.connect(db_file)
+    cursor = conn.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute('PRAGMA synchronous=OFF')  # Alleen voor het genereren: snelheid boven duurzaamheid
+
+    rng = np.random.default_rng(seed)
+    state = {'drift': 0.0}
+    end = datetime.now().replace(microsecond=0)
+    first_day = (end - timedelta(days=days)).replace(hour=0, minute=0, second=0)
+
+    total_rows = 0
+    started = time.perf_counter()
+    day = first_day
+    while day <= end:
+        next_day = day + timedelta(days=1)
+        start_timestamp = int(day.timestamp())
+        end_timestamp = int(min(next_day, end).timestamp())
+        timestamps, values = generate_day(rng, start_timestamp, end_timestamp, interval, state)
+
+        table_name = get_table_name(day)
+        cursor.execute(f'DROP TABLE IF EXISTS {table_name}')
+        cursor.execute(f'DROP TABLE IF EXISTS {get_month_table_name(day)}')
+        ensure_table_exists(cursor, table_name)
+        if values is not None:
+            rows = zip(timestamps.tolist(), *(column.tolist() for column in values))
+            if compressor is not None:
+                # Zelfde als modbus_reader: het vastgehouden punt hoort bij deze dag
+                rows = [stored for row in rows for stored in compressor.offer(row)] + compressor.flush()
+            else:
+                rows = list(rows)
+            cursor.execute('BEGIN')
+            cursor.executemany(f'INSERT INTO {table_name} {INSERT_COLUMNS} VALUES (?, ?, ?, ?, ?)', rows)
+            conn.commit()
+            total_rows += len(rows)
+            generated_rows += len(timestamps)
+
+        if (day - first_day).days % 30 == 0:
+            print(f"→ {day.strftime('%Y-%m-%d')}: {total_rows} metingen ({time.perf_counter() - started:.1f}s)")
+        day = next_day
+
+    cursor.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    conn.close()
+
+    elapsed = time.perf_counter() - started
+    print(f"✓ {total_rows} metingen in {days + 1} tabellen geschreven naar {db_file} "
+          f"({elapsed:.1f}s, {total_rows / max(elapsed, 1e-9):.0f} rijen/s)")
+    if compressor is not None:
+        print(f"  compressie ({compression}): {generated_rows} → {total_rows} rijen "
+              f"({generated_rows / max(total_rows, 1):.1f}x)")
+    return total_rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Genereer synthetische XY-MD02 metingen voor benchmarks')
+    parser.add_argument('--db', default=DEFAULT_DB, help=f'database bestand (standaard: {DEFAULT_DB})')
+    parser.add_argument('--days', type=int, default=30, help='aantal dagen historie (standaard: 30)')
+    parser.add_argument('--interval', type=int, default=1, help='seconden tussen metingen (standaard: 1)')
+    parser.add_argument('--seed', type=int, default=42, help='seed voor reproduceerbare data (standaard: 42)')
+    parser.add_argument('--compact', action='store_true', help='voeg afgesloten maanden samen tot maandtabellen')
+    parser.add_argument('--compression', choices=['deadband', 'swinging_door'],
+                        help='ingest compressie zoals INGEST_COMPRESSION (afwijkingen uit .env)')
+    args = parser.parse_args()
+
+    if args.days < 1 or args.interval < 1:
+        parser.error('--days en --interval moeten minimaal 1 zijn')
+
+    generate(args.db, args.days, args.interval, args.seed, args.compression)
+    if args.compact:
+        from database import compact_closed_months
+
+        compact_closed_months()
+
+
+if __name__ == '__main__':
+    main()
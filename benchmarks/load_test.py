@@ -0,0 +1,597 @@
+"""Belastingstest: simuleer N wandschermen/tabbladen tegen een draaiende server
+
+Gebruik:
+    python -m benchmarks.generate_data --days 30 --db src/benchmark.db
+    python -m benchmarks.load_test --start-server --db src/benchmark.db --clients 1 5 10 20 --ranges 5 60 1440
+    python -m benchmarks.load_test --url http://127.0.0.1:8050 --server-pid 1234 --clients 10 --duration 60
+
+Elke client doet wat een browser doet: pagina, layout en dependencies ophalen, de initiële callbacks
+afvuren en daarna de _dash-update-component requests van de dcc.Interval componenten herhalen
+(graph-update elke seconde, graph-refresh en graph-refresh-long volgens de layout). Background
+callbacks worden gepolld tot het resultaat er is; de latency is die van de hele callback.
+Met --stream opent elke client ook /stream en schakelt polling uit zoals toggle_polling in de browser.
+
+Per stap (aantal clients) worden throughput, latency percentielen, fouten, gemiste ticks en CPU/RSS
+van het serverproces (inclusief background workers) gerapporteerd. Het viewer plafond is het hoogste
+aantal clients waarbij elke pagina laadt en de p95 van de periodieke callbacks binnen --slo blijft
+zonder fouten.
+"""
+import argparse
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+from urllib.parse import urlsplit
+import numpy as np
+import requests
+
+from benchmarks.run_benchmarks import git_revision, REGRESSION_THRESHOLD
+
+DEFAULT_URL = 'http://127.0.0.1:8050'
+# Moet gelijk blijven aan LONG_RANGE_MINUTES (callbacks.py) en RAW_RANGE_MAX_MINUTES (assets/clientside.js)
+LONG_RANGE_MINUTES = 1440
+RAW_RANGE_MAX_MINUTES = 60
+# Intervals die de browser afvuurt, in de volgorde van de layout
+INTERVAL_IDS = ('graph-update', 'graph-refresh', 'graph-refresh-long')
+# Maximale wachttijd op één callback (inclusief background polling) in seconden
+REQUEST_TIMEOUT = 60
+# Wachttijd tot een met --start-server gestarte server antwoordt
+SERVER_START_TIMEOUT = 120
+# Foutpercentage waarboven een stap niet meer binnen het plafond valt
+MAX_ERROR_RATE = 0.01
+
+
+def parse_outputs(output):
+    """Output string uit _dash-dependencies ('..a.b...c.d..' of 'a.b') naar de payload vorm"""
+    multi = output.startswith('..')
+    parts = output[2:-2].split('...') if multi else [output]
+    outputs = []
+    for part in parts:
+        component_id, prop = part.rsplit('.', 1)
+        outputs.append({'id': component_id, 'property': prop.split('@')[0]})
+    return outputs if multi else outputs[0]
+
+
+def collect_props(node, values):
+    """Verzamel de props van alle componenten met een id uit de _dash-layout JSON"""
+    if isinstance(node, dict):
+        props = node.get('props')
+        if isinstance(props, dict):
+            if 'id' in props:
+                values[props['id']] = dict(props)
+            for value in props.values():
+                collect_props(value, values)
+        else:
+            for value in node.values():
+                collect_props(value, values)
+    elif isinstance(node, list):
+        for value in node:
+            collect_props(value, values)
+
+
+def callback_label(dependency, trigger):
+    """Leesbare naam: eerste output plus de trigger ('live-graph.figure [graph-refresh]')"""
+    outputs = parse_outputs(dependency['output'])
+    first = outputs[0] if isinstance(outputs, list) else outputs
+    return f"{first['id']}.{first['property']} [{trigger}]"
+
+
+def is_long_range(minutes):
+    return minutes == -1 or minutes > LONG_RANGE_MINUTES
+
+
+def active_intervals(minutes, streaming):
+    """Welke intervals de browser laat lopen, zoals toggle_polling in assets/clientside.js"""
+    long_range = is_long_range(minutes)
+    if not streaming:
+        return {'graph-update': True, 'graph-refresh': not long_range, 'graph-refresh-long': long_range}
+    raw_window = 0 < minutes <= RAW_RANGE_MAX_MINUTES
+    return {'graph-update': False, 'graph-refresh': not (raw_window or long_range), 'graph-refresh-long': long_range}
+
+
+class Recorder:
+    """Thread-safe verzameling van latencies, fouten en tellers van één stap"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = {}
+        self.errors = {}
+        self.requests = 0
+        self.bytes = 0
+        self.missed_ticks = 0
+        self.stream_events = 0
+        self.page_loads = []
+
+    def callback(self, label, seconds, requests_made, size, error=None):
+        with self._lock:
+            self.requests += requests_made
+            self.bytes += size
+            if error is not None:
+                self.errors[label] = self.errors.get(label, 0) + 1
+            else:
+                self.latencies.setdefault(label, []).append(seconds)
+
+    def page_loaded(self, seconds):
+        with self._lock:
+            self.page_loads.append(seconds)
+
+    def add(self, counter, amount=1):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + amount)
+
+
+def latency_summary(values):
+    if not values:
+        return {'count': 0}
+    window = np.asarray(values, dtype=np.float64)
+    p50, p95, p99 = np.percentile(window, [50, 95, 99])
+    return {
+        'count': len(values),
+        'p50': round(float(p50), 6),
+        'p95': round(float(p95), 6),
+        'p99': round(float(p99), 6),
+        'mean': round(float(window.mean()), 6),
+        'max': round(float(window.max()), 6)
+    }
+
+
+class Client(threading.Thread):
+    """Eén gesimuleerd browser tabblad"""
+
+    def __init__(self, url, minutes, streaming, recorder, stop_event):
+        super().__init__(daemon=True)
+        self.url = url.rstrip('/')
+        self.minutes = minutes
+        self.streaming = streaming
+        self.recorder = recorder
+        self.stop_event = stop_event
+        self.session = requests.Session()
+        self.stream_socket = None
+        self.values = {}
+        self.dependencies = []
+
+    def load_page(self):
+        """Pagina, layout en dependencies ophalen zoals de Dash renderer bij het openen"""
+        self.session.get(f'{self.url}/', timeout=REQUEST_TIMEOUT).raise_for_status()
+        layout = self.session.get(f'{self.url}/_dash-layout', timeout=REQUEST_TIMEOUT)
+        dependencies = self.session.get(f'{self.url}/_dash-dependencies', timeout=REQUEST_TIMEOUT)
+        layout.raise_for_status()
+        dependencies.raise_for_status()
+        self.recorder.add('requests', 3)
+
+        collect_props(layout.json(), self.values)
+        self.values.setdefault('time-range-dropdown', {})['value'] = self.minutes
+        # Alleen server callbacks; de clientside callbacks kosten de server niets
+        self.dependencies = [d for d in dependencies.json() if not d.get('clientside_function')]
+
+    def payload(self, dependency, changed):
+        def items(entries):
+            return [{'id': entry['id'], 'property': entry['property'],
+                     'value': self.values.get(entry['id'], {}).get(entry['property'])} for entry in entries]
+
+        return {
+            'output': dependency['output'],
+            'outputs': parse_outputs(dependency['output']),
+            'inputs': items(dependency['inputs']),
+            'state': items(dependency.get('state', [])),
+            'changedPropIds': changed
+        }
+
+    def fire(self, dependency, label, changed):
+        """Eén callback afvuren (en bij een background callback pollen tot het klaar is)"""
+        payload = self.payload(dependency, changed)
+        poll_interval = (dependency.get('background') or {}).get('interval', 1000) / 1000
+        start = time.perf_counter()
+        requests_made = 0
+        size = 0
+        error = None
+        try:
+            response = self.session.post(f'{self.url}/_dash-update-component', json=payload, timeout=REQUEST_TIMEOUT)
+            while True:
+                requests_made += 1
+                size += int(response.headers.get('Content-Length') or len(response.content))
+                if response.status_code == 204:  # PreventUpdate of alleen no_update
+                    break
+                response.raise_for_status()
+                body = response.json()
+                if 'response' in body:
+                    self.apply(body['response'])
+                    break
+                if 'cacheKey' not in body:
+                    break
+                if self.stop_event.is_set():
+                    return  # Stap voorbij, het resultaat telt niet meer mee
+                if time.perf_counter() - start > REQUEST_TIMEOUT:
+                    raise TimeoutError(f'background callback niet klaar na {REQUEST_TIMEOUT}s')
+                time.sleep(poll_interval)
+                response = self.session.post(
+                    f"{self.url}/_dash-update-component?cacheKey={body['cacheKey']}&job={body['job']}",
+                    json=payload, timeout=REQUEST_TIMEOUT)
+        except (requests.RequestException, ValueError, TimeoutError) as e:
+            error = e
+        self.recorder.callback(label, time.perf_counter() - start, requests_made, size, error)
+
+    def apply(self, response):
+        """Nieuwe waarden onthouden, zodat State (zoals graph-relayout-data) meeloopt"""
+        for component_id, props in response.items():
+            self.values.setdefault(component_id, {}).update(props)
+
+    def open_stream(self):
+        """Live stream openen; de browser valt terug op polling als dat niet lukt
+
+        Een eigen socket in plaats van requests: een requests stream laat zich pas sluiten na de
+        volgende heartbeat van de server, een socket kan direct afgebroken worden.
+        """
+        address = urlsplit(self.url)
+        try:
+            stream = socket.create_connection((address.hostname, address.port or 80), timeout=REQUEST_TIMEOUT)
+            stream.sendall(f'GET /stream HTTP/1.1\r\nHost: {address.netloc}\r\n'
+                           f'Accept: text/event-stream\r\n\r\n'.encode())
+            reader = stream.makefile('rb')
+            status = reader.readline().split()
+        except OSError:
+            return False
+        if len(status) < 2 or status[1] != b'200':
+            stream.close()
+            return False
+        self.stream_socket = stream
+
+        def read_events():
+            try:
+                for line in reader:
+                    if line.startswith(b'data:'):
+                        self.recorder.add('stream_events')
+            except (OSError, ValueError):
+                pass  # Verbinding gesloten bij het stoppen
+
+        threading.Thread(target=read_events, daemon=True).start()
+        return True
+
+    def run(self):
+        start = time.perf_counter()
+        try:
+            self.load_page()
+        except (requests.RequestException, ValueError) as e:
+            self.recorder.callback('page_load', 0, 1, 0, e)
+            return
+
+        for dependency in self.dependencies:
+            if not dependency.get('prevent_initial_call') and not self.stop_event.is_set():
+                self.fire(dependency, callback_label(dependency, 'init'), [])
+        if self.stop_event.is_set():
+            return  # Pagina niet geladen binnen de stap, telt als vastgelopen client
+        self.recorder.page_loaded(time.perf_counter() - start)
+
+        streaming = self.streaming and self.open_stream()
+        active = active_intervals(self.minutes, streaming)
+        triggered = {interval_id: [d for d in self.dependencies
+                                   if any(i['id'] == interval_id and i['property'] == 'n_intervals' for i in d['inputs'])]
+                     for interval_id in INTERVAL_IDS}
+        schedule = {}
+        for interval_id in INTERVAL_IDS:
+            props = self.values.get(interval_id, {})
+            if active[interval_id] and props.get('interval') and triggered[interval_id]:
+                schedule[interval_id] = {'period': props['interval'] / 1000,
+                                         'due': time.perf_counter() + props['interval'] / 1000}
+
+        while not self.stop_event.is_set():
+            if not schedule:
+                # Alleen de live stream: het tabblad blijft open tot het einde van de stap
+                self.stop_event.wait()
+                break
+            interval_id = min(schedule, key=lambda key: schedule[key]['due'])
+            entry = schedule[interval_id]
+            if self.stop_event.wait(max(0.0, entry['due'] - time.perf_counter())):
+                break
+
+            props = self.values[interval_id]
+            props['n_intervals'] = (props.get('n_intervals') or 0) + 1
+            for dependency in triggered[interval_id]:
+                self.fire(dependency, callback_label(dependency, interval_id), [f'{interval_id}.n_intervals'])
+
+            # Loopt de client achter, dan slaat de browser ticks over (de renderer wacht op de vorige request)
+            entry['due'] += entry['period']
+            now = time.perf_counter()
+            if entry['due'] < now:
+                missed = int((now - entry['due']) // entry['period']) + 1
+                self.recorder.add('missed_ticks', missed)
+                entry['due'] += missed * entry['period']
+
+        if self.stream_socket is not None:
+            try:
+                self.stream_socket.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self.stream_socket.close()
+        self.session.close()
+
+
+class ResourceSampler(threading.Thread):
+    """Meet elke seconde CPU en RSS van het serverproces en zijn kinderen (background workers)"""
+
+    def __init__(self, pid, interval=1.0):
+        super().__init__(daemon=True)
+        import psutil
+
+        self.psutil = psutil
+        self.root = psutil.Process(pid)
+        self.interval = interval
+        self.processes = {}
+        self.samples = []
+        self.stop_event = threading.Event()
+
+    def sample(self):
+        cpu = 0.0
+        rss = 0
+        try:
+            current = [self.root] + self.root.children(recursive=True)
+        except self.psutil.Error:
+            return None
+        for process in current:
+            # cpu_percent() heeft per proces een vorige meting nodig, dus de objecten worden bewaard
+            process = self.processes.setdefault(process.pid, process)
+            try:
+                cpu += process.cpu_percent()
+                rss += process.memory_info().rss
+            except self.psutil.Error:
+                self.processes.pop(process.pid, None)
+        return cpu, rss, len(current)
+
+    def run(self):
+        self.sample()
+        while not self.stop_event.wait(self.interval):
+            sample = self.sample()
+            if sample is not None:
+                self.samples.append(sample)
+
+    def stop(self):
+        self.stop_event.set()
+        self.join()
+        if not self.samples:
+            return None
+        cpu = [sample[0] for sample in self.samples]
+        rss = [sample[1] for sample in self.samples]
+        return {
+            'cpu_percent_mean': round(float(np.mean(cpu)), 1),
+            'cpu_percent_max': round(float(np.max(cpu)), 1),
+            'rss_mb_max': round(max(rss) / 1024 / 1024, 1),
+            'rss_mb_end': round(rss[-1] / 1024 / 1024, 1),
+            'processes_max': max(sample[2] for sample in self.samples)
+        }
+
+
+def run_step(url, clients, ranges, duration, streaming, server_pid):
+    """Eén stap met een vast aantal clients; geeft de samenvatting terug"""
+    recorder = Recorder()
+    stop_event = threading.Event()
+    sampler = ResourceSampler(server_pid) if server_pid else None
+
+    threads = [Client(url, ranges[i % len(ranges)], streaming, recorder, stop_event) for i in range(clients)]
+    if sampler is not None:
+        sampler.start()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    stop_event.wait(duration)
+    stop_event.set()
+    for thread in threads:
+        thread.join(REQUEST_TIMEOUT)
+    elapsed = time.perf_counter() - started
+
+    periodic = [value for label, values in recorder.latencies.items() if not label.endswith('[init]')
+                for value in values]
+    completed = sum(len(values) for values in recorder.latencies.values())
+    errors = sum(recorder.errors.values())
+    return {
+        'clients': clients,
+        'seconds': round(elapsed, 2),
+        'callbacks': completed,
+        'requests': recorder.requests,
+        'errors': errors,
+        'error_rate': round(errors / max(completed + errors, 1), 4),
+        'stalled_clients': clients - len(recorder.page_loads),
+        'missed_ticks': recorder.missed_ticks,
+        'stream_events': recorder.stream_events,
+        'callbacks_per_second': round(completed / elapsed, 2),
+        'requests_per_second': round(recorder.requests / elapsed, 2),
+        'mb_received': round(recorder.bytes / 1024 / 1024, 2),
+        'page_load': latency_summary(recorder.page_loads),
+        'latency': latency_summary(periodic),
+        'per_callback': {label: latency_summary(values) for label, values in sorted(recorder.latencies.items())},
+        'errors_per_callback': dict(recorder.errors),
+        'server': sampler.stop() if sampler is not None else None
+    }
+
+
+def within_slo(step, slo):
+    # Zonder periodieke callbacks (alleen live stream) tellen alleen fouten en vastgelopen clients
+    return (step['latency'].get('p95', 0) <= slo and step['error_rate'] <= MAX_ERROR_RATE
+            and not step['stalled_clients'])
+
+
+def print_step(step):
+    latency = step['latency']
+    line = (f"  {step['clients']:>4} clients: {step['callbacks_per_second']:7.1f} callbacks/s  "
+            f"{step['requests_per_second']:7.1f} req/s   p50 {latency.get('p50', 0) * 1000:7.1f} ms  "
+            f"p95 {latency.get('p95', 0) * 1000:7.1f} ms  p99 {latency.get('p99', 0) * 1000:7.1f} ms   "
+            f"laden p95 {step['page_load'].get('p95', 0):5.1f} s   fouten {step['errors']}  "
+            f"vastgelopen {step['stalled_clients']}  gemist {step['missed_ticks']}")
+    if step['server']:
+        line += f"   CPU {step['server']['cpu_percent_mean']:.0f}% (max {step['server']['cpu_percent_max']:.0f}%)" \
+                f"  RSS {step['server']['rss_mb_max']:.0f} MB"
+    print(line)
+
+
+def start_server(url, db_file, log_file=None):
+    """Start app.py op db_file en wacht tot de layout geladen kan worden; geeft (proces, opstarttijd)"""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, DATABASE_FILE=os.path.abspath(db_file), DATA_RETENTION_DAYS='0', DEBUG_LOGGING='False')
+    output = open(log_file, 'w', encoding='utf-8') if log_file else subprocess.DEVNULL
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, 'app.py'], cwd=root, env=env, stdout=output, stderr=subprocess.STDOUT)
+
+    while time.perf_counter() - started < SERVER_START_TIMEOUT:
+        if process.poll() is not None:
+            raise RuntimeError(f'server gestopt met exit code {process.returncode}'
+                               + (f', zie {log_file}' if log_file else ' (gebruik --server-log)'))
+        try:
+            if requests.get(f"{url.rstrip('/')}/_dash-layout", timeout=5).status_code == 200:
+                return process, time.perf_counter() - started
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+
+    stop_server(process)
+    raise RuntimeError(f'server antwoordt niet binnen {SERVER_START_TIMEOUT}s')
+
+
+def stop_server(process):
+    """Stop de server inclusief background workers"""
+    try:
+        import psutil
+
+        children = psutil.Process(process.pid).children(recursive=True)
+    except Exception:
+        children = []
+    process.terminate()
+    try:
+        process.wait(10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+    for child in children:
+        try:
+            child.kill()
+        except Exception:
+            pass
+
+
+def compare(results, baseline_file, threshold=REGRESSION_THRESHOLD):
+    """Vergelijk p95 latency en throughput per stap met een eerder resultaat, geeft de regressies terug"""
+    with open(baseline_file, encoding='utf-8') as f:
+        baseline = json.load(f)
+
+    if baseline.get('config') != results['config']:
+        print("Waarschuwing: de instellingen verschillen van de vergelijking, verhoudingen zijn indicatief")
+
+    previous_steps = {step['clients']: step for step in baseline.get('steps', [])}
+    regressions = []
+    print(f"\nVergelijking met {baseline_file} ({baseline.get('revision') or '?'}):")
+    for step in results['steps']:
+        previous = previous_steps.get(step['clients'])
+        if not previous or not previous['latency'].get('p95') or not step['latency'].get('p95'):
+            continue
+        ratio = step['latency']['p95'] / previous['latency']['p95']
+        throughput = step['callbacks_per_second'] / max(previous['callbacks_per_second'], 1e-9)
+        regressed = ratio > threshold or throughput < 1 / threshold
+        marker = '⚠️ ' if regressed else '   '
+        print(f"{marker}{step['clients']:>4} clients: p95 {previous['latency']['p95'] * 1000:7.1f} → "
+              f"{step['latency']['p95'] * 1000:7.1f} ms ({ratio:.2f}x)   throughput {throughput:.2f}x")
+        if regressed:
+            regressions.append(f"{step['clients']} clients")
+
+    if baseline.get('ceiling') is not None and (results['ceiling'] or 0) < baseline['ceiling']:
+        print(f"⚠️  Viewer plafond gedaald: {baseline['ceiling']} → {results['ceiling']}")
+        regressions.append('ceiling')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Belastingstest met gesimuleerde dashboard clients')
+    parser.add_argument('--url', default=DEFAULT_URL, help=f'adres van de server (standaard: {DEFAULT_URL})')
+    parser.add_argument('--start-server', action='store_true', help='start app.py zelf op --db en stop hem na afloop')
+    parser.add_argument('--db', default='src/benchmark.db', help='database voor --start-server (zie benchmarks.generate_data)')
+    parser.add_argument('--server-log', help='schrijf de uitvoer van de gestarte server naar dit bestand')
+    parser.add_argument('--server-pid', type=int, help='PID van een al draaiende server, voor CPU/RSS metingen')
+    parser.add_argument('--clients', type=int, nargs='+', default=[1, 5, 10, 20],
+                        help='aantallen clients, elk een eigen stap (standaard: 1 5 10 20)')
+    parser.add_argument('--ranges', type=int, nargs='+', default=[5],
+                        help='tijdsbereiken in minuten (-1 = alle data), verdeeld over de clients (standaard: 5)')
+    parser.add_argument('--duration', type=float, default=30, help='seconden per stap (standaard: 30)')
+    parser.add_argument('--stream', action='store_true', help='clients gebruiken de live stream zoals de browser')
+    parser.add_argument('--slo', type=float, default=1.0,
+                        help='maximale p95 latency in seconden binnen het viewer plafond (standaard: 1.0)')
+    parser.add_argument('--keep-going', action='store_true', help='ga door met grotere stappen na overschrijding van --slo')
+    parser.add_argument('--output', help='schrijf de resultaten naar dit JSON bestand')
+    parser.add_argument('--compare', help='vergelijk met een eerder JSON resultaat')
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD,
+                        help=f'p95 verhouding die als regressie telt (standaard: {REGRESSION_THRESHOLD})')
+    parser.add_argument('--fail-on-regression', action='store_true', help='exit code 1 bij een regressie')
+    args = parser.parse_args()
+
+    if any(clients < 1 for clients in args.clients) or args.duration <= 0:
+        parser.error('--clients en --duration moeten positief zijn')
+    if args.start_server and not os.path.exists(args.db):
+        parser.error(f"{args.db} bestaat niet, genereer eerst data met: python -m benchmarks.generate_data --db {args.db}")
+
+    server = None
+    server_pid = args.server_pid
+    startup_seconds = None
+    if args.start_server:
+        print(f"→ Server starten op {args.db}...")
+        server, startup_seconds = start_server(args.url, args.db, args.server_log)
+        server_pid = server.pid
+        print(f"✓ Server klaar na {startup_seconds:.1f}s (PID {server_pid})")
+    if server_pid:
+        try:
+            import psutil  # noqa: F401
+        except ImportError:
+            print("Waarschuwing: psutil is niet geïnstalleerd, geen CPU/RSS metingen")
+            server_pid = None
+    else:
+        print("Geen --server-pid of --start-server opgegeven, geen CPU/RSS metingen")
+
+    steps = []
+    ceiling = None
+    try:
+        print(f"Tijdsbereiken {args.ranges}, {args.duration:.0f}s per stap, {'live stream' if args.stream else 'polling'}:")
+        for clients in sorted(set(args.clients)):
+            step = run_step(args.url, clients, args.ranges, args.duration, args.stream, server_pid)
+            steps.append(step)
+            print_step(step)
+            if within_slo(step, args.slo):
+                ceiling = clients
+            elif not args.keep_going:
+                break
+    finally:
+        if server is not None:
+            stop_server(server)
+
+    if ceiling is None:
+        print(f"\nViewer plafond: al bij {steps[0]['clients']} client(s) boven p95 {args.slo * 1000:.0f} ms of "
+              f"{MAX_ERROR_RATE:.0%} fouten, of niet alle pagina's geladen")
+    else:
+        print(f"\nViewer plafond: {ceiling} client(s) binnen p95 {args.slo * 1000:.0f} ms"
+              + (' (hoogste geteste stap, het echte plafond ligt hoger)' if ceiling == steps[-1]['clients'] else ''))
+
+    results = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'revision': git_revision(),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'config': {'ranges': args.ranges, 'duration': args.duration, 'stream': args.stream, 'slo': args.slo},
+        'startup_seconds': round(startup_seconds, 3) if startup_seconds is not None else None,
+        'ceiling': ceiling,
+        'steps': steps
+    }
+
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"\n✓ Resultaten opgeslagen in {args.output}")
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regressie(s): {', '.join(regressions)}")
+            if args.fail_on_regression:
+                sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
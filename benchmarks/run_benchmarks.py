@@ -0,0 +1,303 @@
+"""Meet de zware paden van de app op een (synthetische) database en sla het resultaat op als JSON
+
+Gebruik:
+    python -m benchmarks.generate_data --days 365 --db src/benchmark.db
+    python -m benchmarks.run_benchmarks --db src/benchmark.db --output benchmarks/results/baseline.json
+    python -m benchmarks.run_benchmarks --db src/benchmark.db --compare benchmarks/results/baseline.json
+
+Per benchmark wordt de eerste (koude) run apart bewaard; daarna volgen --repeat gemeten runs.
+"""
+import argparse
+import json
+import os
+import platform
+import socket
+import sqlite3
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime
+
+# Tijdsbereiken zoals in de dropdown (minuten, -1 = alle data)
+GRAPH_RANGES = [5, 60, 360, 1440, 10080, 43200, 259200, -1]
+# Periodes voor de historische slider (minuten)
+HISTORICAL_RANGES = [5, 60, 1440, 2880, 10080, 43200]
+# Tijdsbereiken voor de tabel selectie en ruwe UNION queries (minuten, None = alles)
+TABLE_RANGES = [60, 1440, 10080, 43200, None]
+UNION_RANGES = [5, 60, 1440, 10080]
+# Alert regels voor de evaluatie per meting (één van elke soort, zie alerts.py)
+ALERT_BENCHMARK_RULES = 'temperature>28,hysteresis=0.5;humidity<30;rate:temperature>2/10m;zscore:humidity>6/1h'
+# Modules waarvan de importtijd in een nieuw proces gemeten wordt: app (alles vóór de poort open is)
+# en callbacks (pandas, plotly, Dash: gaat in de achtergrond)
+STARTUP_IMPORTS = ['app', 'callbacks']
+# Maximale wachttijd tot app.py /ready meldt
+STARTUP_TIMEOUT = 120
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Mediaan tragere dan dit veelvoud van de vergelijking telt als regressie
+REGRESSION_THRESHOLD = 1.2
+
+
+def measure(function, repeat):
+    """Voer function uit: één koude run plus repeat gemeten runs (seconden)"""
+    start = time.perf_counter()
+    function()
+    first = time.perf_counter() - start
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+
+    return summarize(first, timings)
+
+
+def summarize(first, timings):
+    """Eerste run plus gemeten runs -> statistieken zoals in de JSON output"""
+    repeat = len(timings)
+    timings = sorted(timings)
+    return {
+        'first': round(first, 6),
+        'min': round(timings[0], 6),
+        'median': round(timings[len(timings) // 2], 6),
+        'p95': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 6),
+        'mean': round(sum(timings) / len(timings), 6),
+        'max': round(timings[-1], 6),
+        'runs': repeat
+    }
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _get_status(url):
+    try:
+        with urllib.request.urlopen(url, timeout=5) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except OSError:
+        return None
+
+
+def start_app(db_file):
+    """Start app.py op db_file: (seconden tot de poort luistert, seconden tot /ready 200)
+
+    Zonder Modbus poort en zonder onderhoud (retentie, rollups, compactie), de database blijft ongewijzigd.
+    """
+    port = _free_port()
+    env = dict(os.environ, DATABASE_FILE=os.path.abspath(db_file), APP_PORT=str(port), MODBUS_PORT='benchmark-no-port',
+               DATA_RETENTION_DAYS='0', RETENTION_TIERS='', PARTITION_COMPACTION='False')
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, 'app.py'], cwd=ROOT, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    listening = None
+    try:
+        while time.perf_counter() - started < STARTUP_TIMEOUT:
+            if process.poll() is not None:
+                raise RuntimeError(f'app.py gestopt met exit code {process.returncode}')
+            if listening is None and _get_status(f'http://127.0.0.1:{port}/healthz') == 200:
+                listening = time.perf_counter() - started
+            if listening is not None and _get_status(f'http://127.0.0.1:{port}/ready') == 200:
+                return listening, time.perf_counter() - started
+            time.sleep(0.02)
+        raise RuntimeError(f'app.py niet klaar binnen {STARTUP_TIMEOUT}s')
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def import_seconds(module):
+    """Importtijd van een module in een nieuw proces (zonder de opstarttijd van Python zelf)"""
+    code = f'import time; start = time.perf_counter(); import {module}; print(time.perf_counter() - start)'
+    output = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True, check=True).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def run_startup_benchmarks(db_file, repeat, only=None):
+    """Importtijden en opstarttijd van app.py, elke run in een nieuw proces"""
+    results = {}
+
+    def wanted(name):
+        return not only or any(name.startswith(prefix) for prefix in only)
+
+    for module in STARTUP_IMPORTS:
+        name = f'import[{module}]'
+        if wanted(name):
+            timings = [import_seconds(module) for _ in range(repeat + 1)]
+            results[name] = summarize(timings[0], timings[1:])
+
+    if wanted('startup'):
+        runs = [start_app(db_file) for _ in range(repeat + 1)]
+        results['startup[listening]'] = summarize(runs[0][0], [run[0] for run in runs[1:]])
+        results['startup[ready]'] = summarize(runs[0][1], [run[1] for run in runs[1:]])
+
+    for name, result in results.items():
+        print(f"  {name:<32} eerste {result['first'] * 1000:8.1f} ms   "
+              f"mediaan {result['median'] * 1000:8.1f} ms   p95 {result['p95'] * 1000:8.1f} ms")
+    return results
+
+
+def dataset_info(db_file):
+    """Omvang van de dataset, bepaalt hoe resultaten vergeleken kunnen worden"""
+    from database import get_all_measurement_tables, get_timestamp_bounds
+
+    conn = sqlite3.connect(db_file)
+    cursor = conn.cursor()
+    tables = get_all_measurement_tables(cursor)
+    rows = sum(cursor.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0] for table in tables)
+    first_timestamp, last_timestamp = get_timestamp_bounds(cursor)
+    conn.close()
+    return {
+        'tables': len(tables),
+        'rows': rows,
+        'span_days': round((last_timestamp - first_timestamp) / 86400, 2) if first_timestamp is not None else 0,
+        'size_bytes': os.path.getsize(db_file)
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(db_file, repeat, only=None):
+    """Draai alle benchmarks (of alleen namen die met only beginnen), geeft een dict met resultaten"""
+    from database import get_all_measurement_tables, get_tables_for_timerange, count_measurements, build_union_query
+    from callbacks import build_graph_figure, build_historical_data
+    from psychrometric import create_psychrometric_chart
+    from alerts import create_alert_engine
+    import pandas as pd
+
+    conn = sqlite3.connect(db_file)
+    cursor = conn.cursor()
+
+    def cutoff(minutes):
+        return None if minutes is None else int(time.time()) - minutes * 60
+
+    def read_union(minutes):
+        query, _ = build_union_query(cursor, ['timestamp', 'temperature', 'humidity', 'dewpoint', 'absolute_humidity'],
+                                     start_timestamp=cutoff(minutes))
+        return pd.read_sql_query(query, conn) if query else None
+
+    benchmarks = {
+        'measurement_tables': lambda: get_all_measurement_tables(cursor),
+        'count_measurements': lambda: count_measurements(cursor)
+    }
+    for minutes in TABLE_RANGES:
+        benchmarks[f'tables_for_timerange[{minutes or "all"}]'] = \
+            lambda minutes=minutes: get_tables_for_timerange(cursor, cutoff(minutes))
+    for minutes in UNION_RANGES:
+        benchmarks[f'union_query_read[{minutes}]'] = lambda minutes=minutes: read_union(minutes)
+    for minutes in GRAPH_RANGES:
+        benchmarks[f'graph_figure[{minutes}]'] = lambda minutes=minutes: build_graph_figure(minutes, 'en')
+    for minutes in HISTORICAL_RANGES:
+        benchmarks[f'historical_data[{minutes}]'] = \
+            lambda minutes=minutes: build_historical_data({'type': 'preset', 'minutes': minutes}, 'en')
+    benchmarks['psychrometric_chart'] = lambda: create_psychrometric_chart(22.5, 50.0, 'en')
+
+    # Alerts: evaluatie van het laatste uur aan metingen, zoals de Modbus thread dat per meting doet
+    query, _ = build_union_query(cursor, ['timestamp', 'temperature', 'humidity', 'dewpoint', 'absolute_humidity'],
+                                 start_timestamp=cutoff(60))
+    alert_rows = cursor.execute(query).fetchall() if query else []
+
+    def evaluate_alerts():
+        engine = create_alert_engine('benchmark', ALERT_BENCHMARK_RULES, f'file:{os.devnull}')
+        for row in alert_rows:
+            engine.evaluate(row)
+    benchmarks['alerts_evaluate[60]'] = evaluate_alerts
+
+    results = {}
+    for name, function in benchmarks.items():
+        if only and not any(name.startswith(prefix) for prefix in only):
+            continue
+        results[name] = measure(function, repeat)
+        print(f"  {name:<32} eerste {results[name]['first'] * 1000:8.1f} ms   "
+              f"mediaan {results[name]['median'] * 1000:8.1f} ms   p95 {results[name]['p95'] * 1000:8.1f} ms")
+
+    conn.close()
+    return results
+
+
+def compare(results, baseline_file, threshold=REGRESSION_THRESHOLD):
+    """Vergelijk de medianen met een eerder resultaat, geeft de namen van regressies terug"""
+    with open(baseline_file, encoding='utf-8') as f:
+        baseline = json.load(f)
+
+    if baseline.get('dataset', {}).get('rows') != results['dataset']['rows']:
+        print("Waarschuwing: de dataset verschilt van de vergelijking, verhoudingen zijn indicatief")
+
+    regressions = []
+    print(f"\nVergelijking met {baseline_file} ({baseline.get('revision') or '?'}):")
+    for name, current in results['benchmarks'].items():
+        previous = baseline.get('benchmarks', {}).get(name)
+        if not previous or not previous['median']:
+            continue
+        ratio = current['median'] / previous['median']
+        marker = '⚠️ ' if ratio > threshold else '   '
+        print(f"{marker}{name:<32} {previous['median'] * 1000:8.1f} → {current['median'] * 1000:8.1f} ms  ({ratio:.2f}x)")
+        if ratio > threshold:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks voor de XY-MD02 WebApp')
+    parser.add_argument('--db', default='src/benchmark.db', help='database bestand (zie benchmarks.generate_data)')
+    parser.add_argument('--repeat', type=int, default=5, help='gemeten runs per benchmark (standaard: 5)')
+    parser.add_argument('--only', nargs='*', help='alleen benchmarks waarvan de naam hiermee begint')
+    parser.add_argument('--output', help='schrijf de resultaten naar dit JSON bestand')
+    parser.add_argument('--compare', help='vergelijk met een eerder JSON resultaat')
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD,
+                        help=f'mediaan verhouding die als regressie telt (standaard: {REGRESSION_THRESHOLD})')
+    parser.add_argument('--fail-on-regression', action='store_true', help='exit code 1 bij een regressie')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        parser.error(f"{args.db} bestaat niet, genereer eerst data met: python -m benchmarks.generate_data --db {args.db}")
+    if args.repeat < 1:
+        parser.error('--repeat moet minimaal 1 zijn')
+
+    # App modules lezen DATABASE_FILE bij het importeren; background workers en extra output zijn hier niet nodig
+    os.environ['DATABASE_FILE'] = args.db
+    os.environ['BACKGROUND_CALLBACKS'] = 'False'
+    os.environ['DEBUG_LOGGING'] = 'False'
+
+    dataset = dataset_info(args.db)
+    print(f"Dataset: {dataset['rows']} metingen in {dataset['tables']} tabellen ({dataset['span_days']} dagen)")
+
+    results = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'revision': git_revision(),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'dataset': dataset,
+        'repeat': args.repeat,
+        'benchmarks': run_benchmarks(args.db, args.repeat, args.only)
+    }
+    results['benchmarks'].update(run_startup_benchmarks(args.db, args.repeat, args.only))
+
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"\n✓ Resultaten opgeslagen in {args.output}")
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regressie(s): {', '.join(regressions)}")
+            if args.fail_on_regression:
+                sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,27 +1,548 @@
+import base64
+import logging
 import sqlite3
-import math
 import os
+import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
-from dash import callback_context, html, no_update, Input, Output, State
+from dash import callback_context, html, no_update, set_props, ClientsideFunction, Input, Output, Patch, State
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 from dotenv import load_dotenv
 
 from translations import TRANSLATIONS
-from database import get_all_measurement_tables, build_union_query, DB_FILE
-from psychrometric import create_psychrometric_chart, create_psychrometric_chart_historical
+from database import (
+    get_all_measurement_tables,
+    count_measurements,
+    get_latest_measurement,
+    get_timestamp_bounds,
+    get_measurement_before,
+    build_union_query,
+    build_bucket_query,
+    build_density_query,
+    get_bucket_seconds,
+    DB_FILE
+)
+from aggregation import aggregate_all_buckets
+from background import background_manager
+from metrics import timed_callback, track_query, record_points
+from timeutils import to_local_epochs, format_local_epoch
+from derived import dewpoint, absolute_humidity, comfort_score, humidex as calculate_humidex
+from compression import reconstruct_series, INGEST_COMPRESSION, COMPRESSION_MAX_INTERVAL
+from psychrometric import (
+    create_psychrometric_chart,
+    compute_density_histogram,
+    get_marker_index,
+    get_marker_properties,
+    ATMOSPHERIC_PRESSURE
+)
 
 # Laad environment variabelen
 load_dotenv()
-TIMEZONE = os.getenv('TIMEZONE', 'Europe/Amsterdam')
-DEBUG_LOGGING = os.getenv('DEBUG_LOGGING', 'False').lower() == 'true'
+logger = logging.getLogger(__name__)
+
+# Boven dit aantal ruwe punten wordt een korte periode toch geaggregeerd (per minuut)
+RAW_POINTS_LIMIT = 5000
+# Langere tijdsbereiken worden als background callback berekend (buiten de request thread)
+LONG_RANGE_MINUTES = 1440
+# Boven dit aantal punten per trace tekent de grafiek met WebGL (Scattergl, zonder vlakvulling)
+WEBGL_THRESHOLD = int(os.getenv('WEBGL_THRESHOLD', '2000'))
+
+if WEBGL_THRESHOLD < 0:
+    logger.warning("WEBGL_THRESHOLD kan niet negatief zijn (%s), gebruik 0 (altijd WebGL)", WEBGL_THRESHOLD)
+    WEBGL_THRESHOLD = 0
+
+
+def get_comfort_level(temp, humidity, t):
+    """Bepaal comfort level op basis van Humidex"""
+    humidex = calculate_humidex(temp, humidity)
+    
+    # Comfort classificatie op basis van Humidex ranges
+    # Bron: Environment Canada Humidex schaal
+    if humidex < 20:
+        return t['comfort_0'], 0, "🥶", humidex  # Te koud
+    elif humidex < 27:
+        return t['comfort_4'], 4, "🙂", humidex  # Comfortabel koel
+    elif humidex < 30:
+        return t['comfort_5'], 5, "😊", humidex  # Comfortabel
+    elif humidex < 35:
+        return t['comfort_6'], 6, "✨", humidex  # Optimaal comfortabel
+    elif humidex < 40:
+        return t['comfort_3'], 3, "😓", humidex  # Enig ongemak
+    elif humidex < 46:
+        return t['comfort_2'], 2, "😟", humidex  # Veel ongemak, vermijd fysieke inspanning
+    elif humidex < 54:
+        return t['comfort_1'], 1, "🔥", humidex  # Gevaarlijk - hittekrampen mogelijk
+    else:
+        return t['comfort_0'], 0, "⚠️", humidex  # Heatstroke dreigend
+
+
+def is_long_range(time_range_minutes):
+    """Tijdsbereiken langer dan LONG_RANGE_MINUTES (en 'alle data') lopen via de background callback"""
+    return time_range_minutes is not None and (time_range_minutes == -1 or time_range_minutes > LONG_RANGE_MINUTES)
+
+
+def fill_bucket_grid(buckets, bucket_seconds):
+    """Zet SQL buckets op een regelmatig grid (lege buckets = NaN) met lokale epoch timestamps"""
+    if buckets.empty:
+        return buckets
+    
+    grid_index = np.arange(buckets['bucket'].iloc[0], buckets['bucket'].iloc[-1] + 1)
+    grid = buckets.set_index('bucket').reindex(grid_index)
+    grid.insert(0, 'timestamp', grid_index * bucket_seconds)
+    return grid.reset_index(drop=True)
+
+
+def encode_typed_array(values, dtype='f4'):
+    """Codeer een numerieke reeks als base64 typed array (plotly.js 'bdata' formaat)"""
+    array = np.ascontiguousarray(values, dtype=np.dtype(dtype).newbyteorder('<'))
+    return {'dtype': dtype, 'bdata': base64.b64encode(array.tobytes()).decode('ascii')}
+
+
+def encode_time_axis(epochs):
+    """Codeer epoch seconden als start + stap (regelmatig grid) of als int32 offsets t.o.v. start"""
+    start = int(epochs[0]) if len(epochs) else 0
+    offsets = np.asarray(epochs, dtype=np.int64) - start
+    
+    if len(offsets) > 1:
+        steps = np.diff(offsets)
+        if np.all(steps == steps[0]):
+            return {'start': start, 'step': int(steps[0])}
+    
+    return {'start': start, 'offsets': encode_typed_array(offsets, 'i4')}
+
+
+def encode_figure_arrays(fig):
+    """Zet een figure om naar een dict waarin numerieke x/y arrays als base64 typed arrays staan"""
+    figure = fig.to_plotly_json()
+    for trace in figure['data']:
+        for key, dtype in (('x', 'f8'), ('y', 'f4')):
+            values = trace.get(key)
+            if isinstance(values, np.ndarray) and values.dtype.kind in 'fiu':
+                trace[key] = encode_typed_array(values, dtype)
+    return figure
+
+
+def resolve_time_range(range_value):
+    """Bepaal start en eind datetime voor een geselecteerde periode (preset of custom)"""
+    if range_value.get('type') == 'preset':
+        # Preset: gebruik minuten
+        minutes = range_value['minutes']
+        end_dt = datetime.now()
+        start_dt = end_dt - timedelta(minutes=minutes)
+    
+    elif range_value.get('type') == 'custom':
+        # Custom: gebruik specifieke datums en tijden
+        start_date = pd.to_datetime(range_value['start_date'])
+        start_dt = start_date.replace(
+            hour=range_value['start_hour'],
+            minute=range_value['start_minute'],
+            second=0
+        )
+        
+        end_date = pd.to_datetime(range_value['end_date'])
+        end_dt = end_date.replace(
+            hour=range_value['end_hour'],
+            minute=range_value['end_minute'],
+            second=59
+        )
+    else:
+        return None
+    
+    return start_dt, end_dt
+
+
+def build_graph_figure(time_range_minutes, lang, set_progress=None):
+    """Bouw de grafieken voor een tijdsbereik, geeft (figure, data-count tekst) terug
+    
+    set_progress (background callbacks) ontvangt een voortgangstekst per stap.
+    """
+    if lang is None:
+        lang = 'nl'
+    
+    t = TRANSLATIONS[lang]
+    
+    def report_progress(step):
+        if set_progress is not None:
+            set_progress(f"⏳ {t['loading']} ({step}/3)")
+    
+    report_progress(1)
+    conn = sqlite3.connect(DB_FILE)
+    cursor = conn.cursor()
+    
+    # Haal totaal aantal metingen op (afgesloten partities uit de cache, zie count_measurements)
+    with track_query('count') as tracked:
+        tracked.rows = len(get_all_measurement_tables(cursor))
+        total_count = count_measurements(cursor)
+    
+    # Bepaal tijdsfilter en bucket grootte (None = ruwe metingen)
+    columns = ['temperature', 'humidity', 'dewpoint', 'absolute_humidity']
+    
+    if time_range_minutes == -1:
+        # Alle data: bucket grootte op basis van de totale periode
+        start_timestamp = None
+        first_timestamp, last_timestamp = get_timestamp_bounds(cursor)
+        span_days = (last_timestamp - first_timestamp) / 86400 if first_timestamp is not None else 0
+        bucket_seconds = get_bucket_seconds(time_range_minutes, span_days)
+        logger.debug("Query voor ALLE data (%.1f dagen, buckets van %ss)", span_days, bucket_seconds)
+    else:
+        # Filter op tijdsbereik
+        cutoff_time = datetime.now() - timedelta(minutes=time_range_minutes)
+        start_timestamp = int(cutoff_time.timestamp())
+        bucket_seconds = get_bucket_seconds(time_range_minutes)
+        logger.debug("Query voor laatste %s minuten (vanaf %s)", time_range_minutes, cutoff_time.strftime('%Y-%m-%d %H:%M:%S'))
+    
+    df = pd.DataFrame(columns=['timestamp'] + columns)
+    
+    if bucket_seconds is None:
+        # Korte periode: ruwe metingen
+        query, table_count = build_union_query(cursor, ['timestamp'] + columns, start_timestamp=start_timestamp)
+        if query:
+            with track_query('graph_raw') as tracked:
+                df = pd.read_sql_query(query, conn)
+                tracked.rows = len(df)
+            if INGEST_COMPRESSION != 'off':
+                # Gecomprimeerde opslag: de waarde op het begin van het venster komt uit de meting ervoor
+                previous = get_measurement_before(cursor, ['timestamp'] + columns, start_timestamp,
+                                                  start_timestamp - COMPRESSION_MAX_INTERVAL)
+                # Het eind loopt tot de laatste (mogelijk nog niet bewaarde) meting van de Modbus thread
+                df = reconstruct_series(df, previous, start_timestamp, int(datetime.now().timestamp()),
+                                        latest=get_latest_measurement(cursor))
+            # Lokale epoch seconden via vooraf berekende offset segmenten (geen datetime conversie)
+            df['timestamp'] = to_local_epochs(df['timestamp'].to_numpy())
+    
+        # Hoge sample rate: toch aggregeren om de grafiek licht te houden
+        if len(df) > RAW_POINTS_LIMIT:
+            bucket_seconds = 60
+    
+    if time_range_minutes == -1:
+        # Alle data: partitie voor partitie samenvouwen (afgesloten dagen uit cache, begrensd geheugen)
+        with track_query('graph_all') as tracked:
+            buckets = aggregate_all_buckets(cursor, columns, bucket_seconds)
+            tracked.rows = len(buckets)
+        df = fill_bucket_grid(buckets, bucket_seconds)
+    elif bucket_seconds is not None:
+        # Aggregatie in SQLite, alleen de buckets komen naar Python
+        query, table_count = build_bucket_query(cursor, columns, bucket_seconds, start_timestamp=start_timestamp)
+        if query:
+            with track_query('graph_buckets') as tracked:
+                buckets = pd.read_sql_query(query, conn)
+                tracked.rows = len(buckets)
+            df = fill_bucket_grid(buckets, bucket_seconds)
+        else:
+            logger.debug("Geen query gegenereerd (geen relevante tabellen)")
+    
+    logger.debug("Opgehaalde punten: %d", len(df))
+    record_points(len(df) * 5)  # Vijf grafieken met dezelfde x-as
+    
+    conn.close()
+    
+    if df.empty:
+        return go.Figure(), f"{total_count} {t['measurements']}"
+    
+    report_progress(2)
+    
+    # X-as data één keer bepalen en delen: regelmatig grid als x0 + dx, anders lokale epoch milliseconden
+    # (hover labels worden door de as zelf geformatteerd, geen string per punt meer)
+    if bucket_seconds is not None:
+        x_data = {'x0': int(df['timestamp'].iloc[0]) * 1000, 'dx': bucket_seconds * 1000}
+    else:
+        x_data = {'x': df['timestamp'].to_numpy(dtype=np.float64) * 1000}
+    
+    # Comfort score per datapunt via de Humidex lookup tabel (gevectoriseerd, NaN voor lege buckets)
+    df['comfort_score'] = comfort_score(df['temperature'].to_numpy(dtype=np.float64), df['humidity'].to_numpy(dtype=np.float64))
+    
+    # Veel punten: WebGL rendering, vlakvulling laten vallen (duur in de browser en niet ondersteund door WebGL lijnen)
+    use_webgl = len(df) > WEBGL_THRESHOLD
+    scatter_type = go.Scattergl if use_webgl else go.Scatter
+    
+    def area_fill(color):
+        return {} if use_webgl else {'fill': 'tozeroy', 'fillcolor': color}
+    
+    if use_webgl:
+        logger.debug("WebGL rendering (%d punten > %s)", len(df), WEBGL_THRESHOLD)
+    
+    # Maak subplots
+    fig = make_subplots(
+        rows=5, cols=1,
+        subplot_titles=(f'🌡️ {t["temperature"]}', f'💧 {t["humidity"]}', f'💦 {t["dewpoint"]}', f'🌫️ {t["abs_humidity"]}', f'😊 {t["comfort"]}'),
+        vertical_spacing=0.08
+    )
+    
+    fig.add_trace(
+        scatter_type(
+            **x_data,
+            y=df['temperature'],
+            mode='lines',
+            name=t['temperature'],
+            line=dict(color='#3498db', width=2.5),
+            **area_fill('rgba(52, 152, 219, 0.1)'),
+            hovertemplate='<b>%{y:.1f}°C</b><br>%{x|%d-%m-%Y %H:%M:%S}<extra></extra>',
+            connectgaps=True
+        ),
+        row=1, col=1
+    )
+    
+    fig.add_trace(
+        scatter_type(
+            **x_data,
+            y=df['humidity'], 
+            mode='lines',
+            name=t['humidity'],
+            line=dict(color='#e74c3c', width=2.5),
+            **area_fill('rgba(231, 76, 60, 0.1)'),
+            hovertemplate='<b>%{y:.1f}%</b><br>%{x|%d-%m-%Y %H:%M:%S}<extra></extra>',
+            connectgaps=True
+        ),
+        row=2, col=1
+    )
+    
+    fig.add_trace(
+        scatter_type(
+            **x_data,
+            y=df['dewpoint'] if 'dewpoint' in df.columns else dewpoint(df['temperature'], df['humidity']), 
+            mode='lines',
+            name=t['dewpoint'],
+            line=dict(color='#9b59b6', width=2.5),
+            **area_fill('rgba(155, 89, 182, 0.1)'),
+            hovertemplate='<b>%{y:.1f}°C</b><br>%{x|%d-%m-%Y %H:%M:%S}<extra></extra>',
+            connectgaps=True
+        ),
+        row=3, col=1
+    )
+    
+    # Bereken absolute humidity voor grafiek als niet aanwezig
+    if 'absolute_humidity' in df.columns:
+        abs_hum_data = df['absolute_humidity']
+    else:
+        abs_hum_data = absolute_humidity(df['temperature'], df['humidity'])
+    
+    fig.add_trace(
+        scatter_type(
+            **x_data,
+            y=abs_hum_data,
+            mode='lines',
+            name=t['abs_humidity'],
+            line=dict(color='#16a085', width=2.5),
+            **area_fill('rgba(22, 160, 133, 0.1)'),
+            hovertemplate='<b>%{y:.1f}g/m³</b><br>%{x|%d-%m-%Y %H:%M:%S}<extra></extra>',
+            connectgaps=True
+        ),
+        row=4, col=1
+    )
+    
+    # Comfort score grafiek met kleurcodering
+    fig.add_trace(
+        scatter_type(
+            **x_data,
+            y=df['comfort_score'], 
+            mode='lines',
+            name=t['comfort'],
+            line=dict(color='#f39c12', width=2.5),
+            **area_fill('rgba(243, 156, 18, 0.1)'),
+            hovertemplate='<b>Score: %{y}</b><br>%{x|%d-%m-%Y %H:%M:%S}<extra></extra>',
+            connectgaps=True
+        ),
+        row=5, col=1
+    )
+    
+    # Bereken dynamische Y-axis ranges met padding
+    # Bij buckets de echte extremen gebruiken in plaats van de gemiddelden
+    temp_min, temp_max = df.get('temperature_min', df['temperature']).min(), df.get('temperature_max', df['temperature']).max()
+    temp_range = [max(0, temp_min - 5), temp_max + 5]
+    
+    hum_range = [0, 100]  # Humidity blijft altijd 0-100%
+    
+    dewpoint_data = df['dewpoint'] if 'dewpoint' in df.columns else df['temperature'] - ((100 - df['humidity']) / 5.0)
+    dew_min, dew_max = df.get('dewpoint_min', dewpoint_data).min(), df.get('dewpoint_max', dewpoint_data).max()
+    dew_range = [max(0, dew_min - 5), dew_max + 5]
+    
+    abs_min, abs_max = df.get('absolute_humidity_min', abs_hum_data).min(), df.get('absolute_humidity_max', abs_hum_data).max()
+    abs_range = [max(0, abs_min - 2), abs_max + 2]
+    
+    fig.update_xaxes(type='date')
+    fig.update_xaxes(
+        title_text=t['time'], 
+        row=5, col=1,
+        showgrid=True,
+        gridcolor='rgba(0,0,0,0.05)'
+    )
+    fig.update_yaxes(
+        title_text=f"{t['temperature']} (°C)", 
+        row=1, col=1,
+        showgrid=True,
+        gridcolor='rgba(0,0,0,0.05)',
+        range=temp_range
+    )
+    fig.update_yaxes(
+        title_text=f"{t['humidity']} (%)", 
+        row=2, col=1,
+        showgrid=True,
+        gridcolor='rgba(0,0,0,0.05)',
+        range=hum_range
+    )
+    fig.update_yaxes(
+        title_text=f"{t['dewpoint']} (°C)", 
+        row=3, col=1,
+        showgrid=True,
+        gridcolor='rgba(0,0,0,0.05)',
+        range=dew_range
+    )
+    fig.update_yaxes(
+        title_text=f"{t['abs_humidity']} (g/m³)", 
+        row=4, col=1,
+        showgrid=True,
+        gridcolor='rgba(0,0,0,0.05)',
+        range=abs_range
+    )
+    fig.update_yaxes(
+        title_text=t['score'], 
+        row=5, col=1,
+        showgrid=True,
+        gridcolor='rgba(0,0,0,0.05)',
+        range=[-0.5, 6.5],
+        tickmode='linear',
+        tick0=0,
+        dtick=1
+    )
+    
+    fig.update_layout(
+        height=1100,
+        showlegend=False,
+        hovermode='x unified',
+        plot_bgcolor='rgba(0,0,0,0.02)',
+        paper_bgcolor='white',
+        margin=dict(l=60, r=30, t=50, b=40),
+        hoverlabel=dict(
+            bgcolor="white",
+            font_size=14,
+            font_family="Arial, sans-serif",
+            font_color="#2c3e50",
+            bordercolor="#2c3e50",
+            align="left"
+        ),
+        uirevision='constant'  # Behoud UI state (zoom/pan) tussen updates
+    )
+    
+    if bucket_seconds is None and INGEST_COMPRESSION == 'deadband':
+        # Deadband opslag: een waarde geldt tot de volgende bewaarde meting
+        fig.update_traces(line_shape='hv')
+    
+    report_progress(3)
+    return encode_figure_arrays(fig), f"📊 {total_count} {t['measurements']}"
+
+
+def build_historical_data(range_value, lang, set_progress=None):
+    """Laad historische data voor een periode (preset of custom), geeft de store data en slider instellingen terug
+    
+    set_progress (background callbacks) ontvangt een voortgangstekst per stap.
+    """
+    if lang is None:
+        lang = 'nl'
+    
+    t = TRANSLATIONS[lang]
+    
+    def report_progress(step):
+        if set_progress is not None:
+            set_progress(f"⏳ {t['loading']} ({step}/2)")
+    
+    # Als geen range geselecteerd, verberg slider
+    if range_value is None:
+        return None, 0, 100, 0, {}, {'display': 'none'}
+    
+    try:
+        # Bepaal start en eind tijden op basis van type
+        time_range = resolve_time_range(range_value)
+        if time_range is None:
+            return None, 0, 100, 0, {}, {'display': 'none'}
+        start_dt, end_dt = time_range
+        report_progress(1)
+        
+        # Haal data op uit database
+        conn = sqlite3.connect(DB_FILE)
+        cursor = conn.cursor()
+        start_timestamp = int(start_dt.timestamp())
+        end_timestamp = int(end_dt.timestamp())
+        
+        # Bepaal tijdsverschil in minuten
+        time_diff_minutes = (end_dt - start_dt).total_seconds() / 60
+        
+        if time_diff_minutes > 1:
+            # Gemiddelde per minuut, berekend in SQLite (lege minuten komen niet terug)
+            query, table_count = build_bucket_query(cursor, ['temperature', 'humidity'], 60, start_timestamp, end_timestamp)
+            with track_query('historical_buckets') as tracked:
+                df = pd.read_sql_query(query, conn) if query else pd.DataFrame(columns=['bucket', 'temperature', 'humidity'])
+                tracked.rows = len(df)
+            df['timestamp'] = df['bucket'] * 60
+        else:
+            # Korte periode: ruwe metingen per seconde
+            columns = ['timestamp', 'temperature', 'humidity']
+            query, table_count = build_union_query(cursor, columns, start_timestamp, end_timestamp)
+            with track_query('historical_raw') as tracked:
+                df = pd.read_sql_query(query, conn) if query else pd.DataFrame(columns=columns)
+                tracked.rows = len(df)
+            df['timestamp'] = to_local_epochs(df['timestamp'].to_numpy())
+        
+        conn.close()
+        
+        if df.empty:
+            return None, 0, 100, 0, {}, {'display': 'none'}
+        
+        n_points = len(df)
+        record_points(n_points)
+        report_progress(2)
+        
+        # Maak slider marks met intelligente tijd labels
+        if time_diff_minutes <= 60:  # <= 1 uur: toon HH:MM
+            label_format = '%H:%M'
+            mark_count = min(10, n_points)
+        elif time_diff_minutes <= 1440:  # <= 1 dag: toon HH:MM
+            label_format = '%H:%M'
+            mark_count = min(12, n_points)
+        elif time_diff_minutes <= 10080:  # <= 1 week: toon DD-MM HH:MM
+            label_format = '%d-%m %H:%M'
+            mark_count = min(10, n_points)
+        else:  # > 1 week: toon DD-MM
+            label_format = '%d-%m'
+            mark_count = min(10, n_points)
+        
+        # Bereken mark indices
+        if n_points <= mark_count:
+            mark_indices = list(range(n_points))
+        else:
+            mark_indices = [int(i * (n_points - 1) / (mark_count - 1)) for i in range(mark_count)]
+        
+        marks = {}
+        for idx in mark_indices:
+            if idx < n_points:
+                marks[idx] = format_local_epoch(df['timestamp'].iloc[idx], label_format)
+        
+        # Sla data compact op in store: lokale epoch seconden + float32 arrays (base64)
+        # Tijdstempels worden pas in de browser geformatteerd, alleen voor het getoonde punt
+        local_epochs = df['timestamp'].to_numpy(dtype=np.int64)
+        data_dict = {
+            'count': n_points,
+            'time': encode_time_axis(local_epochs),
+            'temperatures': encode_typed_array(df['temperature'], 'f4'),
+            'humidities': encode_typed_array(df['humidity'], 'f4'),
+            'sampling_mode': 'minute' if time_diff_minutes > 1 else 'second',
+            'marker_label': t['historical_condition'],
+            'pressure': ATMOSPHERIC_PRESSURE
+        }
+        
+        return data_dict, 0, n_points - 1, 0, marks, {'display': 'block'}
+        
+    except Exception as e:
+        logger.error("Fout bij laden historische data: %s", e)
+        return None, 0, 100, 0, {}, {'display': 'none'}
 
 
 def register_callbacks(app):
     """Registreer alle callbacks aan de Dash app"""
+    # Zelfde als app.callback, maar elke callback wordt gemeten (zie metrics.py, /debug/perf)
+    callback = timed_callback(app)
     
-    @app.callback(
+    @callback(
         [Output('selected-language', 'data'),
          Output('page-title', 'children'),
          Output('label-temperature', 'children'),
@@ -35,21 +556,21 @@ def register_callbacks(app):
          Output('tooltip-content', 'children'),
          Output('time-range-dropdown', 'options'),
          Output('label-psychrometric-chart', 'children'),
-         Output('label-time-position', 'children')],
+         Output('label-time-position', 'children'),
+         Output('density-overlay-toggle', 'options'),
+         Output('live-labels-store', 'data')],
         [Input('language-selector', 'value')]
     )
     def update_language(lang):
         """Update alle labels op basis van geselecteerde taal"""
         try:
-            print(f"🌐 Language changed to: {lang}")  # Debug
+            logger.debug("Taal gewijzigd naar %s", lang)
             if lang is None or lang not in TRANSLATIONS:
+                logger.warning("Ongeldige taal %r, gebruik en", lang)
                 lang = 'en'
-                print(f"⚠️ Invalid language, defaulting to: {lang}")
             t = TRANSLATIONS[lang]
-        except Exception as e:
-            print(f"❌ Error in update_language: {e}")
-            import traceback
-            traceback.print_exc()
+        except Exception:
+            logger.exception("Fout in update_language")
             # Fallback to English
             lang = 'en'
             t = TRANSLATIONS[lang]
@@ -105,421 +626,158 @@ def register_callbacks(app):
             tooltip_content,
             dropdown_options,
             f"📐 {t['psychrometric_chart']}",
-            t['time_position']
+            t['time_position'],
+            [{'label': f" {t['density_overlay']}", 'value': 'density'}],
+            {
+                'comfort': [t[f'comfort_{score}'] for score in range(7)],
+                'current_condition': t['current_condition'],
+                'pressure': ATMOSPHERIC_PRESSURE
+            }
         )
     
-    @app.callback(
-        [Output('live-graph', 'figure'),
-         Output('data-count', 'children'),
-         Output('current-temp', 'children'),
+    # Callback voor de actuele waarden (cards) - lichtgewicht, elke seconde
+    @callback(
+        [Output('current-temp', 'children'),
          Output('current-humidity', 'children'),
          Output('current-dewpoint', 'children'),
          Output('current-abs-humidity', 'children'),
          Output('comfort-level', 'children'),
          Output('comfort-score', 'children'),
-         Output('comfort-icon', 'children'),
-         Output('graph-relayout-data', 'data')],
+         Output('comfort-icon', 'children')],
         [Input('graph-update', 'n_intervals'),
-         Input('time-range-dropdown', 'value'),
-         Input('live-graph', 'relayoutData'),
-         Input('selected-language', 'data')],
-        [State('graph-relayout-data', 'data')]
+         Input('selected-language', 'data')]
     )
-    def update_graph(n, time_range_minutes, relayout_data, lang, stored_relayout):
-        """Update grafieken en metingen op basis van tijdsbereik"""
+    def update_current_values(n, lang):
+        """Update de cards met de meest recente meting (LIMIT 1 lookup, geen range query)"""
         if lang is None:
             lang = 'nl'
         
         t = TRANSLATIONS[lang]
         
-        def get_comfort_level(temp, humidity):
-            """Bepaal comfort level op basis van Humidex"""
-            # Bereken Humidex
-            # Eerst dauwpunt berekenen
-            dewpoint = temp - ((100 - humidity) / 5.0)
-            dewpoint_kelvin = dewpoint + 273.15
-            
-            # Dampdrukverzadiging bij dauwpunt
-            e = 6.11 * math.exp(5417.7530 * ((1/273.16) - (1/dewpoint_kelvin)))
-            
-            # Humidex formule
-            humidex = temp + 0.5555 * (e - 10)
-            
-            # Comfort classificatie op basis van Humidex ranges
-            # Bron: Environment Canada Humidex schaal
-            if humidex < 20:
-                return t['comfort_0'], 0, "🥶", humidex  # Te koud
-            elif humidex < 27:
-                return t['comfort_4'], 4, "🙂", humidex  # Comfortabel koel
-            elif humidex < 30:
-                return t['comfort_5'], 5, "😊", humidex  # Comfortabel
-            elif humidex < 35:
-                return t['comfort_6'], 6, "✨", humidex  # Optimaal comfortabel
-            elif humidex < 40:
-                return t['comfort_3'], 3, "😓", humidex  # Enig ongemak
-            elif humidex < 46:
-                return t['comfort_2'], 2, "😟", humidex  # Veel ongemak, vermijd fysieke inspanning
-            elif humidex < 54:
-                return t['comfort_1'], 1, "🔥", humidex  # Gevaarlijk - hittekrampen mogelijk
-            else:
-                return t['comfort_0'], 0, "⚠️", humidex  # Heatstroke dreigend
+        try:
+            conn = sqlite3.connect(DB_FILE)
+            with track_query('latest') as tracked:
+                latest = get_latest_measurement(conn.cursor())
+                tracked.rows = int(latest is not None)
+            conn.close()
+        except Exception as e:
+            logger.error("Fout bij ophalen laatste meting: %s", e)
+            latest = None
         
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
+        if latest is None:
+            return "-- °C", "-- %", "-- °C", "-- g/m³", t['no_data'], "--", "❓"
         
-        # Haal totaal aantal metingen op (som over alle tabellen)
-        tables = get_all_measurement_tables(cursor)
-        total_count = 0
-        for table in tables:
-            result = cursor.execute(f'SELECT COUNT(*) FROM {table}').fetchone()
-            total_count += result[0] if result else 0
-        
-        # Bepaal tijdsfilter en bouw query
-        columns = ['timestamp', 'temperature', 'humidity', 'dewpoint', 'absolute_humidity']
-        
-        if time_range_minutes == -1:
-            # Alle data
-            query, table_count = build_union_query(cursor, columns)
-            if DEBUG_LOGGING:
-                print(f"📊 Query voor ALLE data - aantal tabellen: {table_count}")
-        else:
-            # Filter op tijdsbereik
-            cutoff_time = datetime.now() - timedelta(minutes=time_range_minutes)
-            cutoff_timestamp = int(cutoff_time.timestamp())
-            if DEBUG_LOGGING:
-                print(f"📊 Query voor laatste {time_range_minutes} minuten (vanaf {cutoff_time.strftime('%Y-%m-%d %H:%M:%S')})")
-            query, table_count = build_union_query(cursor, columns, start_timestamp=cutoff_timestamp)
-            if DEBUG_LOGGING:
-                print(f"   → Aantal relevante tabellen: {table_count}")
+        _, latest_temp, latest_humidity, latest_dewpoint, latest_abs_humidity = latest
         
-        if query:
-            df = pd.read_sql_query(query, conn)
-            if DEBUG_LOGGING:
-                print(f"   → Opgehaalde datapunten: {len(df)}")
-        else:
-            df = pd.DataFrame(columns=columns)
-            if DEBUG_LOGGING:
-                print("   ⚠️ Geen query gegenereerd (geen relevante tabellen)")
+        # Bereken afgeleide waarden als die niet in database zitten
+        if latest_dewpoint is None:
+            latest_dewpoint = dewpoint(latest_temp, latest_humidity)
+        if latest_abs_humidity is None:
+            latest_abs_humidity = absolute_humidity(latest_temp, latest_humidity)
         
-        conn.close()
+        comfort_text, comfort_score, comfort_icon, humidex = get_comfort_level(latest_temp, latest_humidity, t)
         
+        return f"{latest_temp:.1f} °C", f"{latest_humidity:.1f} %", f"{latest_dewpoint:.1f} °C", f"{latest_abs_humidity:.1f} g/m³", comfort_text, str(comfort_score), comfort_icon
+    
+    @callback(
+        [Output('live-graph', 'figure'),
+         Output('data-count', 'children'),
+         Output('graph-relayout-data', 'data')],
+        [Input('graph-refresh', 'n_intervals'),
+         Input('time-range-dropdown', 'value'),
+         Input('live-graph', 'relayoutData'),
+         Input('selected-language', 'data')],
+        [State('graph-relayout-data', 'data')]
+    )
+    def update_graph(n, time_range_minutes, relayout_data, lang, stored_relayout):
+        """Update grafieken voor korte tijdsbereiken (eigen refresh interval) en bewaar zoom/pan state"""
         # Update stored relayout data als er nieuwe zoom/pan data is
         if relayout_data and isinstance(relayout_data, dict) and any(key.startswith(('xaxis', 'yaxis')) for key in relayout_data.keys()):
             stored_relayout = relayout_data
         
-        if df.empty:
-            return go.Figure(), f"{total_count} {t['measurements']}", "-- °C", "-- %", "-- °C", "-- g/m³", t['no_data'], "--", "❓", stored_relayout
-        
-        # Converteer integer timestamps naar datetime objecten (lokale tijd)
-        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='s').dt.tz_localize('UTC').dt.tz_convert(TIMEZONE).dt.tz_localize(None)
-        
-        # Adaptive downsampling voor betere performance bij lange tijdsbereiken
-        # Houdt max ~1000-2000 punten voor snelle rendering
-        original_points = len(df)
-        if time_range_minutes > 60 or original_points > 5000:  # Meer dan 1 uur OF veel data
-            df = df.set_index('timestamp')
-            
-            if time_range_minutes == -1:  # Alle data: intelligente sampling
-                total_days = (df.index.max() - df.index.min()).total_seconds() / 86400
-                if total_days > 365:  # > 1 jaar: 1 dag gemiddelde
-                    df = df.resample('1D').mean()
-                elif total_days > 90:  # 3-12 maanden: 6 uur gemiddelde
-                    df = df.resample('6h').mean()
-                elif total_days > 30:  # 1-3 maanden: 2 uur gemiddelde
-                    df = df.resample('2h').mean()
-                else:  # < 1 maand: 1 uur gemiddelde
-                    df = df.resample('1h').mean()
-            elif time_range_minutes <= 360:  # 1-6 uur: 1 minuut
-                df = df.resample('1min').mean()
-            elif time_range_minutes <= 1440:  # 6-24 uur: 5 minuten
-                df = df.resample('5min').mean()
-            elif time_range_minutes <= 10080:  # 1-7 dagen: 15 minuten
-                df = df.resample('15min').mean()
-            elif time_range_minutes <= 43200:  # 1 maand: 1 uur
-                df = df.resample('1h').mean()
-            elif time_range_minutes <= 129600:  # 3 maanden: 3 uur
-                df = df.resample('3h').mean()
-            elif time_range_minutes <= 259200:  # 6 maanden: 6 uur
-                df = df.resample('6h').mean()
-            else:  # > 6 maanden: 1 dag
-                df = df.resample('1D').mean()
-            
-            df = df.dropna().reset_index()
-            
-            if DEBUG_LOGGING:
-                reduction = 100 * (1 - len(df)/original_points)
-                print(f"   → Downsampled: {original_points} → {len(df)} punten (-{reduction:.1f}%)")
-        
-        df['timestamp_formatted'] = df['timestamp'].dt.strftime('%d-%m-%Y %H:%M:%S')
-        
-        # Haal laatste waarden op
-        latest_temp = df['temperature'].iloc[-1]
-        latest_humidity = df['humidity'].iloc[-1]
-        latest_dewpoint = df['dewpoint'].iloc[-1] if 'dewpoint' in df.columns else latest_temp - ((100 - latest_humidity) / 5.0)
-        
-        # Bereken absolute humidity als die niet in database zit
-        if 'absolute_humidity' in df.columns:
-            latest_abs_humidity = df['absolute_humidity'].iloc[-1]
-        else:
-            latest_abs_humidity = (6.112 * math.exp((17.67 * latest_temp) / (latest_temp + 243.5)) * latest_humidity * 2.1674) / (273.15 + latest_temp)
-        
-        # Bereken comfort score voor elk datapunt
-        comfort_debug_counter = [0]  # Mutable counter voor closure
-        
-        def calculate_comfort_score(temp, hum):
-            """Bereken comfort score op basis van Humidex"""
-            try:
-                # Check voor NaN waarden
-                if pd.isna(temp) or pd.isna(hum):
-                    return None
-                
-                dewpoint = temp - ((100 - hum) / 5.0)
-                dewpoint_kelvin = dewpoint + 273.15
-                e = 6.11 * math.exp(5417.7530 * ((1/273.16) - (1/dewpoint_kelvin)))
-                humidex = temp + 0.5555 * (e - 10)
-                
-                if humidex < 20:
-                    score = 0
-                elif humidex < 27:
-                    score = 4
-                elif humidex < 30:
-                    score = 5
-                elif humidex < 35:
-                    score = 6
-                elif humidex < 40:
-                    score = 3
-                elif humidex < 46:
-                    score = 2
-                elif humidex < 54:
-                    score = 1
-                else:
-                    score = 0
-                
-                # Debug output alleen voor eerste 5 punten
-                if DEBUG_LOGGING and comfort_debug_counter[0] < 5:
-                    print(f"   Debug comfort #{comfort_debug_counter[0]+1}: T={temp:.1f}°C, RH={hum:.1f}%, Humidex={humidex:.1f}, Score={score}")
-                    comfort_debug_counter[0] += 1
-                
-                return score
-            except Exception as e:
-                if DEBUG_LOGGING:
-                    print(f"   Error calculating comfort score: {e}")
-                return None
-        
-        # Bereken comfort scores voor alle datapunten
-        df['comfort_score'] = df.apply(lambda row: calculate_comfort_score(row['temperature'], row['humidity']), axis=1)
-        
-        # Maak subplots
-        fig = make_subplots(
-            rows=5, cols=1,
-            subplot_titles=(f'🌡️ {t["temperature"]}', f'💧 {t["humidity"]}', f'💦 {t["dewpoint"]}', f'🌫️ {t["abs_humidity"]}', f'😊 {t["comfort"]}'),
-            vertical_spacing=0.08
-        )
-        
-        fig.add_trace(
-            go.Scatter(
-                x=df['timestamp'], 
-                y=df['temperature'],
-                mode='lines',
-                name=t['temperature'],
-                line=dict(color='#3498db', width=2.5),
-                fill='tozeroy',
-                fillcolor='rgba(52, 152, 219, 0.1)',
-                hovertemplate='<b>%{y:.1f}°C</b><br>%{customdata}<extra></extra>',
-                customdata=df['timestamp_formatted']
-            ),
-            row=1, col=1
-        )
-        
-        fig.add_trace(
-            go.Scatter(
-                x=df['timestamp'], 
-                y=df['humidity'], 
-                mode='lines',
-                name=t['humidity'],
-                line=dict(color='#e74c3c', width=2.5),
-                fill='tozeroy',
-                fillcolor='rgba(231, 76, 60, 0.1)',
-                hovertemplate='<b>%{y:.1f}%</b><br>%{customdata}<extra></extra>',
-                customdata=df['timestamp_formatted']
-            ),
-            row=2, col=1
-        )
-        
-        fig.add_trace(
-            go.Scatter(
-                x=df['timestamp'], 
-                y=df['dewpoint'] if 'dewpoint' in df.columns else df['temperature'] - ((100 - df['humidity']) / 5.0), 
-                mode='lines',
-                name=t['dewpoint'],
-                line=dict(color='#9b59b6', width=2.5),
-                fill='tozeroy',
-                fillcolor='rgba(155, 89, 182, 0.1)',
-                hovertemplate='<b>%{y:.1f}°C</b><br>%{customdata}<extra></extra>',
-                customdata=df['timestamp_formatted']
-            ),
-            row=3, col=1
-        )
+        # Lange tijdsbereiken worden door update_graph_long (background) verzorgd
+        if is_long_range(time_range_minutes):
+            return no_update, no_update, stored_relayout
         
-        # Bereken absolute humidity voor grafiek als niet aanwezig
-        if 'absolute_humidity' in df.columns:
-            abs_hum_data = df['absolute_humidity']
-        else:
-            # Correcte formule voor absolute vochtigheid
-            abs_hum_data = (6.112 * df['temperature'].apply(lambda temp: math.exp((17.67 * temp) / (temp + 243.5))) * df['humidity'] * 2.1674) / (273.15 + df['temperature'])
-        
-        fig.add_trace(
-            go.Scatter(
-                x=df['timestamp'], 
-                y=abs_hum_data,
-                mode='lines',
-                name=t['abs_humidity'],
-                line=dict(color='#16a085', width=2.5),
-                fill='tozeroy',
-                fillcolor='rgba(22, 160, 133, 0.1)',
-                hovertemplate='<b>%{y:.1f}g/m³</b><br>%{customdata}<extra></extra>',
-                customdata=df['timestamp_formatted']
-            ),
-            row=4, col=1
-        )
-        
-        # Comfort score grafiek met kleurcodering
-        fig.add_trace(
-            go.Scatter(
-                x=df['timestamp'], 
-                y=df['comfort_score'], 
-                mode='lines',
-                name=t['comfort'],
-                line=dict(color='#f39c12', width=2.5),
-                fill='tozeroy',
-                fillcolor='rgba(243, 156, 18, 0.1)',
-                hovertemplate='<b>Score: %{y}</b><br>%{customdata}<extra></extra>',
-                customdata=df['timestamp_formatted']
-            ),
-            row=5, col=1
-        )
-        
-        # Bereken dynamische Y-axis ranges met padding
-        temp_min, temp_max = df['temperature'].min(), df['temperature'].max()
-        temp_range = [max(0, temp_min - 5), temp_max + 5]
-        
-        hum_range = [0, 100]  # Humidity blijft altijd 0-100%
-        
-        dewpoint_data = df['dewpoint'] if 'dewpoint' in df.columns else df['temperature'] - ((100 - df['humidity']) / 5.0)
-        dew_min, dew_max = dewpoint_data.min(), dewpoint_data.max()
-        dew_range = [max(0, dew_min - 5), dew_max + 5]
-        
-        abs_min, abs_max = abs_hum_data.min(), abs_hum_data.max()
-        abs_range = [max(0, abs_min - 2), abs_max + 2]
-        
-        fig.update_xaxes(
-            title_text=t['time'], 
-            row=5, col=1,
-            showgrid=True,
-            gridcolor='rgba(0,0,0,0.05)'
-        )
-        fig.update_yaxes(
-            title_text=f"{t['temperature']} (°C)", 
-            row=1, col=1,
-            showgrid=True,
-            gridcolor='rgba(0,0,0,0.05)',
-            range=temp_range
-        )
-        fig.update_yaxes(
-            title_text=f"{t['humidity']} (%)", 
-            row=2, col=1,
-            showgrid=True,
-            gridcolor='rgba(0,0,0,0.05)',
-            range=hum_range
-        )
-        fig.update_yaxes(
-            title_text=f"{t['dewpoint']} (°C)", 
-            row=3, col=1,
-            showgrid=True,
-            gridcolor='rgba(0,0,0,0.05)',
-            range=dew_range
-        )
-        fig.update_yaxes(
-            title_text=f"{t['abs_humidity']} (g/m³)", 
-            row=4, col=1,
-            showgrid=True,
-            gridcolor='rgba(0,0,0,0.05)',
-            range=abs_range
-        )
-        fig.update_yaxes(
-            title_text=t['score'], 
-            row=5, col=1,
-            showgrid=True,
-            gridcolor='rgba(0,0,0,0.05)',
-            range=[-0.5, 6.5],
-            tickmode='linear',
-            tick0=0,
-            dtick=1
-        )
-        
-        fig.update_layout(
-            height=1100,
-            showlegend=False,
-            hovermode='x unified',
-            plot_bgcolor='rgba(0,0,0,0.02)',
-            paper_bgcolor='white',
-            margin=dict(l=60, r=30, t=50, b=40),
-            hoverlabel=dict(
-                bgcolor="white",
-                font_size=14,
-                font_family="Arial, sans-serif",
-                font_color="#2c3e50",
-                bordercolor="#2c3e50",
-                align="left"
-            ),
-            uirevision='constant'  # Behoud UI state (zoom/pan) tussen updates
-        )
-        
-        # Bepaal comfort level (retourneert nu ook humidex)
-        comfort_text, comfort_score, comfort_icon, humidex = get_comfort_level(latest_temp, latest_humidity)
+        figure, count_text = build_graph_figure(time_range_minutes, lang)
+        return figure, count_text, stored_relayout
+    
+    # Zware callbacks draaien in een worker proces als er een background manager is (zie background.py).
+    # Een nieuwe trigger (ander bereik) annuleert automatisch de job die nog loopt.
+    background_options = {'background': True, 'manager': background_manager} if background_manager is not None else {}
+    
+    def show_progress(component_id):
+        """Voortgangstekst voor een element, werkt zowel in background als in gewone callbacks"""
+        return lambda text: set_props(component_id, {'children': text})
+    
+    @callback(
+        [Output('live-graph', 'figure', allow_duplicate=True),
+         Output('data-count', 'children', allow_duplicate=True)],
+        [Input('graph-refresh-long', 'n_intervals'),
+         Input('time-range-dropdown', 'value'),
+         Input('selected-language', 'data')],
+        running=[(Output('graph-progress', 'style'), {'display': 'block'}, {'display': 'none'})],
+        prevent_initial_call='initial_duplicate',
+        **background_options
+    )
+    def update_graph_long(n, time_range_minutes, lang):
+        """Update grafieken voor lange tijdsbereiken (eigen, tragere refresh interval)"""
+        if not is_long_range(time_range_minutes):
+            return no_update, no_update
         
-        return fig, f"📊 {total_count} {t['measurements']}", f"{latest_temp:.1f} °C", f"{latest_humidity:.1f} %", f"{latest_dewpoint:.1f} °C", f"{latest_abs_humidity:.1f} g/m³", comfort_text, str(comfort_score), comfort_icon, stored_relayout
+        return build_graph_figure(time_range_minutes, lang, set_progress=show_progress('graph-progress'))
     
     # Callback voor psychrometric chart
-    @app.callback(
+    @callback(
         Output('psychrometric-chart', 'figure'),
         [Input('graph-update', 'n_intervals'),
-         Input('selected-language', 'data')]
+         Input('selected-language', 'data')],
+        [State('density-overlay-store', 'data')]
     )
-    def update_psychrometric_chart(n, lang):
-        """Update psychrometrisch diagram met actuele meetwaarden"""
+    def update_psychrometric_chart(n, lang, density):
+        """Update psychrometrisch diagram met actuele meetwaarden (alleen marker via Patch)"""
         if lang is None:
             lang = 'nl'
         
+        t = TRANSLATIONS[lang]
+        
+        # Volledige figure alleen bij eerste render of taalwissel, anders alleen de marker
+        full_figure = callback_context.triggered_id != 'graph-update'
+        
         # Haal laatste meting op uit database
         try:
             conn = sqlite3.connect(DB_FILE)
             cursor = conn.cursor()
             
-            # Zoek in meest recente tabel (laatste in lijst)
-            tables = get_all_measurement_tables(cursor)
-            if tables:
-                latest_table = tables[-1]  # Laatste tabel (meest recente datum)
-                query = f'SELECT temperature, humidity FROM {latest_table} ORDER BY timestamp DESC LIMIT 1'
-                df = pd.read_sql_query(query, conn)
-            else:
-                df = pd.DataFrame(columns=['temperature', 'humidity'])
+            # Zoek meest recente meting (geïndexeerde LIMIT 1 lookup)
+            with track_query('latest') as tracked:
+                latest = get_latest_measurement(cursor)
+                tracked.rows = int(latest is not None)
             
             conn.close()
-            
-            if not df.empty:
-                current_temp = df['temperature'].iloc[0]
-                current_rh = df['humidity'].iloc[0]
-                return create_psychrometric_chart(current_temp, current_rh, lang)
-            else:
-                # Geen data beschikbaar - toon leeg diagram
-                return create_psychrometric_chart(None, None, lang)
         except Exception as e:
-            print(f"Fout bij updaten psychrometric chart: {e}")
-            return create_psychrometric_chart(None, None, lang)
+            logger.error("Fout bij updaten psychrometric chart: %s", e)
+            latest = None
+        
+        if latest is None:
+            # Geen data beschikbaar - toon leeg diagram
+            return create_psychrometric_chart(None, None, lang, density=density) if full_figure else no_update
+        
+        current_temp = latest[1]
+        current_rh = latest[2]
+        
+        if full_figure:
+            return create_psychrometric_chart(current_temp, current_rh, lang, density=density)
+        
+        # Patch: stuur alleen de gewijzigde marker eigenschappen naar de browser
+        patched_figure = Patch()
+        marker_index = get_marker_index(lang)
+        for key, value in get_marker_properties(current_temp, current_rh, t['current_condition']).items():
+            patched_figure['data'][marker_index][key] = value
+        return patched_figure
     
     # Callback voor modal open/close
-    @app.callback(
+    @callback(
         Output('range-modal', 'style'),
         [Input('open-range-modal-btn', 'n_clicks'),
          Input('close-range-modal-btn', 'n_clicks'),
@@ -551,7 +809,7 @@ def register_callbacks(app):
             return {'display': 'none'}
     
     # Callback voor preset buttons en custom range - sluit ook modal
-    @app.callback(
+    @callback(
         [Output('selected-range-value', 'data'),
          Output('range-modal', 'style', allow_duplicate=True)],
         [Input('preset-5min', 'n_clicks'),
@@ -625,7 +883,7 @@ def register_callbacks(app):
         return no_update, no_update
     
     # Callback voor ophalen historische data bij range selectie
-    @app.callback(
+    @callback(
         [Output('historical-data-store', 'data'),
          Output('historical-time-slider', 'min'),
          Output('historical-time-slider', 'max'),
@@ -633,167 +891,142 @@ def register_callbacks(app):
          Output('historical-time-slider', 'marks'),
          Output('slider-container', 'style')],
         [Input('selected-range-value', 'data'),
-         Input('selected-language', 'data')]
+         Input('selected-language', 'data')],
+        running=[(Output('historical-progress', 'style'), {'display': 'block'}, {'display': 'none'})],
+        **background_options
     )
     def load_historical_data(range_value, lang):
         """Laad historische data voor geselecteerde periode (preset of custom)"""
-        if lang is None:
-            lang = 'nl'
-        
-        t = TRANSLATIONS[lang]
-        
-        # Als geen range geselecteerd, verberg slider
-        if range_value is None:
-            return None, 0, 100, 0, {}, {'display': 'none'}
+        return build_historical_data(range_value, lang, set_progress=show_progress('historical-progress'))
+    
+    # Callback voor de dichtheid overlay: één query + één gevectoriseerde binning stap
+    @callback(
+        Output('density-overlay-store', 'data'),
+        [Input('density-overlay-toggle', 'value'),
+         Input('selected-range-value', 'data')],
+        **background_options
+    )
+    def update_density_overlay(toggle_value, range_value):
+        """Bereken het temperatuur × vochtigheidsratio histogram voor de geselecteerde periode"""
+        if not toggle_value or 'density' not in toggle_value or range_value is None:
+            return None
         
         try:
-            # Bepaal start en eind tijden op basis van type
-            if range_value.get('type') == 'preset':
-                # Preset: gebruik minuten
-                minutes = range_value['minutes']
-                end_dt = datetime.now()
-                start_dt = end_dt - timedelta(minutes=minutes)
-            
-            elif range_value.get('type') == 'custom':
-                # Custom: gebruik specifieke datums en tijden
-                start_date = pd.to_datetime(range_value['start_date'])
-                start_dt = start_date.replace(
-                    hour=range_value['start_hour'],
-                    minute=range_value['start_minute'],
-                    second=0
-                )
-                
-                end_date = pd.to_datetime(range_value['end_date'])
-                end_dt = end_date.replace(
-                    hour=range_value['end_hour'],
-                    minute=range_value['end_minute'],
-                    second=59
-                )
-            else:
-                return None, 0, 100, 0, {}, {'display': 'none'}
+            time_range = resolve_time_range(range_value)
+            if time_range is None:
+                return None
+            start_dt, end_dt = time_range
             
-            # Haal data op uit database
             conn = sqlite3.connect(DB_FILE)
             cursor = conn.cursor()
-            start_timestamp = int(start_dt.timestamp())
-            end_timestamp = int(end_dt.timestamp())
-            
-            columns = ['timestamp', 'temperature', 'humidity']
-            query, table_count = build_union_query(cursor, columns, start_timestamp, end_timestamp)
-            
-            if query:
-                df = pd.read_sql_query(query, conn)
-            else:
-                df = pd.DataFrame(columns=columns)
             
+            # SQLite groepeert per (temperatuur, vochtigheid), Python krijgt alleen de unieke combinaties;
+            # gecomprimeerde opslag weegt elke rij met de tijd die de waarde geldt
+            max_interval = COMPRESSION_MAX_INTERVAL if INGEST_COMPRESSION != 'off' else None
+            query, table_count = build_density_query(cursor, int(start_dt.timestamp()), int(end_dt.timestamp()),
+                                                     max_interval)
+            with track_query('density') as tracked:
+                rows = cursor.execute(query).fetchall() if query else []
+                tracked.rows = len(rows)
             conn.close()
             
-            if df.empty:
-                return None, 0, 100, 0, {}, {'display': 'none'}
-            
-            # Converteer integer timestamps naar datetime objecten (lokale tijd)
-            df['timestamp'] = pd.to_datetime(df['timestamp'], unit='s').dt.tz_localize('UTC').dt.tz_convert(TIMEZONE).dt.tz_localize(None)
-            
-            # Bepaal tijdsverschil in minuten
-            time_diff_minutes = (end_dt - start_dt).total_seconds() / 60
-            
-            # Als range > 1 minuut, sample per minuut (anders per seconde)
-            if time_diff_minutes > 1:
-                # Resample naar 1 minuut intervals (gebruik mean voor aggregatie)
-                df = df.set_index('timestamp').resample('1min').mean().reset_index()
-                df = df.dropna()  # Verwijder lege minuten
-            
-            if df.empty:
-                return None, 0, 100, 0, {}, {'display': 'none'}
-            
-            n_points = len(df)
-            
-            # Maak slider marks met intelligente tijd labels
-            if time_diff_minutes <= 60:  # <= 1 uur: toon HH:MM
-                label_format = '%H:%M'
-                mark_count = min(10, n_points)
-            elif time_diff_minutes <= 1440:  # <= 1 dag: toon HH:MM
-                label_format = '%H:%M'
-                mark_count = min(12, n_points)
-            elif time_diff_minutes <= 10080:  # <= 1 week: toon DD-MM HH:MM
-                label_format = '%d-%m %H:%M'
-                mark_count = min(10, n_points)
-            else:  # > 1 week: toon DD-MM
-                label_format = '%d-%m'
-                mark_count = min(10, n_points)
-            
-            # Bereken mark indices
-            if n_points <= mark_count:
-                mark_indices = list(range(n_points))
-            else:
-                mark_indices = [int(i * (n_points - 1) / (mark_count - 1)) for i in range(mark_count)]
-            
-            marks = {}
-            for idx in mark_indices:
-                if idx < n_points:
-                    marks[idx] = df['timestamp'].iloc[idx].strftime(label_format)
+            if not rows:
+                return None
             
-            # Sla data op in store (converteer naar dict voor JSON serialization)
-            data_dict = {
-                'timestamps': df['timestamp'].dt.strftime('%Y-%m-%d %H:%M:%S').tolist(),
-                'temperatures': df['temperature'].tolist(),
-                'humidities': df['humidity'].tolist(),
-                'sampling_mode': 'minute' if time_diff_minutes > 1 else 'second'
-            }
+            data = np.array(rows, dtype=float)
+            density = compute_density_histogram(data[:, 0], data[:, 1], weights=data[:, 2])
             
-            return data_dict, 0, n_points - 1, 0, marks, {'display': 'block'}
+            if density:
+                logger.debug("Dichtheid overlay: %d combinaties, gewicht %d uit %d tabel(len)",
+                             len(rows), density['count'], table_count)
             
+            return density
         except Exception as e:
-            print(f"Fout bij laden historische data: {e}")
-            return None, 0, 100, 0, {}, {'display': 'none'}
+            logger.error("Fout bij berekenen dichtheid overlay: %s", e)
+            return None
     
-    # Callback voor het updaten van timestamp display en psychrometric chart bij slider beweging
-    @app.callback(
+    # Clientside callback: zet de overlay in de heatmap trace van het diagram
+    app.clientside_callback(
+        ClientsideFunction(namespace='historical', function_name='apply_density'),
+        Output('psychrometric-chart', 'figure', allow_duplicate=True),
+        [Input('density-overlay-store', 'data')],
+        [State('psychrometric-chart', 'figure')],
+        prevent_initial_call=True
+    )
+    
+    # Clientside callback: slider verplaatst alleen de marker trace (geen server round trip)
+    app.clientside_callback(
+        ClientsideFunction(namespace='historical', function_name='update_view'),
         [Output('slider-timestamp-display', 'children'),
          Output('psychrometric-chart', 'figure', allow_duplicate=True)],
         [Input('historical-time-slider', 'value'),
          Input('historical-time-slider', 'drag_value'),
-         Input('selected-language', 'data')],
-        [State('historical-data-store', 'data')],
+         Input('historical-data-store', 'data')],
+        [State('psychrometric-chart', 'figure')],
+        prevent_initial_call=True
+    )
+    
+    # Clientside callbacks voor de time-lapse (play/pause)
+    app.clientside_callback(
+        ClientsideFunction(namespace='historical', function_name='toggle_playback'),
+        [Output('historical-playback', 'disabled'),
+         Output('historical-play-btn', 'children')],
+        [Input('historical-play-btn', 'n_clicks')],
+        [State('historical-playback', 'disabled')],
+        prevent_initial_call=True
+    )
+    
+    app.clientside_callback(
+        ClientsideFunction(namespace='historical', function_name='advance_playback'),
+        [Output('historical-time-slider', 'value', allow_duplicate=True),
+         Output('historical-playback', 'disabled', allow_duplicate=True),
+         Output('historical-play-btn', 'children', allow_duplicate=True)],
+        [Input('historical-playback', 'n_intervals')],
+        [State('historical-time-slider', 'value'),
+         State('historical-time-slider', 'max')],
+        prevent_initial_call=True
+    )
+    
+    # Live stream: polling uit zolang de Server-Sent Events verbinding open is (start ook de verbinding),
+    # en kies tussen de gewone en de trage refresh interval op basis van het tijdsbereik
+    app.clientside_callback(
+        ClientsideFunction(namespace='live', function_name='toggle_polling'),
+        [Output('graph-update', 'disabled'),
+         Output('graph-refresh', 'disabled'),
+         Output('graph-refresh-long', 'disabled')],
+        [Input('live-stream-status', 'data'),
+         Input('time-range-dropdown', 'value')]
+    )
+    
+    # Live stream: nieuwe meting direct in cards, Mollier marker en grafiek verwerken (in de browser)
+    app.clientside_callback(
+        ClientsideFunction(namespace='live', function_name='update_cards'),
+        [Output('current-temp', 'children', allow_duplicate=True),
+         Output('current-humidity', 'children', allow_duplicate=True),
+         Output('current-dewpoint', 'children', allow_duplicate=True),
+         Output('current-abs-humidity', 'children', allow_duplicate=True),
+         Output('comfort-level', 'children', allow_duplicate=True),
+         Output('comfort-score', 'children', allow_duplicate=True),
+         Output('comfort-icon', 'children', allow_duplicate=True)],
+        [Input('live-sample-store', 'data')],
+        [State('live-labels-store', 'data')],
+        prevent_initial_call=True
+    )
+    
+    app.clientside_callback(
+        ClientsideFunction(namespace='live', function_name='update_marker'),
+        Output('psychrometric-chart', 'figure', allow_duplicate=True),
+        [Input('live-sample-store', 'data')],
+        [State('live-labels-store', 'data'),
+         State('psychrometric-chart', 'figure')],
+        prevent_initial_call=True
+    )
+    
+    app.clientside_callback(
+        ClientsideFunction(namespace='live', function_name='extend_graph'),
+        Output('live-graph', 'figure', allow_duplicate=True),
+        [Input('live-sample-store', 'data')],
+        [State('live-graph', 'figure'),
+         State('time-range-dropdown', 'value')],
         prevent_initial_call=True
     )
-    def update_historical_view(slider_value, drag_value, lang, stored_data):
-        """Update psychrometric chart met historische data punt - live tijdens slepen"""
-        # Gebruik drag_value tijdens het slepen, anders value
-        current_value = drag_value if drag_value is not None else slider_value
-        if lang is None:
-            lang = 'nl'
-        
-        t = TRANSLATIONS[lang]
-        
-        # Check of er data is
-        if stored_data is None or current_value is None:
-            return t['no_data_in_range'], create_psychrometric_chart(None, None, lang)
-        
-        try:
-            # Haal data op uit store
-            timestamps = stored_data['timestamps']
-            temperatures = stored_data['temperatures']
-            humidities = stored_data['humidities']
-            
-            # Valideer slider waarde
-            if current_value < 0 or current_value >= len(timestamps):
-                return t['no_data_in_range'], create_psychrometric_chart(None, None, lang)
-            
-            # Haal geselecteerd datapunt op
-            selected_timestamp = timestamps[current_value]
-            selected_temp = temperatures[current_value]
-            selected_humidity = humidities[current_value]
-            
-            # Format timestamp voor display
-            dt = pd.to_datetime(selected_timestamp)
-            timestamp_display = f"📅 {dt.strftime('%d-%m-%Y %H:%M:%S')}"
-            
-            # Creëer aangepast psychrometric chart met historisch punt
-            fig = create_psychrometric_chart_historical(selected_temp, selected_humidity, lang, t['historical_condition'])
-            
-            return timestamp_display, fig
-            
-        except Exception as e:
-            print(f"Fout bij updaten historische view: {e}")
-            return t['no_data_in_range'], create_psychrometric_chart(None, None, lang)
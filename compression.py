@@ -0,0 +1,220 @@
+"""Compressie bij het wegschrijven: alleen metingen bewaren die iets toevoegen
+
+Binnen (temperatuur en luchtvochtigheid veranderen traag) herhaalt het grootste deel van de 1 Hz
+metingen de vorige waarde. Twee methodes, per kolom met een eigen toegestane afwijking:
+
+- deadband: een meting wordt bewaard zodra een kolom meer dan de afwijking verschilt van de laatst
+  bewaarde meting; reconstructie is een trapfunctie (waarde geldt tot de volgende meting)
+- swinging_door: een punt wordt bewaard zodra een rechte lijn vanaf het laatst bewaarde punt niet
+  meer alle tussenliggende metingen binnen de afwijking kan volgen; reconstructie is lineair. Het
+  bewaarde punt ligt op die lijn (niet op de meting zelf), zodat de fout binnen de afwijking blijft
+
+Ongeacht de waarde wordt er minstens elke COMPRESSION_MAX_INTERVAL seconden een meting bewaard
+(heartbeat), zodat een gat in de data zichtbaar blijft en de grafiek bij blijft.
+"""
+import logging
+import os
+import pandas as pd
+from dotenv import load_dotenv
+from derived import dewpoint, absolute_humidity
+
+# Laad environment variabelen
+load_dotenv()
+logger = logging.getLogger(__name__)
+INGEST_COMPRESSION = os.getenv('INGEST_COMPRESSION', 'off').strip().lower()  # off, deadband of swinging_door
+COMPRESSION_TEMP_DEVIATION = float(os.getenv('COMPRESSION_TEMP_DEVIATION', '0.1'))  # °C
+COMPRESSION_HUMIDITY_DEVIATION = float(os.getenv('COMPRESSION_HUMIDITY_DEVIATION', '0.5'))  # %RH
+COMPRESSION_MAX_INTERVAL = int(os.getenv('COMPRESSION_MAX_INTERVAL', '300'))  # seconden
+
+COMPRESSION_MODES = ('off', 'deadband', 'swinging_door')
+# Kolomvolgorde van een meting (reader, get_latest_measurement)
+MEASUREMENT_COLUMNS = ('timestamp', 'temperature', 'humidity', 'dewpoint', 'absolute_humidity')
+# Afrondingsmarge: metingen zijn veelvouden van 0.1, 20.3 - 20.2 is in floating point net meer dan 0.1
+EPSILON = 1e-9
+
+if INGEST_COMPRESSION not in COMPRESSION_MODES:
+    logger.warning("Onbekende INGEST_COMPRESSION '%s' (verwacht: %s), compressie uitgeschakeld",
+                   INGEST_COMPRESSION, ', '.join(COMPRESSION_MODES))
+    INGEST_COMPRESSION = 'off'
+
+if COMPRESSION_TEMP_DEVIATION < 0 or COMPRESSION_HUMIDITY_DEVIATION < 0:
+    logger.warning("COMPRESSION_TEMP_DEVIATION en COMPRESSION_HUMIDITY_DEVIATION kunnen niet negatief zijn, gebruik 0")
+    COMPRESSION_TEMP_DEVIATION = max(0.0, COMPRESSION_TEMP_DEVIATION)
+    COMPRESSION_HUMIDITY_DEVIATION = max(0.0, COMPRESSION_HUMIDITY_DEVIATION)
+
+if COMPRESSION_MAX_INTERVAL < 1:
+    logger.warning("COMPRESSION_MAX_INTERVAL moet minimaal 1 zijn (%s), gebruik 1", COMPRESSION_MAX_INTERVAL)
+    COMPRESSION_MAX_INTERVAL = 1
+
+# Rijen zijn (timestamp, temperature, humidity, dewpoint, absolute_humidity); dauwpunt en absolute
+# vochtigheid volgen uit de twee gemeten kolommen
+COMPRESSED_COLUMNS = {1: COMPRESSION_TEMP_DEVIATION, 2: COMPRESSION_HUMIDITY_DEVIATION}
+
+
+class DeadbandCompressor:
+    """Bewaar een meting als een kolom meer dan de afwijking verschilt van de laatst bewaarde meting"""
+
+    def __init__(self, deviations, max_interval):
+        self.deviations = deviations
+        self.max_interval = max_interval
+        self.last_stored = None
+        self.last_row = None  # Laatst ontvangen meting
+
+    def offer(self, row):
+        """Nieuwe meting, geeft de lijst met te bewaren rijen terug (leeg of alleen deze meting)"""
+        last = self.last_stored
+        self.last_row = row
+        if (last is None or row[0] - last[0] >= self.max_interval or
+                any(abs(row[i] - last[i]) > deviation + EPSILON for i, deviation in self.deviations.items())):
+            self.last_stored = row
+            return [row]
+        return []
+
+    def flush(self):
+        """Sluit de reeks af (dag wissel, stoppen, fout): bewaar de laatste meting als die nog niet
+        bewaard is, zodat de trap daar eindigt. De volgende meting begint een nieuwe reeks."""
+        row = self.last_row
+        stored = [row] if row is not None and row is not self.last_stored else []
+        self.last_stored = None
+        self.last_row = None
+        return stored
+
+
+class SwingingDoorCompressor:
+    """Swinging door: bewaar het vorige punt zodra de 'deur' (toegestane hellingen) vanaf het laatst
+    bewaarde punt dichtklapt, zodat lineaire interpolatie tussen bewaarde punten binnen de afwijking blijft
+    """
+
+    def __init__(self, deviations, max_interval, complete_row=None):
+        self.deviations = deviations
+        self.max_interval = max_interval
+        self.complete_row = complete_row  # Herberekent afgeleide kolommen van een geprojecteerd punt
+        self.last_stored = None
+        self.held = None  # Laatst ontvangen meting, nog niet bewaard
+        self.slopes = {}
+
+    def _open_door(self):
+        self.slopes = {i: (float('-inf'), float('inf')) for i in self.deviations}
+
+    def _narrow(self, row):
+        """Beperk de hellingen met deze meting, False als de deur daardoor dicht gaat"""
+        elapsed = row[0] - self.last_stored[0]
+        slopes = {}
+        for i, deviation in self.deviations.items():
+            lower, upper = self.slopes[i]
+            lower = max(lower, (row[i] - deviation - EPSILON - self.last_stored[i]) / elapsed)
+            upper = min(upper, (row[i] + deviation + EPSILON - self.last_stored[i]) / elapsed)
+            if lower > upper:
+                return False
+            slopes[i] = (lower, upper)
+        self.slopes = slopes
+        return True
+
+    def _project(self, row):
+        elapsed = row[0] - self.last_stored[0]
+        projected = list(row)
+        for i, (lower, upper) in self.slopes.items():
+            projected[i] = round(self.last_stored[i] + (lower + upper) / 2 * elapsed, 3)
+        return tuple(self.complete_row(projected) if self.complete_row else projected)
+
+    def offer(self, row):
+        """Nieuwe meting, geeft de lijst met te bewaren rijen terug (leeg of het vorige punt)"""
+        if self.last_stored is None:
+            self.last_stored = row
+            self._open_door()
+            return [row]
+        if row[0] <= self.last_stored[0]:
+            return []  # Zelfde seconde als het laatst bewaarde punt
+
+        if self.held is not None and (row[0] - self.last_stored[0] > self.max_interval or not self._narrow(row)):
+            # Deur dicht (of heartbeat): vorige punt, op de middelste toegestane helling, bewaren en
+            # vanaf daar opnieuw beginnen
+            stored = self._project(self.held)
+            self.last_stored = stored
+            self.held = None
+            self._open_door()
+            if row[0] > stored[0]:
+                self._narrow(row)
+                self.held = row
+            return [stored]
+
+        if self.held is None:
+            self._narrow(row)
+        self.held = row
+        return []
+
+    def flush(self):
+        """Sluit de reeks af (dag wissel, stoppen, fout): bewaar het vastgehouden punt op de lijn,
+        zodat het niet later met een oude timestamp in een andere partitie belandt. De volgende
+        meting begint een nieuwe reeks."""
+        stored = [self._project(self.held)] if self.held is not None else []
+        self.last_stored = None
+        self.held = None
+        self.slopes = {}
+        return stored
+
+
+def reconstruct_series(df, previous, start_timestamp, end_timestamp, mode=None, latest=None):
+    """Vul een gecomprimeerde reeks aan tot het hele venster [start, end]
+    
+    df: bewaarde metingen (kolom timestamp eerst) vanaf start, previous: de laatst bewaarde meting
+    vóór start (of None), latest: de laatste ruwe meting (MEASUREMENT_COLUMNS, zie
+    get_latest_measurement) die nog niet bewaard hoeft te zijn. Het begin krijgt de waarde op start
+    (trap: vorige waarde, lineair: geïnterpoleerd). Het eind loopt door tot de laatste ruwe meting;
+    zonder die meting tot end, maar niet verder dan de heartbeat (daarna is het een echt gat), bij
+    swinging_door langs de helling van de laatste twee punten. Tussen de punten tekent de grafiek de
+    trap (line_shape 'hv') of de lijn zelf.
+    """
+    mode = mode or INGEST_COMPRESSION
+    columns = list(df.columns)
+    rows = []
+    if previous is not None and start_timestamp is not None and (df.empty or df['timestamp'].iloc[0] > start_timestamp):
+        values = list(previous[1:])
+        if mode == 'swinging_door' and not df.empty:
+            first = df.iloc[0]
+            fraction = (start_timestamp - previous[0]) / (first['timestamp'] - previous[0])
+            values = [value + (first[column] - value) * fraction for column, value in zip(columns[1:], values)]
+        rows.append([start_timestamp] + values)
+    head = pd.DataFrame(rows, columns=columns)
+    
+    tail = pd.DataFrame(columns=columns)
+    last = head if df.empty else df
+    if not last.empty:
+        last_row = last.iloc[-1]
+        if latest is not None and last_row['timestamp'] < latest[0] <= end_timestamp:
+            # Nog niet bewaarde meting: de reeks eindigt op de echte laatste waarde
+            values = dict(zip(MEASUREMENT_COLUMNS, latest))
+            tail = pd.DataFrame([[latest[0]] + [values[column] for column in columns[1:]]], columns=columns)
+        else:
+            # Heartbeat telt vanaf de laatst bewaarde meting (ook als dat de meting vóór het venster is)
+            stored_timestamp = previous[0] if df.empty else int(last_row['timestamp'])
+            tail_timestamp = min(end_timestamp, stored_timestamp + COMPRESSION_MAX_INTERVAL)
+            if tail_timestamp > last_row['timestamp']:
+                values = list(last_row[columns[1:]])
+                before = df.iloc[-2] if len(df) >= 2 else None
+                if mode == 'swinging_door' and before is not None and before['timestamp'] < last_row['timestamp']:
+                    fraction = (tail_timestamp - last_row['timestamp']) / (last_row['timestamp'] - before['timestamp'])
+                    values = [value + (value - before[column]) * fraction for column, value in zip(columns[1:], values)]
+                tail = pd.DataFrame([[tail_timestamp] + values], columns=columns)
+    
+    parts = [part for part in (head, df, tail) if not part.empty]
+    if not parts:
+        return df
+    return pd.concat(parts, ignore_index=True).astype(df.dtypes.to_dict() if not df.empty else 'float64')
+
+
+def _complete_row(row):
+    """Dauwpunt en absolute vochtigheid opnieuw afleiden uit temperatuur en luchtvochtigheid"""
+    row[3] = dewpoint(row[1], row[2])
+    row[4] = absolute_humidity(row[1], row[2])
+    return row
+
+
+def create_compressor(mode=None):
+    """Compressor voor INGEST_COMPRESSION (of mode), None als compressie uit staat"""
+    mode = mode or INGEST_COMPRESSION
+    if mode == 'deadband':
+        return DeadbandCompressor(COMPRESSED_COLUMNS, COMPRESSION_MAX_INTERVAL)
+    if mode == 'swinging_door':
+        return SwingingDoorCompressor(COMPRESSED_COLUMNS, COMPRESSION_MAX_INTERVAL, _complete_row)
+    return None
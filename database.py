@@ -1,29 +1,109 @@
+import logging
 import sqlite3
 import os
+import threading
+import time
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
+from timeutils import local_timestamp_sql, to_local_epoch
 
 # Laad environment variabelen
 load_dotenv()
+logger = logging.getLogger(__name__)
 
 # Database configuratie
 DB_FILE = os.getenv('DATABASE_FILE', 'src/modbus_sensor_data.db')
 DATA_RETENTION_DAYS = int(os.getenv('DATA_RETENTION_DAYS', '0'))  # 0 = oneindig, anders aantal dagen
-DEBUG_LOGGING = os.getenv('DEBUG_LOGGING', 'False').lower() == 'true'
+PARTITION_COMPACTION = os.getenv('PARTITION_COMPACTION', 'True').lower() == 'true'
+RETENTION_TIERS_SETTING = os.getenv('RETENTION_TIERS', '').strip()  # Bijv. raw:30,1m:365,1h:0
+
+TABLE_PREFIX = 'measurements_'
+# Partitie granulariteit op basis van de lengte van de datum in de naam
+DAY_FORMAT = '%Y%m%d'     # measurements_YYYYMMDD, de tabel waarin geschreven wordt
+MONTH_FORMAT = '%Y%m'     # measurements_YYYYMM, samengevoegde dagen van een afgesloten maand
+INSERT_COLUMNS = 'timestamp, temperature, humidity, dewpoint, absolute_humidity'
+# Een partitie is afgesloten als de periode voorbij is en de laatste batch commit (max 30 s) zeker is geschreven
+CLOSED_PARTITION_GRACE = 300  # seconden
+
+# Rollup tiers: één tabel per bucket grootte (rollup_<seconden>), bewust buiten het measurements_ patroon
+ROLLUP_PREFIX = 'rollup_'
+ROLLUP_COLUMNS = ['temperature', 'humidity', 'dewpoint', 'absolute_humidity']
+DURATION_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+# Per transactie samengevatte periode, zodat de Modbus thread nooit lang op de schrijflock wacht
+ROLLUP_CHUNK_SECONDS = 86400
 
 if DATA_RETENTION_DAYS < 0:
-    print(f"Waarschuwing: DATA_RETENTION_DAYS kan niet negatief zijn ({DATA_RETENTION_DAYS}), gebruik 0 voor oneindig")
+    logger.warning("DATA_RETENTION_DAYS kan niet negatief zijn (%s), gebruik 0 voor oneindig", DATA_RETENTION_DAYS)
     DATA_RETENTION_DAYS = 0
 
 
+def _parse_retention_tiers(setting):
+    """'raw:30,1m:365,1h:0' -> (dagen ruwe data, [(bucket seconden, dagen), ...]), ValueError bij ongeldige waarde
+    
+    Dagen 0 = oneindig. Elke tier moet een veelvoud zijn van de vorige (en van 60 s), zodat buckets netjes
+    in elkaar passen, ook op lokale tijd (tijdzone offsets zijn hele kwartieren).
+    """
+    entries = [entry.strip().lower() for entry in setting.split(',') if entry.strip()]
+    if len(entries) < 2 or not entries[0].startswith('raw:'):
+        raise ValueError('verwacht raw:<dagen> gevolgd door minstens één <bucket>:<dagen>')
+
+    raw_days = int(entries[0][4:])
+    tiers = []
+    for entry in entries[1:]:
+        resolution, _, days = entry.partition(':')
+        if resolution[-1:] in DURATION_UNITS:
+            seconds = int(resolution[:-1]) * DURATION_UNITS[resolution[-1]]
+        else:
+            seconds = int(resolution)
+        days = int(days)
+        if seconds < 60 or seconds % 60 or (tiers and seconds % tiers[-1][0]) or days < 0:
+            raise ValueError(f"ongeldige tier '{entry}'")
+        tiers.append((seconds, days))
+    if raw_days < 0:
+        raise ValueError('raw dagen kan niet negatief zijn')
+    return raw_days, tiers
+
+
+RETENTION_TIERS = []
+if RETENTION_TIERS_SETTING:
+    try:
+        _raw_days, RETENTION_TIERS = _parse_retention_tiers(RETENTION_TIERS_SETTING)
+        if DATA_RETENTION_DAYS and DATA_RETENTION_DAYS != _raw_days:
+            logger.warning("DATA_RETENTION_DAYS (%s) wordt genegeerd, RETENTION_TIERS bepaalt de bewaartijd van "
+                           "ruwe data (%s dagen)", DATA_RETENTION_DAYS, _raw_days)
+        DATA_RETENTION_DAYS = _raw_days
+    except ValueError as e:
+        logger.warning("Ongeldige RETENTION_TIERS '%s' (%s), tiered retentie uitgeschakeld", RETENTION_TIERS_SETTING, e)
+        RETENTION_TIERS = []
+
+
 def get_table_name(date=None):
     """Genereer tabel naam voor specifieke datum (table-per-day partitioning)"""
     if date is None:
         date = datetime.now()
-    return f"measurements_{date.strftime('%Y%m%d')}"
+    return f"{TABLE_PREFIX}{date.strftime(DAY_FORMAT)}"
+
 
+def get_month_table_name(date):
+    """Genereer tabel naam voor de maandpartitie van een datum"""
+    return f"{TABLE_PREFIX}{date.strftime(MONTH_FORMAT)}"
 
-def ensure_table_exists(cursor, table_name):
+
+def _parse_partition(table_name):
+    """Begin datum en granulariteit ('day' of 'month') uit een tabel naam, ValueError bij ongeldige naam"""
+    date_str = table_name[len(TABLE_PREFIX):] if table_name.startswith(TABLE_PREFIX) else ''
+    if len(date_str) == 8:
+        return datetime.strptime(date_str, DAY_FORMAT), 'day'
+    if len(date_str) == 6:
+        return datetime.strptime(date_str, MONTH_FORMAT), 'month'
+    raise ValueError(f"Geen partitie tabel: {table_name}")
+
+
+def _next_month(date):
+    return (date.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def ensure_table_exists(cursor, table_name, with_index=True):
     """Maak tabel aan als deze nog niet bestaat"""
     cursor.execute(f'''
         CREATE TABLE IF NOT EXISTS {table_name} (
@@ -35,13 +115,90 @@ def ensure_table_exists(cursor, table_name):
             absolute_humidity REAL
         )
     ''')
-    cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_{table_name}_timestamp ON {table_name}(timestamp)')
+    if with_index:
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_{table_name}_timestamp ON {table_name}(timestamp)')
+
+
+# Tabellijst per database bestand, geldig zolang het schema niet wijzigt (PRAGMA schema_version)
+_table_list_cache = {}
+_table_list_lock = threading.Lock()
 
 
 def get_all_measurement_tables(cursor):
-    """Haal alle measurements tabellen op (gesorteerd op datum)"""
-    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name LIKE 'measurements_%' ORDER BY name")
-    return [row[0] for row in cursor.fetchall()]
+    """Haal alle measurements tabellen op (gesorteerd op datum, een maand vóór zijn eigen dagen)
+    
+    sqlite_master wordt alleen opnieuw gelezen als het schema gewijzigd is (nieuwe dag, compactie, cleanup).
+    """
+    database_file, schema_version = cursor.execute(
+        "SELECT (SELECT file FROM pragma_database_list WHERE name = 'main'), "
+        "(SELECT schema_version FROM pragma_schema_version)"
+    ).fetchone()
+    with _table_list_lock:
+        cached = _table_list_cache.get(database_file)
+    if cached is not None and cached[0] == schema_version:
+        return list(cached[1])
+
+    cursor.execute(f"SELECT name FROM sqlite_master WHERE type='table' AND name LIKE '{TABLE_PREFIX}%' ORDER BY name")
+    tables = [row[0] for row in cursor.fetchall()]
+    with _table_list_lock:
+        _table_list_cache[database_file] = (schema_version, tuple(tables))
+    return tables
+
+
+def get_table_bounds(table_name):
+    """Bepaal begin en eind (epoch seconden) van de periode die een tabel bevat (dag of maand), ValueError bij ongeldige naam"""
+    table_date, granularity = _parse_partition(table_name)
+    table_end = table_date + timedelta(days=1) if granularity == 'day' else _next_month(table_date)
+    return int(table_date.timestamp()), int(table_end.timestamp())
+
+
+def get_partition_version(cursor, table_name):
+    """Goedkope versie van de inhoud van een afgesloten partitie: (laagste, hoogste) rowid
+    
+    Afgesloten partities veranderen alleen door retentie (oudste rijen weg) of door compactie van
+    nagekomen dagen (rijen erbij); beide veranderen deze versie. Twee index lookups, geen scan.
+    """
+    return cursor.execute(
+        f'SELECT (SELECT MIN(rowid) FROM {table_name}), (SELECT MAX(rowid) FROM {table_name})'
+    ).fetchone()
+
+
+# Aantal rijen van afgesloten partities: {(tabel, versie): aantal}
+_partition_counts = {}
+_partition_counts_lock = threading.Lock()
+
+
+def is_closed_partition(table_name, now=None):
+    """Partitie waarin niet meer geschreven wordt (periode voorbij plus de laatste batch commit)"""
+    try:
+        return get_table_bounds(table_name)[1] + CLOSED_PARTITION_GRACE < (now or time.time())
+    except ValueError:
+        return False
+
+
+def count_measurements(cursor):
+    """Totaal aantal metingen; COUNT(*) alleen voor open partities en gewijzigde afgesloten partities"""
+    now = time.time()
+    total = 0
+    current = {}
+    for table_name in get_all_measurement_tables(cursor):
+        if not is_closed_partition(table_name, now):
+            total += cursor.execute(f'SELECT COUNT(*) FROM {table_name}').fetchone()[0]
+            continue
+
+        key = (table_name, get_partition_version(cursor, table_name))
+        with _partition_counts_lock:
+            count = _partition_counts.get(key)
+        if count is None:
+            count = cursor.execute(f'SELECT COUNT(*) FROM {table_name}').fetchone()[0]
+        current[key] = count
+        total += count
+
+    # Alleen de huidige partities onthouden (verdwenen en gewijzigde vallen af)
+    with _partition_counts_lock:
+        _partition_counts.clear()
+        _partition_counts.update(current)
+    return total
 
 
 def get_tables_for_timerange(cursor, start_timestamp=None, end_timestamp=None):
@@ -54,10 +211,7 @@ def get_tables_for_timerange(cursor, start_timestamp=None, end_timestamp=None):
     relevant_tables = []
     for table_name in all_tables:
         try:
-            date_str = table_name.replace('measurements_', '')
-            table_date = datetime.strptime(date_str, '%Y%m%d')
-            table_start = int(table_date.timestamp())
-            table_end = int((table_date + timedelta(days=1)).timestamp())
+            table_start, table_end = get_table_bounds(table_name)
             
             # Check of tabel overlapt met gevraagde tijdsbereik
             if start_timestamp and table_end < start_timestamp:
@@ -72,37 +226,109 @@ def get_tables_for_timerange(cursor, start_timestamp=None, end_timestamp=None):
     return relevant_tables if relevant_tables else all_tables
 
 
+# Laatste ruwe meting van de Modbus thread in dit proces; met INGEST_COMPRESSION kan de laatst
+# bewaarde meting tot COMPRESSION_MAX_INTERVAL (plus de batch commit) achterlopen
+_latest_sample = None
+
+
+def set_latest_sample(row):
+    """Onthoud de laatste meting (timestamp, temperature, humidity, dewpoint, absolute_humidity), vanuit de Modbus thread"""
+    global _latest_sample
+    _latest_sample = row
+
+
+def get_latest_measurement(cursor):
+    """Haal de meest recente meting op via een geïndexeerde LIMIT 1 lookup (nieuwste tabel eerst)
+    
+    De laatste ruwe meting van de Modbus thread gaat voor als die nieuwer is dan de database.
+    """
+    sample = _latest_sample
+    for table_name in reversed(get_all_measurement_tables(cursor)):
+        row = cursor.execute(
+            f'SELECT timestamp, temperature, humidity, dewpoint, absolute_humidity '
+            f'FROM {table_name} ORDER BY timestamp DESC LIMIT 1'
+        ).fetchone()
+        if row:
+            return sample if sample is not None and sample[0] > row[0] else row
+    return sample
+
+
+def get_measurement_before(cursor, columns, timestamp, min_timestamp=None):
+    """Laatste meting vóór timestamp (en niet vóór min_timestamp), None als die er niet is"""
+    column_list = ', '.join(columns)
+    for table_name in reversed(get_all_measurement_tables(cursor)):
+        try:
+            table_start, table_end = get_table_bounds(table_name)
+        except ValueError:
+            continue
+        if table_start >= timestamp:
+            continue
+        if min_timestamp is not None and table_end <= min_timestamp:
+            break
+        row = cursor.execute(
+            f'SELECT {column_list} FROM {table_name} WHERE timestamp < ? ORDER BY timestamp DESC LIMIT 1', (timestamp,)
+        ).fetchone()
+        if row:
+            return row if min_timestamp is None or row[0] >= min_timestamp else None
+    return None
+
+
+def get_timestamp_bounds(cursor):
+    """Haal oudste en nieuwste timestamp op (geïndexeerde MIN/MAX op de eerste en laatste gevulde tabel)"""
+    tables = get_all_measurement_tables(cursor)
+    first = last = None
+    for table_name in tables:
+        first = cursor.execute(f'SELECT MIN(timestamp) FROM {table_name}').fetchone()[0]
+        if first is not None:
+            break
+    for table_name in reversed(tables):
+        last = cursor.execute(f'SELECT MAX(timestamp) FROM {table_name}').fetchone()[0]
+        if last is not None:
+            break
+    
+    # Met tiered retentie gaat de historie verder terug dan de ruwe partities
+    for bucket_seconds, _ in RETENTION_TIERS:
+        table_name = get_rollup_table_name(bucket_seconds)
+        try:
+            oldest, newest = cursor.execute(
+                f'SELECT (SELECT MIN(timestamp) FROM {table_name}), (SELECT MAX(timestamp) FROM {table_name})'
+            ).fetchone()
+        except sqlite3.OperationalError:
+            continue
+        if oldest is not None and (first is None or oldest < first):
+            first = oldest
+        if newest is not None and last is None:
+            last = newest
+    return first, last
+
+
+def _build_where_clause(start_timestamp=None, end_timestamp=None):
+    """Bouw WHERE clause voor een tijdsbereik (leeg als er geen grenzen zijn)"""
+    where_clauses = []
+    if start_timestamp:
+        where_clauses.append(f'timestamp >= {start_timestamp}')
+    if end_timestamp:
+        where_clauses.append(f'timestamp <= {end_timestamp}')
+    return f" WHERE {' AND '.join(where_clauses)}" if where_clauses else ''
+
+
 def build_union_query(cursor, columns, start_timestamp=None, end_timestamp=None, order_by='timestamp'):
     """Bouw UNION ALL query over relevante tabellen"""
     tables = get_tables_for_timerange(cursor, start_timestamp, end_timestamp)
     
     if not tables:
-        if DEBUG_LOGGING:
-            print("⚠️ build_union_query: Geen tabellen gevonden voor tijdsbereik")
+        logger.debug("build_union_query: Geen tabellen gevonden voor tijdsbereik")
         return None, None
     
-    if DEBUG_LOGGING:
-        print(f"🔍 build_union_query: Relevante tabellen: {tables}")
-        if start_timestamp:
-            print(f"   → Start timestamp: {start_timestamp} ({datetime.fromtimestamp(start_timestamp)})")
-        if end_timestamp:
-            print(f"   → End timestamp: {end_timestamp} ({datetime.fromtimestamp(end_timestamp)})")
+    logger.debug("build_union_query: Relevante tabellen: %s (start %s, eind %s)", tables, start_timestamp, end_timestamp)
     
     # Bouw SELECT queries voor elke tabel
     column_list = ', '.join(columns)
     queries = []
     
+    where_clause = _build_where_clause(start_timestamp, end_timestamp)
     for table in tables:
-        if start_timestamp or end_timestamp:
-            where_clauses = []
-            if start_timestamp:
-                where_clauses.append(f'timestamp >= {start_timestamp}')
-            if end_timestamp:
-                where_clauses.append(f'timestamp <= {end_timestamp}')
-            where_clause = ' AND '.join(where_clauses)
-            queries.append(f'SELECT {column_list} FROM {table} WHERE {where_clause}')
-        else:
-            queries.append(f'SELECT {column_list} FROM {table}')
+        queries.append(f'SELECT {column_list} FROM {table}{where_clause}')
     
     # Combineer met UNION ALL en sorteer
     full_query = ' UNION ALL '.join(queries)
@@ -112,6 +338,222 @@ def build_union_query(cursor, columns, start_timestamp=None, end_timestamp=None,
     return full_query, len(tables)
 
 
+def build_density_query(cursor, start_timestamp, end_timestamp, max_interval=None):
+    """Bouw de query voor de dichtheid overlay: (temperature, humidity, gewicht) per unieke combinatie
+
+    Metingen zijn veelvouden van 0.1, dus het aantal groepen is klein en alleen dat komt naar Python.
+    Zonder max_interval telt elke rij één keer (vast meetinterval). Met max_interval (gecomprimeerde
+    opslag) telt elke rij de seconden tot de volgende bewaarde rij, hooguit max_interval: de tijd die
+    de waarde geldt. De laatste rij van een partitie loopt door tot het eind van venster of partitie.
+    """
+    tables = get_tables_for_timerange(cursor, start_timestamp, end_timestamp)
+    if not tables:
+        return None, None
+
+    where_clause = _build_where_clause(start_timestamp, end_timestamp)
+    queries = []
+    for table in tables:
+        if max_interval is None:
+            queries.append(f'SELECT temperature, humidity, 1 AS weight FROM {table}{where_clause}')
+            continue
+        try:
+            _, table_end = get_table_bounds(table)
+        except ValueError:
+            table_end = int(time.time())
+        window_end = min(table_end, end_timestamp + 1) if end_timestamp else table_end
+        queries.append(
+            f'SELECT temperature, humidity, '
+            f'MIN(COALESCE(LEAD(timestamp) OVER (ORDER BY timestamp), MAX({window_end}, timestamp + 1)), '
+            f'timestamp + {int(max_interval)}) - timestamp AS weight '
+            f'FROM {table}{where_clause}'
+        )
+
+    full_query = (f"SELECT temperature, humidity, SUM(weight) FROM ({' UNION ALL '.join(queries)}) "
+                  f"GROUP BY temperature, humidity")
+    return full_query, len(tables)
+
+
+def get_bucket_seconds(time_range_minutes, span_days=0):
+    """Bepaal de bucket grootte (seconden) voor een tijdsbereik, None = ruwe metingen
+    
+    Houdt max ~1000-2000 punten per grafiek voor snelle rendering.
+    """
+    if time_range_minutes == -1:  # Alle data: op basis van de totale periode
+        if span_days > 365:  # > 1 jaar: 1 dag gemiddelde
+            return 86400
+        elif span_days > 90:  # 3-12 maanden: 6 uur gemiddelde
+            return 21600
+        elif span_days > 30:  # 1-3 maanden: 2 uur gemiddelde
+            return 7200
+        else:  # < 1 maand: 1 uur gemiddelde
+            return 3600
+    elif time_range_minutes <= 60:  # Tot 1 uur: ruwe data
+        return None
+    elif time_range_minutes <= 360:  # 1-6 uur: 1 minuut
+        return 60
+    elif time_range_minutes <= 1440:  # 6-24 uur: 5 minuten
+        return 300
+    elif time_range_minutes <= 10080:  # 1-7 dagen: 15 minuten
+        return 900
+    elif time_range_minutes <= 43200:  # 1 maand: 1 uur
+        return 3600
+    elif time_range_minutes <= 129600:  # 3 maanden: 3 uur
+        return 10800
+    elif time_range_minutes <= 259200:  # 6 maanden: 6 uur
+        return 21600
+    else:  # > 6 maanden: 1 dag
+        return 86400
+
+
+
+def build_partition_bucket_query(table_name, columns, bucket_seconds, where_clause=''):
+    """Bouw de aggregatie query voor één partitie
+    
+    Buckets zijn uitgelijnd op lokale tijd met de (DST-bewuste) offsets van deze partitie.
+    Resultaat kolommen: bucket, n, en per kolom <kolom>_sum, <kolom>_n, <kolom>_min, <kolom>_max.
+    """
+    try:
+        table_start, table_end = get_table_bounds(table_name)
+    except ValueError:
+        table_start = table_end = int(time.time())
+    bucket_expression = f'{local_timestamp_sql(table_start, table_end)} / {int(bucket_seconds)}'
+    aggregates = ', '.join(
+        f'SUM({column}) AS {column}_sum, COUNT({column}) AS {column}_n, '
+        f'MIN({column}) AS {column}_min, MAX({column}) AS {column}_max'
+        for column in columns
+    )
+    return f'SELECT {bucket_expression} AS bucket, COUNT(*) AS n, {aggregates} FROM {table_name}{where_clause} GROUP BY bucket'
+
+
+def get_rollup_table_name(bucket_seconds):
+    return f"{ROLLUP_PREFIX}{bucket_seconds}"
+
+
+def get_rollup_source(cursor, bucket_seconds):
+    """Grofste rollup tier waaruit buckets van bucket_seconds exact op te bouwen zijn
+    
+    Geeft (tabel, rolled_until) of None: alle ruwe data vóór rolled_until zit in de tabel.
+    """
+    candidates = [size for size, _ in RETENTION_TIERS if size <= bucket_seconds and bucket_seconds % size == 0]
+    if not candidates:
+        return None
+    size = max(candidates)
+    try:
+        row = cursor.execute('SELECT rolled_until FROM rollup_state WHERE bucket_seconds = ?', (size,)).fetchone()
+    except sqlite3.OperationalError:
+        return None  # Nog geen rollups (eerste start met RETENTION_TIERS)
+    return (get_rollup_table_name(size), row[0]) if row else None
+
+
+def build_rollup_bucket_query(cursor, table_name, columns, bucket_seconds, start_timestamp, end_timestamp):
+    """Bouw de aggregatie query over de rollup rijen met timestamp (begin van de tier bucket) in [start, end),
+    zelfde kolommen als build_partition_bucket_query"""
+    if start_timestamp is None:
+        start_timestamp = cursor.execute(f'SELECT MIN(timestamp) FROM {table_name}').fetchone()[0]
+        if start_timestamp is None:
+            return None
+    bucket_expression = f'{local_timestamp_sql(start_timestamp, end_timestamp)} / {int(bucket_seconds)}'
+    aggregates = ', '.join(
+        f'SUM({column}_sum) AS {column}_sum, SUM({column}_n) AS {column}_n, '
+        f'MIN({column}_min) AS {column}_min, MAX({column}_max) AS {column}_max'
+        for column in columns
+    )
+    return (f'SELECT {bucket_expression} AS bucket, SUM(n) AS n, {aggregates} FROM {table_name} '
+            f'WHERE timestamp >= {start_timestamp} AND timestamp < {end_timestamp} GROUP BY bucket')
+
+
+def _split_rollup_range(cursor, rollup_table, rolled_until, start_timestamp, end_timestamp):
+    """Verdeel [start, end] over een rollup tier en de ruwe partities: (head, rollup_start, rollup_end)
+
+    Een rollup rij is een hele tier bucket. Valt de eerste of laatste tier bucket maar deels in het
+    venster, dan komt dat deel uit de ruwe partities (head = (start, eind) inclusief, of None; de
+    staart vanaf rollup_end), zodat de buckets op start en end geknipt zijn. Is de ruwe data daar al
+    opgeruimd, dan telt de hele tier bucket mee.
+    """
+    tier_seconds = int(rollup_table[len(ROLLUP_PREFIX):])
+    rollup_start = start_timestamp
+    rollup_end = rolled_until if end_timestamp is None else min(rolled_until, end_timestamp + 1)
+    # Retentie verwijdert van oud naar nieuw: vanaf de oudste ruwe meting is de ruwe data compleet
+    raw_oldest = _oldest_timestamp(cursor, None)
+    head = None
+
+    if start_timestamp is not None:
+        aligned = _align_to_bucket(start_timestamp, tier_seconds)
+        if aligned < start_timestamp and raw_oldest is not None and raw_oldest <= start_timestamp:
+            # Tot de volgende rollup rij zit alle data in de tier bucket van start
+            next_row = cursor.execute(f'SELECT MIN(timestamp) FROM {rollup_table} WHERE timestamp > ?',
+                                      (start_timestamp,)).fetchone()[0]
+            rollup_start = min(rolled_until if next_row is None else next_row, rollup_end)
+            head = (start_timestamp, rollup_start - 1)
+        else:
+            rollup_start = aligned
+
+    if rollup_end < rolled_until:
+        aligned = _align_to_bucket(rollup_end, tier_seconds)
+        if aligned < rollup_end and raw_oldest is not None and raw_oldest <= aligned:
+            rollup_end = aligned if rollup_start is None else max(aligned, rollup_start)
+    return head, rollup_start, rollup_end
+
+
+def build_bucket_query(cursor, columns, bucket_seconds, start_timestamp=None, end_timestamp=None):
+    """Bouw een geaggregeerde query: gemiddelde/min/max/aantal per tijdsbucket, berekend in SQLite
+    
+    Elke partitie aggregeert eerst zelf (SUM/COUNT/MIN/MAX per bucket), daarna worden buckets die
+    over een daggrens lopen samengevoegd. Buckets zijn uitgelijnd op lokale tijd (TIMEZONE);
+    kolom 'bucket' * bucket_seconds is de lokale epoch van het begin van de bucket.
+    Met tiered retentie komt alles vóór de rollup watermark uit de passende rollup tier (zie
+    _split_rollup_range voor de deels in het venster vallende tier buckets).
+    Resultaat kolommen: bucket, count, en per kolom <kolom>, <kolom>_min, <kolom>_max.
+    """
+    queries = []
+    raw_start = start_timestamp
+    rollup = get_rollup_source(cursor, bucket_seconds)
+    if rollup is not None and (start_timestamp is None or start_timestamp < rollup[1]):
+        rollup_table, rolled_until = rollup
+        head, rollup_start, rollup_end = _split_rollup_range(cursor, rollup_table, rolled_until,
+                                                             start_timestamp, end_timestamp)
+        if head is not None:
+            where_clause = _build_where_clause(*head)
+            queries += [build_partition_bucket_query(table, columns, bucket_seconds, where_clause)
+                        for table in get_tables_for_timerange(cursor, *head)]
+        if rollup_start is None or rollup_start < rollup_end:
+            rollup_query = build_rollup_bucket_query(cursor, rollup_table, columns, bucket_seconds, rollup_start, rollup_end)
+            if rollup_query:
+                queries.append(rollup_query)
+        if queries:
+            raw_start = rollup_end
+    
+    tables = []
+    if end_timestamp is None or raw_start is None or raw_start <= end_timestamp:
+        tables = get_tables_for_timerange(cursor, raw_start, end_timestamp)
+    
+    if not tables and not queries:
+        logger.debug("build_bucket_query: Geen tabellen gevonden voor tijdsbereik")
+        return None, None
+    
+    logger.debug("build_bucket_query: %d tabel(len)%s, buckets van %ss", len(tables), ' + rollup' if queries else '',
+                 bucket_seconds)
+    
+    outer_aggregates = ', '.join(
+        f'SUM({column}_sum) / SUM({column}_n) AS {column}, '
+        f'MIN({column}_min) AS {column}_min, MAX({column}_max) AS {column}_max'
+        for column in columns
+    )
+    
+    where_clause = _build_where_clause(raw_start, end_timestamp)
+    queries += [
+        build_partition_bucket_query(table, columns, bucket_seconds, where_clause)
+        for table in tables
+    ]
+    
+    full_query = (
+        f'SELECT bucket, SUM(n) AS count, {outer_aggregates} '
+        f'FROM ({" UNION ALL ".join(queries)}) GROUP BY bucket ORDER BY bucket'
+    )
+    
+    return full_query, len(queries)
+
+
 def init_database():
     """Initialiseer database met partitioned table systeem"""
     try:
@@ -132,56 +574,314 @@ def init_database():
         # Maak tabel voor vandaag aan
         today_table = get_table_name()
         ensure_table_exists(cursor, today_table)
+        if RETENTION_TIERS:
+            ensure_rollup_tables(cursor)
         
         conn.commit()
         conn.close()
-        print(f"Database geïnitialiseerd: {DB_FILE} (WAL mode, partitioned)")
-        print(f"Actieve tabel: {today_table}")
+        logger.info("Database geïnitialiseerd: %s (WAL mode, partitioned)", DB_FILE)
+        logger.info("Actieve tabel: %s", today_table)
         if DATA_RETENTION_DAYS > 0:
-            print(f"Data retentie actief: {DATA_RETENTION_DAYS} dagen")
+            logger.info("Data retentie actief: %d dagen", DATA_RETENTION_DAYS)
         else:
-            print("Data retentie: oneindig (alle data wordt bewaard)")
+            logger.info("Data retentie: oneindig (alle data wordt bewaard)")
+        if RETENTION_TIERS:
+            tiers = ', '.join(f"{bucket_seconds}s {'oneindig' if days == 0 else f'{days} dagen'}"
+                              for bucket_seconds, days in RETENTION_TIERS)
+            logger.info("Rollup tiers: %s", tiers)
     except Exception as e:
-        print(f"FOUT: Kan database niet initialiseren: {e}")
-        print("Controleer schrijfrechten en of het bestand niet corrupt is.")
+        logger.error("Kan database niet initialiseren: %s. Controleer schrijfrechten en of het bestand niet corrupt is.", e)
         raise
 
 
 def cleanup_old_data():
-    """Verwijder oude data op basis van retention policy (DROP oude tabellen)"""
+    """Verwijder oude data op basis van retention policy (DROP oude tabellen)
+    
+    Dagtabellen gaan weg zodra hun dag vóór de cutoff begint. Maandtabellen gaan in zijn geheel weg
+    als de maand vóór de cutoff eindigt; van een deels verlopen maand worden de oude rijen verwijderd.
+    Met tiered retentie wordt eerst samengevat en gaat alleen data weg die al in de eerste tier zit.
+    """
     if DATA_RETENTION_DAYS == 0:
         return  # Geen cleanup als retentie oneindig is
     
     try:
         cutoff_date = datetime.now() - timedelta(days=DATA_RETENTION_DAYS)
+        cutoff_timestamp = int(cutoff_date.timestamp())
         conn = sqlite3.connect(DB_FILE, timeout=30)
         cursor = conn.cursor()
         
+        if RETENTION_TIERS:
+            rollup_partitions()
+            rolled_until = _get_rolled_until(cursor, RETENTION_TIERS[0][0])
+            if rolled_until is None:
+                conn.close()
+                logger.debug("cleanup_old_data: overgeslagen, ruwe data is nog niet samengevat")
+                return
+            cutoff_timestamp = min(cutoff_timestamp, rolled_until)
+        
         # Haal alle measurement tabellen op
         all_tables = get_all_measurement_tables(cursor)
         dropped_count = 0
         
         for table_name in all_tables:
-            # Parse datum uit tabel naam (measurements_YYYYMMDD)
+            # Parse datum uit tabel naam (measurements_YYYYMMDD of measurements_YYYYMM)
             try:
-                date_str = table_name.replace('measurements_', '')
-                table_date = datetime.strptime(date_str, '%Y%m%d')
-                
-                # Drop tabel als ouder dan retention period
-                if table_date < cutoff_date:
-                    cursor.execute(f'DROP TABLE IF EXISTS {table_name}')
-                    dropped_count += 1
-                    print(f"✓ Tabel {table_name} verwijderd (ouder dan {DATA_RETENTION_DAYS} dagen)")
+                table_date, granularity = _parse_partition(table_name)
+                table_start, table_end = get_table_bounds(table_name)
             except ValueError:
                 # Ongeldige tabel naam, skip
                 continue
+            
+            # Drop tabel als ouder dan retention period (met tiers alleen als de hele dag samengevat is)
+            if (granularity == 'day' and table_date < cutoff_date and not RETENTION_TIERS) or table_end <= cutoff_timestamp:
+                cursor.execute(f'DROP TABLE IF EXISTS {table_name}')
+                dropped_count += 1
+                logger.info("Tabel %s verwijderd (ouder dan %d dagen)", table_name, DATA_RETENTION_DAYS)
+            elif granularity == 'month' and table_start < cutoff_timestamp:
+                cursor.execute(f'DELETE FROM {table_name} WHERE timestamp < {cutoff_timestamp}')
+                if cursor.rowcount > 0:
+                    logger.info("%d metingen verwijderd uit %s (ouder dan %d dagen)", cursor.rowcount, table_name, DATA_RETENTION_DAYS)
         
+        conn.commit()
         if dropped_count > 0:
-            conn.commit()
             # VACUUM om ruimte vrij te geven
             cursor.execute('VACUUM')
-            print(f"Data cleanup voltooid: {dropped_count} tabel(len) verwijderd")
+            logger.info("Data cleanup voltooid: %d tabel(len) verwijderd", dropped_count)
+        
+        conn.close()
+    except Exception as e:
+        logger.warning("Data cleanup gefaald: %s", e)
+
+
+def compact_closed_months():
+    """Voeg de dagtabellen van afgesloten maanden samen tot één measurements_YYYYMM tabel per maand
+    
+    Per maand één transactie: de rijen worden dag voor dag op timestamp volgorde gekopieerd (de maand
+    is daarmee gesorteerd), daarna volgt één index en worden de dagtabellen verwijderd. Lezers zien
+    dankzij WAL óf de dagen óf de maand. Bestaat de maandtabel al (nagekomen dagen), dan worden de
+    dagen eraan toegevoegd. Geeft het aantal samengevoegde dagtabellen terug.
+    """
+    if not PARTITION_COMPACTION:
+        return 0
+    
+    conn = None
+    try:
+        conn = sqlite3.connect(DB_FILE, timeout=30)
+        conn.isolation_level = None  # Transacties zelf beheren
+        cursor = conn.cursor()
+        
+        # Dagtabellen per afgesloten maand (de lopende maand blijft in dagen, daar wordt nog in geschreven)
+        months = {}
+        for table_name in get_all_measurement_tables(cursor):
+            try:
+                table_date, granularity = _parse_partition(table_name)
+            except ValueError:
+                continue
+            month_table = get_month_table_name(table_date)
+            if granularity == 'day' and is_closed_partition(month_table):
+                months.setdefault(month_table, []).append(table_name)
+        
+        compacted = 0
+        for month_table, day_tables in sorted(months.items()):
+            start = time.perf_counter()
+            cursor.execute('BEGIN IMMEDIATE')
+            try:
+                ensure_table_exists(cursor, month_table, with_index=False)
+                existing = cursor.execute(f'SELECT COUNT(*) FROM {month_table}').fetchone()[0]
+                expected = rows = 0
+                for table_name in day_tables:
+                    expected += cursor.execute(f'SELECT COUNT(*) FROM {table_name}').fetchone()[0]
+                    cursor.execute(
+                        f'INSERT INTO {month_table} ({INSERT_COLUMNS}) '
+                        f'SELECT {INSERT_COLUMNS} FROM {table_name} ORDER BY timestamp'
+                    )
+                    rows += cursor.rowcount
+                # DROP TABLE is onherroepelijk: alleen als elke rij van de dagen in de maand staat
+                total = cursor.execute(f'SELECT COUNT(*) FROM {month_table}').fetchone()[0]
+                if rows != expected or total != existing + expected:
+                    raise RuntimeError(f'{month_table}: {rows} van {expected} metingen gekopieerd '
+                                       f'({total} in de maand, verwacht {existing + expected})')
+                # Index pas na het vullen: sneller dan bijwerken per rij (no-op als de maand al bestond)
+                ensure_table_exists(cursor, month_table)
+                for table_name in day_tables:
+                    cursor.execute(f'DROP TABLE {table_name}')
+                cursor.execute('COMMIT')
+            except Exception:
+                cursor.execute('ROLLBACK')
+                raise
+            compacted += len(day_tables)
+            logger.info("%d dagtabellen samengevoegd tot %s (%d metingen, %.1fs)",
+                        len(day_tables), month_table, rows, time.perf_counter() - start)
+        
+        return compacted
+    except Exception as e:
+        logger.warning("Compactie van dagtabellen gefaald: %s", e)
+        return 0
+    finally:
+        if conn is not None:
+            conn.close()
+
+
+def ensure_rollup_tables(cursor):
+    """Maak de rollup tiers en de watermark tabel aan (per bucket: n en per kolom som, aantal, min, max)"""
+    cursor.execute('CREATE TABLE IF NOT EXISTS rollup_state (bucket_seconds INTEGER PRIMARY KEY, rolled_until INTEGER NOT NULL)')
+    columns = ', '.join(f'{column}_sum REAL, {column}_n INTEGER, {column}_min REAL, {column}_max REAL'
+                        for column in ROLLUP_COLUMNS)
+    for bucket_seconds, _ in RETENTION_TIERS:
+        cursor.execute(f'CREATE TABLE IF NOT EXISTS {get_rollup_table_name(bucket_seconds)} '
+                       f'(timestamp INTEGER PRIMARY KEY, n INTEGER NOT NULL, {columns})')
+
+
+def _get_rolled_until(cursor, bucket_seconds):
+    try:
+        row = cursor.execute('SELECT rolled_until FROM rollup_state WHERE bucket_seconds = ?', (bucket_seconds,)).fetchone()
+    except sqlite3.OperationalError:
+        return None
+    return row[0] if row else None
+
+
+def _align_to_bucket(epoch, bucket_seconds):
+    """Laatste bucketgrens (op lokale tijd, zoals de grafieken) op of vóór epoch"""
+    return int(epoch) - to_local_epoch(epoch) % bucket_seconds
+
+
+def _build_rollup_insert(table_name, source, bucket_seconds, start, end, from_raw):
+    """INSERT die rijen uit source in [start, end) per bucket samenvat en samenvoegt met al bestaande buckets
+
+    timestamp van een rollup rij is het (UTC) begin van de bucket.
+    """
+    bucket_start = f'timestamp - {local_timestamp_sql(start, end)} % {bucket_seconds}'
+    if from_raw:
+        count = 'COUNT(*)'
+        aggregates = ', '.join(f'SUM({column}), COUNT({column}), MIN({column}), MAX({column})' for column in ROLLUP_COLUMNS)
+    else:
+        count = 'SUM(n)'
+        aggregates = ', '.join(f'SUM({column}_sum), SUM({column}_n), MIN({column}_min), MAX({column}_max)'
+                               for column in ROLLUP_COLUMNS)
+    target_columns = ', '.join(f'{column}_sum, {column}_n, {column}_min, {column}_max' for column in ROLLUP_COLUMNS)
+    merge = ', '.join(
+        f'{column}_sum = COALESCE({column}_sum, 0) + COALESCE(excluded.{column}_sum, 0), '
+        f'{column}_n = {column}_n + excluded.{column}_n, '
+        f'{column}_min = MIN(COALESCE({column}_min, excluded.{column}_min), COALESCE(excluded.{column}_min, {column}_min)), '
+        f'{column}_max = MAX(COALESCE({column}_max, excluded.{column}_max), COALESCE(excluded.{column}_max, {column}_max))'
+        for column in ROLLUP_COLUMNS
+    )
+    return (f'INSERT INTO {table_name} (timestamp, n, {target_columns}) '
+            f'SELECT {bucket_start} AS bucket_start, {count}, {aggregates} FROM {source} '
+            f'WHERE timestamp >= {start} AND timestamp < {end} GROUP BY bucket_start '
+            f'ON CONFLICT(timestamp) DO UPDATE SET n = n + excluded.n, {merge}')
+
+
+def _oldest_timestamp(cursor, source):
+    """Oudste timestamp in een rollup tier, of in de ruwe partities als source None is"""
+    if source is not None:
+        return cursor.execute(f'SELECT MIN(timestamp) FROM {source}').fetchone()[0]
+    for table_name in get_all_measurement_tables(cursor):
+        oldest = cursor.execute(f'SELECT MIN(timestamp) FROM {table_name}').fetchone()[0]
+        if oldest is not None:
+            return oldest
+    return None
+
+
+def rollup_partitions():
+    """Vat ruwe data samen in de rollup tiers (elke tier uit de vorige) en verwijder verlopen rollups
+    
+    Per tier schuift een watermark (rolled_until, altijd op een bucketgrens) op tot de data die zeker
+    geschreven is; alles daarvóór zit in de tier. Per transactie hooguit ROLLUP_CHUNK_SECONDS, zodat
+    de Modbus thread niet lang op de schrijflock wacht. Rijen van een tier worden pas verwijderd als
+    ze verlopen zijn én in de volgende tier zitten. Geeft het aantal bijgewerkte buckets terug.
+    """
+    if not RETENTION_TIERS:
+        return 0
+    
+    try:
+        conn = sqlite3.connect(DB_FILE, timeout=30)
+        conn.isolation_level = None  # Transacties zelf beheren
+        cursor = conn.cursor()
+        ensure_rollup_tables(cursor)
+        
+        buckets = 0
+        source = None  # None = ruwe partities, anders de vorige tier
+        source_until = int(time.time()) - CLOSED_PARTITION_GRACE
+        watermarks = []
+        for bucket_seconds, _ in RETENTION_TIERS:
+            table_name = get_rollup_table_name(bucket_seconds)
+            end = _align_to_bucket(source_until, bucket_seconds)
+            start = _get_rolled_until(cursor, bucket_seconds)
+            if start is None:
+                oldest = _oldest_timestamp(cursor, source)
+                start = end if oldest is None else min(_align_to_bucket(oldest, bucket_seconds), end)
+            
+            while start < end:
+                chunk_end = min(end, _align_to_bucket(start + max(ROLLUP_CHUNK_SECONDS, bucket_seconds), bucket_seconds))
+                cursor.execute('BEGIN IMMEDIATE')
+                try:
+                    # Een gelijktijdige rollup (cleanup in de Modbus thread) kan al verder zijn
+                    current = _get_rolled_until(cursor, bucket_seconds)
+                    if current is not None and current != start:
+                        cursor.execute('COMMIT')
+                        start = current
+                        continue
+                    if source is None:
+                        sources = [name for name in get_all_measurement_tables(cursor) if _overlaps(name, start, chunk_end)]
+                    else:
+                        sources = [source]
+                    for source_table in sources:
+                        cursor.execute(_build_rollup_insert(table_name, source_table, bucket_seconds, start, chunk_end,
+                                                            from_raw=source is None))
+                        buckets += max(cursor.rowcount, 0)
+                    cursor.execute('INSERT OR REPLACE INTO rollup_state (bucket_seconds, rolled_until) VALUES (?, ?)',
+                                   (bucket_seconds, chunk_end))
+                    cursor.execute('COMMIT')
+                except Exception:
+                    cursor.execute('ROLLBACK')
+                    raise
+                start = chunk_end
+            
+            watermarks.append(_get_rolled_until(cursor, bucket_seconds))
+            source, source_until = table_name, watermarks[-1] if watermarks[-1] is not None else start
+        
+        # Verlopen rollups verwijderen (de laatste tier heeft geen volgende tier om op te wachten)
+        now = int(time.time())
+        for i, (bucket_seconds, days) in enumerate(RETENTION_TIERS):
+            if days == 0:
+                continue
+            cutoff = now - days * 86400
+            if i + 1 < len(RETENTION_TIERS):
+                cutoff = min(cutoff, watermarks[i + 1] or 0)
+            cursor.execute(f'DELETE FROM {get_rollup_table_name(bucket_seconds)} WHERE timestamp < {cutoff}')
         
         conn.close()
+        logger.debug("rollup_partitions: %d buckets bijgewerkt, watermarks %s", buckets, watermarks)
+        return buckets
     except Exception as e:
-        print(f"Waarschuwing: Data cleanup gefaald: {e}")
+        logger.warning("Rollup van ruwe data gefaald: %s", e)
+        return 0
+
+
+def _overlaps(table_name, start, end):
+    try:
+        table_start, table_end = get_table_bounds(table_name)
+    except ValueError:
+        return False
+    return table_start < end and table_end > start
+
+
+_maintenance_lock = threading.Lock()
+
+
+def start_maintenance_thread(cleanup=False):
+    """Start (retentie cleanup,) rollups en compactie in de achtergrond (niet als er al onderhoud loopt)"""
+    if not (cleanup or RETENTION_TIERS or PARTITION_COMPACTION) or _maintenance_lock.locked():
+        return None
+    
+    def run():
+        with _maintenance_lock:
+            if cleanup:
+                cleanup_old_data()
+            rollup_partitions()
+            compact_closed_months()
+    
+    thread = threading.Thread(target=run, daemon=True, name='database-maintenance')
+    thread.start()
+    return thread
@@ -0,0 +1,110 @@
+"""Afgeleide grootheden (dauwpunt, absolute vochtigheid, humidex, comfort score) via lookup tabellen
+
+De XY-MD02 levert temperatuur en luchtvochtigheid als gehele tienden (register / 10), dus de exp()
+termen hoeven maar één keer per mogelijke invoerwaarde berekend te worden. De tabellen worden pas
+bij het eerste gebruik opgebouwd (NumPy, < 1 ms) en daarna met array indexering uitgelezen.
+
+Alle functies accepteren scalars en arrays; invoer wordt afgerond op de register resolutie (0.1).
+Waarden buiten het sensorbereik (of NaN) geven NaN.
+"""
+from functools import lru_cache
+import numpy as np
+
+# Sensorbereik in tienden (zelfde grenzen als de validatie in modbus_reader)
+TEMP_MIN_TENTHS = -500
+TEMP_MAX_TENTHS = 1000
+HUMIDITY_MIN_TENTHS = 0
+HUMIDITY_MAX_TENTHS = 1000
+
+# Dauwpunt = T - (100 - RH) / 5, in vijftigsten graad altijd geheel: 5 * T_tienden - (1000 - RH_tienden)
+DEWPOINT_MIN_FIFTIETHS = 5 * TEMP_MIN_TENTHS - (1000 - HUMIDITY_MIN_TENTHS)
+DEWPOINT_MAX_FIFTIETHS = 5 * TEMP_MAX_TENTHS - (1000 - HUMIDITY_MAX_TENTHS)
+
+# Humidex grenzen en bijbehorende comfort score (zie README, Comfort Score & Humidex)
+COMFORT_THRESHOLDS = np.array([20, 27, 30, 35, 40, 46, 54])
+COMFORT_SCORES = np.array([0, 4, 5, 6, 3, 2, 1, 0], dtype=np.float64)
+
+# Losse metingen (modbus_reader, actuele waarden) nemen een snel pad zonder array conversie
+SCALAR_TYPES = (int, float, np.number)
+
+
+@lru_cache(maxsize=None)
+def _absolute_humidity_factors():
+    """Per temperatuur (tienden): absolute vochtigheid (g/m³) per procent RH"""
+    temperature = np.arange(TEMP_MIN_TENTHS, TEMP_MAX_TENTHS + 1) / 10
+    # Formule: AH = (6.112 × e^((17.67 × T)/(T+243.5)) × RH × 2.1674) / (273.15+T)
+    return 6.112 * np.exp((17.67 * temperature) / (temperature + 243.5)) * 2.1674 / (273.15 + temperature)
+
+
+@lru_cache(maxsize=None)
+def _dewpoint_vapour_pressures():
+    """Per dauwpunt (vijftigsten): dampdruk e zoals in de Humidex formule"""
+    dewpoint_kelvin = np.arange(DEWPOINT_MIN_FIFTIETHS, DEWPOINT_MAX_FIFTIETHS + 1) / 50 + 273.15
+    return 6.11 * np.exp(5417.7530 * ((1 / 273.16) - (1 / dewpoint_kelvin)))
+
+
+def _to_tenths(values, low, high):
+    """Waarden -> (gehele tienden, masker van geldige waarden binnen [low, high])"""
+    values = np.asarray(values, dtype=np.float64)
+    valid = np.isfinite(values)
+    tenths = np.rint(np.where(valid, values, 0) * 10).astype(np.int64)
+    valid &= (tenths >= low) & (tenths <= high)
+    return np.where(valid, tenths, low), valid
+
+
+def _is_scalar(temperature, humidity):
+    return isinstance(temperature, SCALAR_TYPES) and isinstance(humidity, SCALAR_TYPES)
+
+
+def _scalar_tenths(value, low, high):
+    """Eén waarde -> gehele tienden, of None buiten [low, high] (snel pad voor losse metingen)"""
+    if value != value:  # NaN
+        return None
+    tenths = round(value * 10)
+    return tenths if low <= tenths <= high else None
+
+
+def dewpoint(temperature, humidity):
+    """Dauwpunt (°C) met de benadering Td = T - (100 - RH) / 5 (rekenkundig, geen tabel nodig)"""
+    if _is_scalar(temperature, humidity):
+        return temperature - ((100 - humidity) / 5.0)
+    return np.asarray(temperature, dtype=np.float64) - ((100 - np.asarray(humidity, dtype=np.float64)) / 5.0)
+
+
+def absolute_humidity(temperature, humidity):
+    """Absolute vochtigheid (g/m³)"""
+    if _is_scalar(temperature, humidity):
+        temperature_tenths = _scalar_tenths(temperature, TEMP_MIN_TENTHS, TEMP_MAX_TENTHS)
+        if temperature_tenths is None:
+            return float('nan')
+        return _absolute_humidity_factors().item(temperature_tenths - TEMP_MIN_TENTHS) * humidity
+
+    temperature_tenths, valid = _to_tenths(temperature, TEMP_MIN_TENTHS, TEMP_MAX_TENTHS)
+    factors = _absolute_humidity_factors()[temperature_tenths - TEMP_MIN_TENTHS]
+    return np.where(valid, factors * np.asarray(humidity, dtype=np.float64), np.nan)
+
+
+def humidex(temperature, humidity):
+    """Humidex = T + 0.5555 × (e - 10), met e de dampdruk bij het dauwpunt"""
+    if _is_scalar(temperature, humidity):
+        temperature_tenths = _scalar_tenths(temperature, TEMP_MIN_TENTHS, TEMP_MAX_TENTHS)
+        humidity_tenths = _scalar_tenths(humidity, HUMIDITY_MIN_TENTHS, HUMIDITY_MAX_TENTHS)
+        if temperature_tenths is None or humidity_tenths is None:
+            return float('nan')
+        vapour_pressure = _dewpoint_vapour_pressures().item(5 * temperature_tenths - (1000 - humidity_tenths) - DEWPOINT_MIN_FIFTIETHS)
+        return temperature_tenths / 10 + 0.5555 * (vapour_pressure - 10)
+
+    temperature_tenths, valid_temperature = _to_tenths(temperature, TEMP_MIN_TENTHS, TEMP_MAX_TENTHS)
+    humidity_tenths, valid_humidity = _to_tenths(humidity, HUMIDITY_MIN_TENTHS, HUMIDITY_MAX_TENTHS)
+    dewpoint_fiftieths = 5 * temperature_tenths - (1000 - humidity_tenths)
+    vapour_pressure = _dewpoint_vapour_pressures()[dewpoint_fiftieths - DEWPOINT_MIN_FIFTIETHS]
+    values = temperature_tenths / 10 + 0.5555 * (vapour_pressure - 10)
+    return np.where(valid_temperature & valid_humidity, values, np.nan)
+
+
+def comfort_score(temperature, humidity):
+    """Comfort score 0-6 op basis van de Humidex (NaN zonder geldige meting)"""
+    values = np.asarray(humidex(temperature, humidity))
+    scores = COMFORT_SCORES[np.searchsorted(COMFORT_THRESHOLDS, np.nan_to_num(values), side='right')]
+    scores = np.where(np.isnan(values), np.nan, scores)
+    return float(scores) if scores.ndim == 0 else scores
@@ -1,11 +1,22 @@
+import logging
 import os
 from dash import dcc, html
 from dotenv import load_dotenv
 from translations import LANGUAGE_NAMES, TRANSLATIONS
+from stream import LIVE_STREAM_ENABLED
 
 # Laad environment variabelen
 load_dotenv()
+logger = logging.getLogger(__name__)
 DEFAULT_LANGUAGE = os.getenv('DEFAULT_LANGUAGE', 'EN').lower()
+GRAPH_REFRESH_INTERVAL = int(os.getenv('GRAPH_REFRESH_INTERVAL', '5'))  # seconden
+
+if GRAPH_REFRESH_INTERVAL < 1:
+    logger.warning("GRAPH_REFRESH_INTERVAL moet minimaal 1 seconde zijn (%s), gebruik 1", GRAPH_REFRESH_INTERVAL)
+    GRAPH_REFRESH_INTERVAL = 1
+
+# Lange tijdsbereiken (background callback) verversen minder vaak, nooit vaker dan de gewone grafieken
+LONG_RANGE_REFRESH_INTERVAL = max(GRAPH_REFRESH_INTERVAL, int(os.getenv('LONG_RANGE_REFRESH_INTERVAL', '60')))  # seconden
 
 # Custom HTML template met CSS
 HTML_TEMPLATE = '''
@@ -54,6 +65,11 @@ HTML_TEMPLATE = '''
                 visibility: visible;
                 opacity: 1;
             }
+            .progress-text {
+                font-size: 14px;
+                color: #7f8c8d;
+                margin-top: 10px;
+            }
         </style>
     </head>
     <body>
@@ -253,13 +269,28 @@ def create_layout():
             'boxShadow': '0 4px 6px rgba(0,0,0,0.1)'
         }),
         
-        # Update interval
+        # Update interval voor actuele waarden (cards en Mollier marker), uitgeschakeld zolang de live stream verbonden is
         dcc.Interval(
             id='graph-update',
             interval=1000,
             n_intervals=0
         ),
         
+        # Refresh interval voor de grafieken (zwaardere range query)
+        dcc.Interval(
+            id='graph-refresh',
+            interval=GRAPH_REFRESH_INTERVAL * 1000,
+            n_intervals=0
+        ),
+        
+        # Refresh interval voor lange tijdsbereiken, alleen actief als zo'n bereik gekozen is
+        dcc.Interval(
+            id='graph-refresh-long',
+            interval=LONG_RANGE_REFRESH_INTERVAL * 1000,
+            n_intervals=0,
+            disabled=True
+        ),
+        
         # Controls
         html.Div([
             html.Div([
@@ -301,7 +332,9 @@ def create_layout():
                     'fontSize': '24px',
                     'fontWeight': 'bold',
                     'color': '#27ae60'
-                })
+                }),
+                # Voortgang van de background callback voor lange tijdsbereiken
+                html.Div(id='graph-progress', style={'display': 'none'}, className='progress-text')
             ], style={'width': '48%', 'display': 'inline-block', 'float': 'right', 'textAlign': 'right'})
         ], style={
             'marginTop': '30px',
@@ -365,17 +398,52 @@ def create_layout():
                     'background': '#ecf0f1',
                     'borderRadius': '8px'
                 }),
-                dcc.Slider(
-                    id='historical-time-slider',
-                    min=0,
-                    max=100,
-                    step=1,
-                    value=0,
-                    marks={},
-                    tooltip={'placement': 'bottom', 'always_visible': False}
+                html.Div([
+                    html.Button(
+                        id='historical-play-btn',
+                        children='▶️',
+                        n_clicks=0,
+                        style={
+                            'fontSize': '18px',
+                            'padding': '6px 14px',
+                            'border': '2px solid #3498db',
+                            'borderRadius': '8px',
+                            'background': 'white',
+                            'cursor': 'pointer',
+                            'marginRight': '15px'
+                        }
+                    ),
+                    html.Div([
+                        dcc.Slider(
+                            id='historical-time-slider',
+                            min=0,
+                            max=100,
+                            step=1,
+                            value=0,
+                            marks={},
+                            tooltip={'placement': 'bottom', 'always_visible': False}
+                        )
+                    ], style={'flex': '1'})
+                ], style={'display': 'flex', 'alignItems': 'center'}),
+                # Dichtheid overlay: waar heeft de ruimte de geselecteerde periode doorgebracht
+                dcc.Checklist(
+                    id='density-overlay-toggle',
+                    options=[{'label': f" {TRANSLATIONS[DEFAULT_LANGUAGE]['density_overlay']}", 'value': 'density'}],
+                    value=[],
+                    style={'marginTop': '15px', 'fontSize': '14px', 'color': '#2c3e50'}
+                ),
+                # Interval voor time-lapse afspelen (standaard gepauzeerd)
+                dcc.Interval(
+                    id='historical-playback',
+                    interval=100,
+                    n_intervals=0,
+                    disabled=True
                 )
             ], id='slider-container', style={'display': 'none', 'marginTop': '20px'}),
             
+            # Voortgang tijdens het laden van de geselecteerde periode
+            html.Div(id='historical-progress', style={'display': 'none'}, className='progress-text'),
+            
             # Modal met presets en custom range
             html.Div([
                 html.Div([
@@ -486,8 +554,14 @@ def create_layout():
         
         # Store voor historische data
         dcc.Store(id='historical-data-store'),
+        dcc.Store(id='density-overlay-store'),
         dcc.Store(id='selected-range-method', data='preset'),  # 'preset' of 'custom'
-        dcc.Store(id='selected-range-value')  # Opslaan van minutes (preset) of dates (custom)
+        dcc.Store(id='selected-range-value'),  # Opslaan van minutes (preset) of dates (custom)
+        
+        # Live stream (Server-Sent Events): laatste meting, verbindingsstatus en vertaalde labels
+        dcc.Store(id='live-sample-store'),
+        dcc.Store(id='live-stream-status', data={'enabled': LIVE_STREAM_ENABLED, 'connected': False}),
+        dcc.Store(id='live-labels-store')
     ], style={
         'maxWidth': '1400px',
         'margin': '0 auto',
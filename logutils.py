@@ -0,0 +1,164 @@
+"""Logging buiten het hete pad: QueueHandler -> QueueListener thread, rate limiting en velden
+
+Modules loggen met logging.getLogger(__name__); setup_logging() (app.py) hangt één handler aan de
+root logger die records alleen in een queue zet. Het %-formatteren van het bericht en het schrijven
+naar stdout gebeurt in de listener thread, de Modbus loop betaalt alleen een append. Een volle
+queue laat records vallen in plaats van de aanroeper te laten wachten.
+
+Extra velden gaan mee als extra={'fields': {...}} en komen als key=value achter het bericht, of als
+losse keys met LOG_FORMAT=json (voor journald/log shippers). Hetzelfde bericht (logger + template)
+komt hooguit LOG_RATE_LIMIT keer per minuut door; het eerstvolgende bericht meldt hoeveel er zijn
+onderdrukt.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
+from dotenv import load_dotenv
+
+# Laad environment variabelen
+load_dotenv()
+DEBUG_LOGGING = os.getenv('DEBUG_LOGGING', 'False').lower() == 'true'
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'text').strip().lower()  # text of json
+LOG_RATE_LIMIT = int(os.getenv('LOG_RATE_LIMIT', '10'))  # berichten per minuut per bericht, 0 = geen limiet
+
+if LOG_FORMAT not in ('text', 'json'):
+    logging.getLogger(__name__).warning("Onbekende LOG_FORMAT '%s' (verwacht: text, json), gebruik text", LOG_FORMAT)
+    LOG_FORMAT = 'text'
+
+if LOG_RATE_LIMIT < 0:
+    logging.getLogger(__name__).warning("LOG_RATE_LIMIT kan niet negatief zijn (%s), gebruik 0 (geen limiet)", LOG_RATE_LIMIT)
+    LOG_RATE_LIMIT = 0
+
+RATE_LIMIT_INTERVAL = 60  # seconden
+# Records die wachten op de listener thread, daarna vallen nieuwe records weg
+LOG_QUEUE_SIZE = 10000
+TEXT_FORMAT = '%(asctime)s %(levelname)s [%(name)s] %(message)s'
+
+
+class RateLimitFilter(logging.Filter):
+    """Hooguit limit records per interval per (logger, template); telt wat er wordt onderdrukt"""
+
+    def __init__(self, limit, interval=RATE_LIMIT_INTERVAL):
+        super().__init__()
+        self.limit = limit
+        self.interval = interval
+        self._windows = {}  # (logger, template) -> [begin venster, doorgelaten, onderdrukt]
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if not self.limit:
+            return True
+        key = (record.name, record.msg)
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= self.interval:
+                suppressed = window[2] if window is not None else 0
+                self._windows[key] = [now, 1, 0]
+                if suppressed:
+                    record.suppressed = suppressed
+                return True
+            if window[1] < self.limit:
+                window[1] += 1
+                return True
+            window[2] += 1
+            return False
+
+
+class DeferredQueueHandler(QueueHandler):
+    """QueueHandler die het formatteren aan de listener overlaat en nooit blokkeert"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Alleen een traceback moet nu worden vastgelegd; het bericht zelf formatteert de listener
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def _suffix(record):
+    return f" ({record.suppressed} vergelijkbare berichten onderdrukt)" if getattr(record, 'suppressed', 0) else ''
+
+
+class TextFormatter(logging.Formatter):
+    """Standaard tekst plus de velden als key=value"""
+
+    def format(self, record):
+        text = super().format(record)
+        fields = getattr(record, 'fields', None)
+        if fields:
+            text += ' ' + ' '.join(f'{key}={value}' for key, value in fields.items())
+        return text + _suffix(record)
+
+
+class JsonFormatter(logging.Formatter):
+    """Eén JSON object per regel, velden als losse keys"""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        entry.update(getattr(record, 'fields', None) or {})
+        if getattr(record, 'suppressed', 0):
+            entry['suppressed'] = record.suppressed
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+_listener = None
+_handler = None
+
+
+def setup_logging():
+    """Root logger via de queue naar stdout (DEBUG met DEBUG_LOGGING, anders INFO); meerdere keren aanroepen mag
+
+    Bestaande root handlers (bijv. logging.basicConfig van waitress-serve) worden vervangen, anders
+    komt elk bericht twee keer in de log.
+    """
+    global _listener, _handler
+    if _listener is not None:
+        return
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(JsonFormatter() if LOG_FORMAT == 'json' else TextFormatter(TEXT_FORMAT))
+
+    log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    _handler = DeferredQueueHandler(log_queue)
+    _handler.addFilter(RateLimitFilter(LOG_RATE_LIMIT))
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_handler)
+    root.setLevel(logging.DEBUG if DEBUG_LOGGING else logging.INFO)
+
+    _listener = QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging():
+    """Schrijf wat nog in de queue staat en stop de listener thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,288 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+import numpy as np
+from flask import Response, g, has_request_context, jsonify
+from dotenv import load_dotenv
+
+# Laad environment variabelen
+load_dotenv()
+logger = logging.getLogger(__name__)
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True').lower() == 'true'
+METRICS_WINDOW = int(os.getenv('METRICS_WINDOW', '1024'))
+
+if METRICS_WINDOW < 10:
+    logger.warning("METRICS_WINDOW moet minimaal 10 zijn (%s), gebruik 10", METRICS_WINDOW)
+    METRICS_WINDOW = 10
+
+# Prefix voor de Prometheus namen
+METRIC_PREFIX = 'xymd02_'
+QUANTILES = (0.5, 0.95, 0.99)
+METRIC_KINDS = {'observe': 'summary', 'inc': 'counter', 'set': 'gauge'}
+# Maximaal aantal wachtende waarnemingen uit background callback processen
+SHARED_QUEUE_SIZE = 10000
+
+
+class Summary:
+    """Rollend venster met de laatste waarnemingen, plus totale som en aantal (Prometheus summary)"""
+
+    def __init__(self, window):
+        self.values = deque(maxlen=window)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.values.append(value)
+        self.count += 1
+        self.sum += value
+
+
+class MetricsRegistry:
+    """In-process registry voor summaries (p50/p95/p99), counters en gauges met labels
+
+    Waarnemingen uit background callback processen gaan via een gedeelde diskcache queue
+    (shared) naar het hoofdproces en worden daar bij het uitlezen verwerkt.
+    """
+
+    def __init__(self, window):
+        self.window = window
+        self.shared = None
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def describe(self, name, kind, help_text):
+        """Registreer naam, type ('summary', 'counter' of 'gauge') en omschrijving van een metric"""
+        with self._lock:
+            self._metrics.setdefault(name, {'kind': kind, 'help': help_text, 'series': {}})
+
+    def observe(self, name, value, **labels):
+        self._record(name, 'observe', value, labels)
+
+    def inc(self, name, amount=1, **labels):
+        self._record(name, 'inc', amount, labels)
+
+    def set(self, name, value, **labels):
+        self._record(name, 'set', value, labels)
+
+    def _record(self, name, action, value, labels):
+        if not METRICS_ENABLED:
+            return
+        if self.shared is not None and os.getpid() != self._pid:
+            try:
+                self.shared.append((name, action, value, labels))
+            except Exception:
+                pass
+            return
+
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            metric = self._metrics.setdefault(name, {'kind': METRIC_KINDS[action], 'help': name, 'series': {}})
+            series = metric['series']
+            if action == 'observe':
+                if key not in series:
+                    series[key] = Summary(self.window)
+                series[key].observe(float(value))
+            elif action == 'inc':
+                series[key] = series.get(key, 0) + value
+            else:
+                series[key] = value
+
+    def _drain_shared(self):
+        """Verwerk de waarnemingen die background callback processen hebben doorgegeven"""
+        if self.shared is None:
+            return
+        while True:
+            try:
+                name, action, value, labels = self.shared.popleft()
+            except Exception:  # Lege queue (IndexError) of onleesbare cache
+                return
+            self._record(name, action, value, labels)
+
+    def snapshot(self, prefix=''):
+        """Alle metrics (optioneel alleen met een bepaalde prefix) als dict, klaar voor JSON"""
+        self._drain_shared()
+        result = {}
+        items = []
+        with self._lock:
+            for name, metric in self._metrics.items():
+                if not name.startswith(prefix):
+                    continue
+                # Kopie van de vensters, de percentielen worden buiten de lock berekend
+                series = {key: (list(value.values), value.count, value.sum) if metric['kind'] == 'summary' else value
+                          for key, value in metric['series'].items()}
+                items.append((name, metric['kind'], series))
+
+        for name, kind, series in items:
+            entries = []
+            for key, value in series.items():
+                entry = {'labels': dict(key)}
+                if kind == 'summary':
+                    values, count, total = value
+                    entry.update(count=count, sum=round(total, 6))
+                    if values:
+                        window = np.asarray(values, dtype=np.float64)
+                        for quantile, percentile in zip(QUANTILES, np.percentile(window, [q * 100 for q in QUANTILES])):
+                            entry[f'p{int(quantile * 100)}'] = round(float(percentile), 6)
+                        entry['max'] = round(float(window.max()), 6)
+                else:
+                    entry['value'] = value
+                entries.append(entry)
+            result[name] = {'type': kind, 'series': entries}
+        return result
+
+    def to_prometheus(self, prefix=''):
+        """Alle metrics in het Prometheus text exposition format"""
+        lines = []
+        snapshot = self.snapshot(prefix)
+        with self._lock:
+            help_texts = {name: metric['help'] for name, metric in self._metrics.items()}
+
+        for name, metric in snapshot.items():
+            full_name = METRIC_PREFIX + name
+            lines.append(f"# HELP {full_name} {help_texts.get(name, name)}")
+            lines.append(f"# TYPE {full_name} {metric['type']}")
+            for entry in metric['series']:
+                labels = entry['labels']
+                if metric['type'] == 'summary':
+                    for quantile in QUANTILES:
+                        value = entry.get(f'p{int(quantile * 100)}')
+                        if value is not None:
+                            lines.append(f"{full_name}{_format_labels(labels, quantile=quantile)} {value}")
+                    lines.append(f"{full_name}_sum{_format_labels(labels)} {entry['sum']}")
+                    lines.append(f"{full_name}_count{_format_labels(labels)} {entry['count']}")
+                else:
+                    lines.append(f"{full_name}{_format_labels(labels)} {entry['value']}")
+        return '\n'.join(lines) + '\n'
+
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels, **extra):
+    labels = dict(labels, **extra)
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape_label(value)}"' for key, value in labels.items()) + '}'
+
+
+registry = MetricsRegistry(METRICS_WINDOW)
+
+registry.describe('callback_seconds', 'summary', 'Wall time per Dash callback in seconden')
+registry.describe('callback_db_seconds', 'summary', 'Database tijd per Dash callback in seconden')
+registry.describe('callback_rows', 'summary', 'Opgehaalde database rijen per Dash callback')
+registry.describe('callback_points', 'summary', 'Getekende punten per Dash callback')
+registry.describe('callback_response_bytes', 'summary', 'Grootte van de callback response in bytes (voor compressie)')
+registry.describe('db_query_seconds', 'summary', 'Duur van een database query in seconden')
+registry.describe('db_rows', 'summary', 'Opgehaalde rijen per database query')
+
+# Meetgegevens van de callback die in deze thread loopt (DB tijd, rijen, punten)
+_call_state = threading.local()
+
+
+class QueryStats:
+    """Houdt het aantal opgehaalde rijen bij binnen track_query"""
+
+    def __init__(self):
+        self.rows = 0
+
+
+@contextmanager
+def track_query(source):
+    """Meet een database query: with track_query('graph') as query: ...; query.rows = len(df)"""
+    stats = QueryStats()
+    if not METRICS_ENABLED:
+        yield stats
+        return
+
+    start = time.perf_counter()
+    try:
+        yield stats
+    finally:
+        elapsed = time.perf_counter() - start
+        registry.observe('db_query_seconds', elapsed, source=source)
+        registry.observe('db_rows', stats.rows, source=source)
+        call = getattr(_call_state, 'current', None)
+        if call is not None:
+            call['db_seconds'] += elapsed
+            call['rows'] += stats.rows
+
+
+def record_points(points):
+    """Tel getekende punten mee voor de callback die in deze thread loopt"""
+    call = getattr(_call_state, 'current', None)
+    if call is not None:
+        call['points'] += int(points)
+
+
+def track_callback(func):
+    """Meet wall time, DB tijd, rijen en punten van een callback"""
+    name = func.__name__
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        call = {'db_seconds': 0.0, 'rows': 0, 'points': 0}
+        previous = getattr(_call_state, 'current', None)
+        _call_state.current = call
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            _call_state.current = previous
+            registry.observe('callback_seconds', elapsed, callback=name)
+            registry.observe('callback_db_seconds', call['db_seconds'], callback=name)
+            registry.observe('callback_rows', call['rows'], callback=name)
+            if call['points']:
+                registry.observe('callback_points', call['points'], callback=name)
+            if has_request_context():
+                # Response grootte wordt na het serialiseren gemeten (zie register_metrics_routes)
+                g.perf_callback = name
+
+    return wrapper
+
+
+def timed_callback(app):
+    """Variant van app.callback die elke geregistreerde callback meet"""
+    if not METRICS_ENABLED:
+        return app.callback
+
+    def callback(*args, **kwargs):
+        register = app.callback(*args, **kwargs)
+
+        def decorator(func):
+            return register(track_callback(func))
+
+        return decorator
+
+    return callback
+
+
+def register_metrics_routes(server):
+    """Registreer /debug/perf en /debug/acquisition (JSON) en /metrics (Prometheus) op de Flask server"""
+    if not METRICS_ENABLED:
+        return
+
+    @server.after_request
+    def record_response_size(response):
+        name = g.pop('perf_callback', None)
+        if name is not None and not response.direct_passthrough:
+            registry.observe('callback_response_bytes', response.content_length or 0, callback=name)
+        return response
+
+    @server.route('/debug/perf')
+    def debug_perf():
+        return jsonify(registry.snapshot())
+
+    @server.route('/debug/acquisition')
+    def debug_acquisition():
+        return jsonify(registry.snapshot(prefix='acquisition_'))
+
+    @server.route('/metrics')
+    def prometheus_metrics():
+        return Response(registry.to_prometheus(), mimetype='text/plain; version=0.0.4')
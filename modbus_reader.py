@@ -1,8 +1,11 @@
+import atexit
+import logging
 import minimalmodbus
 import time
-import math
 import os
 import sqlite3
+import threading
+from collections import deque
 from datetime import datetime
 from dotenv import load_dotenv
 from database import (
@@ -10,11 +13,18 @@ from database import (
     DATA_RETENTION_DAYS, 
     get_table_name, 
     ensure_table_exists, 
-    cleanup_old_data
+    set_latest_sample,
+    start_maintenance_thread
 )
+from stream import publish_sample
+from derived import dewpoint as calculate_dewpoint, absolute_humidity as calculate_absolute_humidity
+from compression import create_compressor, INGEST_COMPRESSION
+from alerts import create_alert_engine
+from metrics import registry
 
 # Laad environment variabelen
 load_dotenv()
+logger = logging.getLogger(__name__)
 
 # Modbus configuratie uit environment met validatie
 try:
@@ -33,13 +43,13 @@ try:
     if MODBUS_SLAVE_ID < 1 or MODBUS_SLAVE_ID > 247:
         raise ValueError(f"MODBUS_SLAVE_ID moet tussen 1-247 zijn, kreeg: {MODBUS_SLAVE_ID}")
     if MODBUS_BAUDRATE not in [1200, 2400, 4800, 9600, 19200, 38400, 57600, 115200]:
-        print(f"Waarschuwing: Ongebruikelijke baudrate: {MODBUS_BAUDRATE}")
+        logger.warning("Ongebruikelijke baudrate: %s", MODBUS_BAUDRATE)
     if MODBUS_PARITY not in ['N', 'E', 'O']:
         raise ValueError(f"MODBUS_PARITY moet N, E of O zijn, kreeg: {MODBUS_PARITY}")
     if MODBUS_TIMEOUT < 0:
         raise ValueError(f"MODBUS_TIMEOUT moet positief zijn, kreeg: {MODBUS_TIMEOUT}")
 except ValueError as e:
-    print(f"FOUT in .env configuratie: {e}")
+    logger.error("FOUT in .env configuratie: %s", e)
     raise
 
 # Configuratie van Modbus RTU apparaat
@@ -53,6 +63,35 @@ PARITY_MAP = {
 # Global instrument variable - initialized lazily to avoid serial port access during import
 instrument = None
 
+# Stopt de Modbus loop bij het afsluiten; compressor en buffer worden dan nog weggeschreven
+stop_event = threading.Event()
+modbus_thread = None
+# Maximale wachttijd bij het afsluiten (lopende register reads plus de laatste commit)
+STOP_TIMEOUT = 10  # seconden
+
+# Doel: één meting per POLL_INTERVAL seconden
+POLL_INTERVAL = 1  # seconden
+# Aantal recente metingen waarover de behaalde sample rate wordt berekend
+SAMPLE_RATE_WINDOW = 60
+# Een interval langer dan dit veelvoud van POLL_INTERVAL telt als gat in de meetreeks
+GAP_FACTOR = 2
+
+# Acquisitie metrics per apparaat (poort + slave id), zie /debug/acquisition
+DEVICE_LABEL = f"{MODBUS_PORT}:{MODBUS_SLAVE_ID}"
+registry.describe('acquisition_read_seconds', 'summary', 'Round-trip tijd van een Modbus register read in seconden')
+registry.describe('acquisition_errors_total', 'counter', 'Mislukte metingen per fouttype (timeout, checksum, ...)')
+registry.describe('acquisition_invalid_values_total', 'counter', 'Metingen buiten het geldige bereik')
+registry.describe('acquisition_samples_total', 'counter', 'Geldige metingen')
+registry.describe('acquisition_samples_stored_total', 'counter', 'Opgeslagen metingen (na INGEST_COMPRESSION)')
+registry.describe('acquisition_sample_interval_seconds', 'summary', 'Tijd tussen twee geldige metingen in seconden')
+registry.describe('acquisition_gaps_total', 'counter', f'Intervallen langer dan {GAP_FACTOR}x POLL_INTERVAL')
+registry.describe('acquisition_sample_rate', 'gauge', f'Behaalde metingen per seconde (laatste {SAMPLE_RATE_WINDOW})')
+registry.describe('acquisition_target_sample_rate', 'gauge', 'Beoogde metingen per seconde')
+registry.describe('acquisition_last_sample_timestamp', 'gauge', 'Unix tijd van de laatste geldige meting')
+registry.describe('acquisition_buffer_depth', 'gauge', 'Metingen in de buffer die nog niet zijn opgeslagen')
+registry.describe('acquisition_commit_seconds', 'summary', 'Duur van een batch commit naar de database in seconden')
+registry.describe('acquisition_commit_rows', 'summary', 'Metingen per batch commit')
+
 
 def _initialize_instrument():
     """Initialize Modbus instrument - called only when needed, not during module import"""
@@ -67,9 +106,62 @@ def _initialize_instrument():
     return instrument
 
 
+def classify_error(error):
+    """Fouttype voor de acquisitie metrics"""
+    if isinstance(error, minimalmodbus.NoResponseError):
+        return 'timeout'
+    if isinstance(error, minimalmodbus.InvalidResponseError):
+        return 'checksum' if 'checksum' in str(error).lower() else 'invalid_response'
+    if isinstance(error, minimalmodbus.SlaveReportedException):
+        return 'slave_exception'
+    if isinstance(error, minimalmodbus.serial.SerialException):
+        return 'serial'
+    if isinstance(error, sqlite3.Error):
+        return 'database'
+    return 'other'
+
+
+def read_register(register, field):
+    """Lees één register en meet de round-trip tijd"""
+    start = time.perf_counter()
+    value = instrument.read_register(register, 0, MODBUS_FUNCTION_CODE)
+    registry.observe('acquisition_read_seconds', time.perf_counter() - start, device=DEVICE_LABEL, register=field)
+    return value
+
+
+def commit_buffer(conn, cursor, table_name, measurement_buffer):
+    """Schrijf de buffer in één transactie weg en meet de commit tijd"""
+    start = time.perf_counter()
+    # Na een fout kan er nog een transactie open staan
+    if not conn.in_transaction:
+        cursor.execute('BEGIN')
+    try:
+        cursor.executemany(
+            f'INSERT INTO {table_name} (timestamp, temperature, humidity, dewpoint, absolute_humidity) VALUES (?, ?, ?, ?, ?)',
+            measurement_buffer
+        )
+        conn.commit()
+    except sqlite3.Error:
+        # Deels ingevoegde rijen terugdraaien: de buffer blijft staan en gaat bij de volgende poging in zijn geheel
+        conn.rollback()
+        raise
+    registry.observe('acquisition_commit_seconds', time.perf_counter() - start, device=DEVICE_LABEL)
+    registry.observe('acquisition_commit_rows', len(measurement_buffer), device=DEVICE_LABEL)
+
+
+def flush_compressor(compressor, measurement_buffer):
+    """Zet het punt dat de compressor nog vasthoudt in de buffer (vóór een dag wissel, fout of stop)"""
+    if compressor is None:
+        return
+    stored_rows = compressor.flush()
+    if stored_rows:
+        measurement_buffer.extend(stored_rows)
+        registry.inc('acquisition_samples_stored_total', len(stored_rows), device=DEVICE_LABEL)
+
+
 def read_modbus_data():
     """Thread functie om Modbus data te lezen en op te slaan"""
-    print(f"→ Modbus thread actief - verbinding maken met {MODBUS_PORT}...")
+    logger.info("Modbus thread actief - verbinding maken met %s", MODBUS_PORT)
     
     # Initialize instrument now (not during import)
     _initialize_instrument()
@@ -83,7 +175,7 @@ def read_modbus_data():
     cursor.execute('PRAGMA journal_mode=WAL')
     cursor.execute('PRAGMA synchronous=NORMAL')
     
-    print(f"✓ Database connectie OK - schrijven naar tabel: {current_table}")
+    logger.info("Database connectie OK - schrijven naar tabel: %s", current_table)
     
     # Buffer voor batch inserts (30 metingen = 30 seconden)
     # Optimalisatie: minder schrijfoperaties = langere levensduur database/storage
@@ -92,117 +184,169 @@ def read_modbus_data():
     last_commit_time = time.time()
     COMMIT_INTERVAL = 30  # seconds
     
-    while True:
+    # Tijdstippen van de laatste geldige metingen (behaalde sample rate en gaten)
+    sample_times = deque(maxlen=SAMPLE_RATE_WINDOW)
+    debug_enabled = logger.isEnabledFor(logging.DEBUG)
+    
+    # Optionele compressie: alleen significante metingen gaan de buffer in (zie compression.py)
+    compressor = create_compressor()
+    if compressor is not None:
+        logger.info("Ingest compressie actief: %s", INGEST_COMPRESSION)
+    # Optionele alerts: elke geldige meting gaat langs de regels (zie alerts.py)
+    alert_engine = create_alert_engine(DEVICE_LABEL)
+    if alert_engine is not None:
+        logger.info("Alerts actief: %d regel(s)", len(alert_engine.rules))
+    registry.set('acquisition_target_sample_rate', 1 / POLL_INTERVAL, device=DEVICE_LABEL)
+    
+    while not stop_event.is_set():
         try:
-            # Voer cleanup uit elke 24 uur
+            # Voer cleanup uit elke 24 uur (in de onderhoudsthread, het meten gaat door)
             if DATA_RETENTION_DAYS > 0 and (datetime.now() - last_cleanup).total_seconds() >= 86400:
-                cleanup_old_data()
-                last_cleanup = datetime.now()
+                if start_maintenance_thread(cleanup=True) is not None:
+                    last_cleanup = datetime.now()
             
-            register_temp = instrument.read_register(MODBUS_REGISTER_TEMP, 0, MODBUS_FUNCTION_CODE)
-            register_humidity = instrument.read_register(MODBUS_REGISTER_HUMIDITY, 0, MODBUS_FUNCTION_CODE)
+            register_temp = read_register(MODBUS_REGISTER_TEMP, 'temperature')
+            register_humidity = read_register(MODBUS_REGISTER_HUMIDITY, 'humidity')
             
             temperature = register_temp / 10
             humidity = register_humidity / 10
             
             # Valideer sensor data
             if not (-50 <= temperature <= 100):
-                print(f"Waarschuwing: Ongeldige temperatuur {temperature}°C - meting overgeslagen")
+                logger.warning("Ongeldige temperatuur %s°C - meting overgeslagen", temperature,
+                               extra={'fields': {'device': DEVICE_LABEL}})
+                registry.inc('acquisition_invalid_values_total', device=DEVICE_LABEL, field='temperature')
                 time.sleep(1)
                 continue
             
             if not (0 <= humidity <= 100):
-                print(f"Waarschuwing: Ongeldige luchtvochtigheid {humidity}% - meting overgeslagen")
+                logger.warning("Ongeldige luchtvochtigheid %s%% - meting overgeslagen", humidity,
+                               extra={'fields': {'device': DEVICE_LABEL}})
+                registry.inc('acquisition_invalid_values_total', device=DEVICE_LABEL, field='humidity')
                 time.sleep(1)
                 continue
             
-            # Bereken dauwpunt
-            dewpoint = temperature - ((100 - humidity) / 5.0)
-            
-            # Bereken absolute vochtigheid (g/m³)
-            # Formule: AH = (6.112 × e^((17.67 × T)/(T+243.5)) × RH × 2.1674) / (273.15+T)
-            absolute_humidity = (6.112 * math.exp((17.67 * temperature) / (temperature + 243.5)) * humidity * 2.1674) / (273.15 + temperature)
-            
-            # Bereken Humidex
-            # Formule: Humidex = T + 0.5555 × (e - 10)
-            # waarbij e = 6.11 × e^(5417.7530 × (1/273.16 - 1/(273.15+Td)))
-            # en Td = dauwpunt in Kelvin
-            dewpoint_kelvin = dewpoint + 273.15
-            e = 6.11 * math.exp(5417.7530 * ((1/273.16) - (1/dewpoint_kelvin)))
-            humidex = temperature + 0.5555 * (e - 10)
+            # Afgeleide waarden: dauwpunt en absolute vochtigheid (g/m³, lookup tabel op register resolutie)
+            dewpoint = calculate_dewpoint(temperature, humidity)
+            absolute_humidity = calculate_absolute_humidity(temperature, humidity)
             
             # Opslaan in buffer (integer timestamp voor performance)
             timestamp = datetime.now()
             timestamp_int = int(timestamp.timestamp())
-            measurement_buffer.append((timestamp_int, temperature, humidity, dewpoint, absolute_humidity))
-            
-            print(f"{timestamp.strftime('%H:%M:%S')} - Temperature: {temperature:.1f}°C, Humidity: {humidity:.1f}%, Dewpoint: {dewpoint:.1f}°C, Absolute Humidity: {absolute_humidity:.1f}g/m³")
+            row = (timestamp_int, temperature, humidity, dewpoint, absolute_humidity)
+            # Kaarten, Mollier marker en de grafiek staart lopen niet achter op de compressie
+            set_latest_sample(row)
             
-            # Check of we een nieuwe dag zijn (table switch)
-            new_table = get_table_name()
+            # Check of we een nieuwe dag zijn (table switch), vóór deze meting de buffer in gaat
+            new_table = get_table_name(timestamp)
             if new_table != current_table:
-                # Flush buffer naar oude tabel
+                # Vastgehouden compressie punt en buffer naar de oude tabel
+                flush_compressor(compressor, measurement_buffer)
                 if measurement_buffer:
-                    cursor.execute('BEGIN')
-                    cursor.executemany(
-                        f'INSERT INTO {current_table} (timestamp, temperature, humidity, dewpoint, absolute_humidity) VALUES (?, ?, ?, ?, ?)',
-                        measurement_buffer
-                    )
-                    conn.commit()
-                    print(f"✓ {len(measurement_buffer)} metingen opgeslagen in {current_table} (dag wissel)")
+                    commit_buffer(conn, cursor, current_table, measurement_buffer)
+                    logger.info("%d metingen opgeslagen in %s (dag wissel)", len(measurement_buffer), current_table)
                     measurement_buffer.clear()
                 
                 # Maak nieuwe tabel aan en switch
                 ensure_table_exists(cursor, new_table)
                 conn.commit()
                 current_table = new_table
-                print(f"→ Nieuwe dag: nu schrijven naar {current_table}")
+                logger.info("Nieuwe dag: nu schrijven naar %s", current_table)
+                
+                # Rollups bijwerken en afgesloten maanden samenvoegen (in de achtergrond, sampling loopt door)
+                start_maintenance_thread()
+            
+            if alert_engine is not None:
+                alert_engine.evaluate(row)
+            stored_rows = compressor.offer(row) if compressor is not None else [row]
+            measurement_buffer.extend(stored_rows)
+            
+            # Acquisitie metrics: aantal, interval/gaten, behaalde rate en buffer diepte
+            sample_time = time.monotonic()
+            if sample_times:
+                interval = sample_time - sample_times[-1]
+                registry.observe('acquisition_sample_interval_seconds', interval, device=DEVICE_LABEL)
+                if interval > GAP_FACTOR * POLL_INTERVAL:
+                    registry.inc('acquisition_gaps_total', device=DEVICE_LABEL)
+            sample_times.append(sample_time)
+            if len(sample_times) > 1:
+                registry.set('acquisition_sample_rate', round((len(sample_times) - 1) / (sample_times[-1] - sample_times[0]), 4),
+                             device=DEVICE_LABEL)
+            registry.inc('acquisition_samples_total', device=DEVICE_LABEL)
+            if stored_rows:
+                registry.inc('acquisition_samples_stored_total', len(stored_rows), device=DEVICE_LABEL)
+            registry.set('acquisition_last_sample_timestamp', timestamp_int, device=DEVICE_LABEL)
+            registry.set('acquisition_buffer_depth', len(measurement_buffer), device=DEVICE_LABEL)
+            
+            # Push de meting direct naar verbonden browsers (los van de batch commit)
+            publish_sample(timestamp_int, temperature, humidity, dewpoint, absolute_humidity)
+            
+            # Per meting alleen met DEBUG_LOGGING (en dan rate limited), zonder kosten als het uit staat
+            if debug_enabled:
+                logger.debug("Meting", extra={'fields': {
+                    'device': DEVICE_LABEL, 'timestamp': timestamp_int, 'temperature': temperature, 'humidity': humidity,
+                    'dewpoint': round(dewpoint, 2), 'absolute_humidity': round(absolute_humidity, 2)
+                }})
             
             # Batch commit: als buffer vol is OF tijd verstreken
             current_time = time.time()
             if len(measurement_buffer) >= BATCH_SIZE or (current_time - last_commit_time) >= COMMIT_INTERVAL:
                 if measurement_buffer:
-                    cursor.execute('BEGIN')
-                    cursor.executemany(
-                        f'INSERT INTO {current_table} (timestamp, temperature, humidity, dewpoint, absolute_humidity) VALUES (?, ?, ?, ?, ?)',
-                        measurement_buffer
-                    )
-                    conn.commit()
-                    print(f"✓ {len(measurement_buffer)} metingen opgeslagen in {current_table} (batch commit)")
+                    commit_buffer(conn, cursor, current_table, measurement_buffer)
+                    logger.debug("%d metingen opgeslagen in %s (batch commit)", len(measurement_buffer), current_table)
                     measurement_buffer.clear()
                     last_commit_time = current_time
+                registry.set('acquisition_buffer_depth', len(measurement_buffer), device=DEVICE_LABEL)
             
-            time.sleep(1)
+            stop_event.wait(POLL_INTERVAL)
         except Exception as e:
-            print(f"Modbus fout: {e}")
-            # Bij fout: probeer buffer alsnog op te slaan
+            error_type = classify_error(e)
+            registry.inc('acquisition_errors_total', device=DEVICE_LABEL, type=error_type)
+            logger.error("Modbus fout (%s): %s", error_type, e, extra={'fields': {'device': DEVICE_LABEL, 'error': error_type}})
+            # Bij fout: probeer buffer (met het vastgehouden compressie punt) alsnog op te slaan
+            flush_compressor(compressor, measurement_buffer)
             if measurement_buffer:
                 try:
-                    cursor.executemany(
-                        f'INSERT INTO {current_table} (timestamp, temperature, humidity, dewpoint, absolute_humidity) VALUES (?, ?, ?, ?, ?)',
-                        measurement_buffer
-                    )
-                    conn.commit()
+                    commit_buffer(conn, cursor, current_table, measurement_buffer)
                     measurement_buffer.clear()
-                except:
-                    pass
-            time.sleep(5)
+                except Exception as commit_error:
+                    logger.error("%d metingen niet opgeslagen in %s, blijven in de buffer: %s",
+                                 len(measurement_buffer), current_table, commit_error)
+            registry.set('acquisition_buffer_depth', len(measurement_buffer), device=DEVICE_LABEL)
+            stop_event.wait(5)
+    
+    # Afsluiten: laatste compressie punt en buffer wegschrijven
+    flush_compressor(compressor, measurement_buffer)
+    if measurement_buffer:
+        try:
+            commit_buffer(conn, cursor, current_table, measurement_buffer)
+            logger.info("%d metingen opgeslagen in %s (afsluiten)", len(measurement_buffer), current_table)
+        except sqlite3.Error as e:
+            logger.error("%d metingen niet opgeslagen in %s bij afsluiten: %s", len(measurement_buffer), current_table, e)
+    conn.close()
 
 
 def start_modbus_thread():
     """Start Modbus reader thread als daemon"""
-    import threading
+    global modbus_thread
     
     # Test eerst of minimalmodbus werkt
     try:
-        print(f"→ Start Modbus thread (poort: {MODBUS_PORT}, slave: {MODBUS_SLAVE_ID})")
+        logger.info("Start Modbus thread (poort: %s, slave: %s)", MODBUS_PORT, MODBUS_SLAVE_ID)
         modbus_thread = threading.Thread(target=read_modbus_data, daemon=True)
         modbus_thread.start()
-        print("✓ Modbus reader thread gestart")
+        # Bij het afsluiten de loop stoppen zodat de laatste metingen nog worden opgeslagen
+        atexit.register(stop_modbus_thread)
+        logger.info("Modbus reader thread gestart")
         return modbus_thread
     except Exception as e:
-        print(f"✗ FOUT bij starten Modbus thread: {e}")
-        print(f"   Type: {type(e).__name__}")
-        print("   Zorg dat je de app start met de virtual environment!")
-        print("   Gebruik: .venv\\Scripts\\python.exe app.py")
+        logger.error("FOUT bij starten Modbus thread: %s (%s). Zorg dat je de app start met de virtual environment! "
+                     "Gebruik: .venv\\Scripts\\python.exe app.py", e, type(e).__name__)
         raise
+
+
+def stop_modbus_thread():
+    """Stop de Modbus loop en wacht tot compressor en buffer zijn weggeschreven"""
+    stop_event.set()
+    if modbus_thread is not None and modbus_thread.is_alive():
+        modbus_thread.join(STOP_TIMEOUT)
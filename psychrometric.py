@@ -1,227 +1,281 @@
+import logging
+import os
+from functools import lru_cache
 import plotly.graph_objects as go
 import numpy as np
+from plotly.colors import sample_colorscale
+from dotenv import load_dotenv
 from translations import TRANSLATIONS
 
+# Laad environment variabelen
+load_dotenv()
+logger = logging.getLogger(__name__)
 
-def create_psychrometric_chart(current_temp, current_rh, lang='nl'):
-    """Genereer een psychrometrisch (Mollier) diagram met huidige conditie"""
-    t = TRANSLATIONS[lang]
+# Diagram configuratie uit environment
+ALTITUDE = float(os.getenv('ALTITUDE', '0'))  # meter boven zeeniveau
+BAROMETRIC_PRESSURE = float(os.getenv('BAROMETRIC_PRESSURE', '0'))  # Pa, 0 = afleiden uit ALTITUDE
+CHART_TEMP_MIN = float(os.getenv('CHART_TEMP_MIN', '0'))
+CHART_TEMP_MAX = float(os.getenv('CHART_TEMP_MAX', '40'))
+CHART_RH_STEP = int(os.getenv('CHART_RH_STEP', '10'))  # afstand tussen RH lijnen in %
+CHART_RESOLUTION = int(os.getenv('CHART_RESOLUTION', '200'))  # aantal temperatuurpunten per lijn
+CHART_HUMIDITY_RATIO_MAX = float(os.getenv('CHART_HUMIDITY_RATIO_MAX', '25'))  # g/kg (y-as)
+CHART_ENTHALPY_LINES = os.getenv('CHART_ENTHALPY_LINES', 'False').lower() == 'true'
+CHART_WETBULB_LINES = os.getenv('CHART_WETBULB_LINES', 'False').lower() == 'true'
+
+if CHART_TEMP_MAX <= CHART_TEMP_MIN:
+    logger.warning("CHART_TEMP_MAX (%s) moet groter zijn dan CHART_TEMP_MIN (%s), gebruik 0-40°C", CHART_TEMP_MAX, CHART_TEMP_MIN)
+    CHART_TEMP_MIN, CHART_TEMP_MAX = 0.0, 40.0
+if not 1 <= CHART_RH_STEP <= 50:
+    logger.warning("CHART_RH_STEP moet tussen 1-50 zijn (%s), gebruik 10", CHART_RH_STEP)
+    CHART_RH_STEP = 10
+if CHART_RESOLUTION < 10:
+    logger.warning("CHART_RESOLUTION moet minimaal 10 zijn (%s), gebruik 200", CHART_RESOLUTION)
+    CHART_RESOLUTION = 200
+
+
+def pressure_from_altitude(altitude):
+    """Standaard atmosfeer luchtdruk (Pa) op een hoogte in meter"""
+    return 101325 * (1 - 2.25577e-5 * altitude) ** 5.25588
+
+
+# Luchtdruk voor alle berekeningen (Pa): expliciet ingesteld of afgeleid uit de hoogte
+ATMOSPHERIC_PRESSURE = BAROMETRIC_PRESSURE if BAROMETRIC_PRESSURE > 0 else pressure_from_altitude(ALTITUDE)
+
+# Vaste uid van de marker trace, zodat clientside callbacks alleen deze trace hoeven te verplaatsen
+MARKER_UID = 'condition-marker'
+
+# Vaste uid en index van de dichtheid overlay (eerste trace, dus onder alle isolijnen)
+DENSITY_UID = 'density-overlay'
+DENSITY_INDEX = 0
+
+# Bingrootte van de dichtheid overlay (°C en g/kg)
+DENSITY_TEMP_BIN = 0.5
+DENSITY_RATIO_BIN = 0.5
+
+# Kleuren van de oorspronkelijke 10%-90% RH lijnen, gebruikt als kleurschaal voor elke lijndichtheid
+RH_COLORSCALE = ['#ecf0f1', '#d5dbdb', '#bdc3c7', '#95a5a6', '#7f8c8d', '#5d6d7e', '#34495e', '#2c3e50', '#1c2833']
+
+
+def saturation_pressure(temp):
+    """Verzadigde dampdruk (Pa) - August-Roche-Magnus formule (werkt op scalars en arrays)"""
+    temp = np.asarray(temp, dtype=float)
+    return 611.2 * np.exp(17.62 * temp / (243.12 + temp))
+
+
+def humidity_ratio(temp, rh, pressure=ATMOSPHERIC_PRESSURE):
+    """Vochtigheidsratio in g/kg (NaN waar de dampdruk de luchtdruk bereikt)"""
+    pw = saturation_pressure(temp) * (np.asarray(rh, dtype=float) / 100.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        w = np.where(pw < pressure, 0.622 * pw / (pressure - pw), np.nan)
+    return w * 1000
+
+
+@lru_cache(maxsize=32)
+def compute_chart_geometry(pressure=ATMOSPHERIC_PRESSURE, temp_min=CHART_TEMP_MIN, temp_max=CHART_TEMP_MAX,
+                           rh_step=CHART_RH_STEP, resolution=CHART_RESOLUTION,
+                           enthalpy_lines=CHART_ENTHALPY_LINES, wetbulb_lines=CHART_WETBULB_LINES):
+    """Bereken alle lijnen van het diagram als array operaties (één RH×T grid via broadcasting)"""
+    temps = np.linspace(temp_min, temp_max, resolution)
+    pws = saturation_pressure(temps)
     
-    # Temperatuur range voor het diagram (0-40°C)
-    temp_range = np.linspace(0, 40, 200)
+    # RH×T grid: elke rij is één isolijn, laatste rij is de verzadigingslijn (100%)
+    rh_levels = np.append(np.arange(rh_step, 100, rh_step), 100)
+    pw = pws[np.newaxis, :] * (rh_levels[:, np.newaxis] / 100.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratios = np.where(pw < pressure, 0.622 * pw / (pressure - pw), np.nan) * 1000
     
-    # Creëer figure
-    fig = go.Figure()
+    geometry = {
+        'temps': temps,
+        'rh_levels': rh_levels[:-1],
+        'rh_lines': ratios[:-1],
+        'saturation': ratios[-1],
+    }
     
-    # Teken verzadigingslijn (100% RH)
-    sat_humidity_ratio = []
-    for temp in temp_range:
-        # Verzadigde dampdrukverzadiging (Pa) - August-Roche-Magnus formule
-        pws = 611.2 * np.exp(17.62 * temp / (243.12 + temp))
-        # Vochtigheidsratio bij verzadiging (kg water / kg dry air)
-        ws = 0.622 * pws / (101325 - pws)
-        sat_humidity_ratio.append(ws * 1000)  # Converteer naar g/kg
+    # Comfortzone (typisch 20-26°C en 30-60% RH)
+    comfort_temps = np.linspace(20, 26, 50)
+    comfort = humidity_ratio(comfort_temps[np.newaxis, :], np.array([[30], [60]]), pressure)
+    geometry['comfort_temps'] = comfort_temps
+    geometry['comfort_lower'] = comfort[0]
+    geometry['comfort_upper'] = comfort[1]
     
-    fig.add_trace(go.Scatter(
-        x=temp_range,
-        y=sat_humidity_ratio,
-        mode='lines',
-        name='100% RH',
-        line=dict(color='#3498db', width=3),
-        showlegend=True
-    ))
+    saturation_kg = geometry['saturation'] / 1000
     
-    # Teken RH lijnen (10%, 20%, ..., 90%)
-    rh_levels = [10, 20, 30, 40, 50, 60, 70, 80, 90]
-    colors = ['#ecf0f1', '#d5dbdb', '#bdc3c7', '#95a5a6', '#7f8c8d', '#5d6d7e', '#34495e', '#2c3e50', '#1c2833']
+    # Enthalpielijnen: h = 1.006·T + ω·(2501 + 1.86·T) kJ/kg  ->  ω(T) per h niveau
+    if enthalpy_lines:
+        h_max = 1.006 * temp_max + np.nanmax(saturation_kg) * (2501 + 1.86 * temp_max)
+        h_levels = np.arange(np.ceil(1.006 * temp_min / 10) * 10, h_max, 10)
+        w = (h_levels[:, np.newaxis] - 1.006 * temps) / (2501 + 1.86 * temps)
+        w[(w < 0) | (w > saturation_kg)] = np.nan
+        geometry['enthalpy_levels'] = h_levels
+        geometry['enthalpy_lines'] = w * 1000
     
-    for rh, color in zip(rh_levels, colors):
-        humidity_ratio = []
-        for temp in temp_range:
-            pws = 611.2 * np.exp(17.62 * temp / (243.12 + temp))
-            pw = pws * (rh / 100.0)
-            if pw >= 101325:  # Voorkom onmogelijke waarden
-                humidity_ratio.append(None)
-            else:
-                w = 0.622 * pw / (101325 - pw)
-                humidity_ratio.append(w * 1000)
-        
-        fig.add_trace(go.Scatter(
-            x=temp_range,
-            y=humidity_ratio,
-            mode='lines',
-            name=f'{rh}% RH',
-            line=dict(color=color, width=1, dash='dash'),
-            showlegend=False,
-            hovertemplate=f'{rh}% RH<br>T: %{{x:.1f}}°C<br>ω: %{{y:.1f}} g/kg<extra></extra>'
-        ))
+    # Natte bol lijnen (ASHRAE): ω(T) bij constante natte bol temperatuur
+    if wetbulb_lines:
+        wb_levels = np.arange(np.ceil(temp_min / 5) * 5, temp_max, 5)
+        pws_wb = saturation_pressure(wb_levels)[:, np.newaxis]
+        ws_wb = 0.622 * pws_wb / (pressure - pws_wb)
+        twb = wb_levels[:, np.newaxis]
+        w = ((2501 - 2.326 * twb) * ws_wb - 1.006 * (temps - twb)) / (2501 + 1.86 * temps - 4.186 * twb)
+        w[(temps < twb) | (w < 0) | (w > saturation_kg)] = np.nan
+        geometry['wetbulb_levels'] = wb_levels
+        geometry['wetbulb_lines'] = w * 1000
     
-    # Comfortzone (typisch 20-26°C en 30-60% RH)
-    comfort_temp_range = np.linspace(20, 26, 50)
+    return geometry
+
+
+def _family_trace(temps, lines, levels, name, color, hover_format):
+    """Combineer een familie isolijnen in één trace (NaN als scheiding tussen lijnen)"""
+    n_levels, n_temps = lines.shape
+    x = np.concatenate([np.tile(temps, (n_levels, 1)), np.full((n_levels, 1), np.nan)], axis=1).ravel()
+    y = np.concatenate([lines, np.full((n_levels, 1), np.nan)], axis=1).ravel()
+    customdata = np.repeat(levels, n_temps + 1)
+    return go.Scatter(
+        x=x,
+        y=y,
+        customdata=customdata,
+        mode='lines',
+        name=name,
+        line=dict(color=color, width=1, dash='dot'),
+        showlegend=True,
+        hovertemplate=hover_format + '<br>T: %{x:.1f}°C<br>ω: %{y:.1f} g/kg<extra></extra>'
+    )
+
+
+def compute_density_histogram(temperatures, humidities, weights=None, pressure=ATMOSPHERIC_PRESSURE):
+    """Bin alle metingen in één gevectoriseerde stap in een 2D temperatuur × vochtigheidsratio histogram
     
-    # Ondergrens comfortzone (30% RH)
-    comfort_lower = []
-    for temp in comfort_temp_range:
-        pws = 611.2 * np.exp(17.62 * temp / (243.12 + temp))
-        pw = pws * 0.30
-        w = 0.622 * pw / (101325 - pw)
-        comfort_lower.append(w * 1000)
+    weights: optioneel gewicht per punt (aantal metingen of seconden), bijv. voor gegroepeerde waarden
+    """
+    temperatures = np.asarray(temperatures, dtype=float)
+    ratios = humidity_ratio(temperatures, humidities, pressure)
+    weights = np.ones_like(temperatures) if weights is None else np.asarray(weights, dtype=float)
     
-    # Bovengrens comfortzone (60% RH)
-    comfort_upper = []
-    for temp in comfort_temp_range:
-        pws = 611.2 * np.exp(17.62 * temp / (243.12 + temp))
-        pw = pws * 0.60
-        w = 0.622 * pw / (101325 - pw)
-        comfort_upper.append(w * 1000)
+    temp_edges = np.arange(CHART_TEMP_MIN, CHART_TEMP_MAX + DENSITY_TEMP_BIN, DENSITY_TEMP_BIN)
+    ratio_edges = np.arange(0, CHART_HUMIDITY_RATIO_MAX + DENSITY_RATIO_BIN, DENSITY_RATIO_BIN)
     
-    # Vul comfortzone
-    fig.add_trace(go.Scatter(
-        x=list(comfort_temp_range) + list(comfort_temp_range[::-1]),
-        y=comfort_lower + comfort_upper[::-1],
-        fill='toself',
-        fillcolor='rgba(46, 204, 113, 0.2)',
-        line=dict(width=0),
-        name=t['comfort_zone'],
-        showlegend=True,
-        hoverinfo='skip'
-    ))
+    valid = np.isfinite(temperatures) & np.isfinite(ratios)
+    counts, _, _ = np.histogram2d(temperatures[valid], ratios[valid], bins=[temp_edges, ratio_edges],
+                                   weights=weights[valid])
     
-    # Bereken huidige vochtigheidsratio
-    if current_temp is not None and current_rh is not None:
-        pws_current = 611.2 * np.exp(17.62 * current_temp / (243.12 + current_temp))
-        pw_current = pws_current * (current_rh / 100.0)
-        w_current = 0.622 * pw_current / (101325 - pw_current)
-        w_current_g_kg = w_current * 1000
-        
-        # Markeer huidige conditie
-        fig.add_trace(go.Scatter(
-            x=[current_temp],
-            y=[w_current_g_kg],
-            mode='markers+text',
-            name=t['current_condition'],
-            marker=dict(
-                size=15,
-                color='#e74c3c',
-                symbol='star',
-                line=dict(width=2, color='white')
-            ),
-            text=[f"{current_temp:.1f}°C<br>{current_rh:.0f}%"],
-            textposition='top center',
-            textfont=dict(size=12, color='#e74c3c', family='Arial Black'),
-            showlegend=True,
-            hovertemplate=f'{t["current_condition"]}<br>T: {current_temp:.1f}°C<br>RH: {current_rh:.0f}%<br>ω: {w_current_g_kg:.1f} g/kg<extra></extra>'
-        ))
+    total = counts.sum()
+    if total == 0:
+        return None
     
-    # Layout
-    fig.update_layout(
-        title={
-            'text': f"📊 {t['psychrometric_chart']}",
-            'x': 0.5,
-            'xanchor': 'center',
-            'font': {'size': 20, 'color': '#2c3e50', 'family': 'Arial Black'}
-        },
-        xaxis_title=t['dry_bulb_temp'],
-        yaxis_title='Vochtigheidsratio ω (g water / kg droge lucht)',
-        xaxis=dict(
-            range=[0, 40],
-            showgrid=True,
-            gridcolor='rgba(0,0,0,0.1)',
-            dtick=5
-        ),
-        yaxis=dict(
-            range=[0, 25],
-            showgrid=True,
-            gridcolor='rgba(0,0,0,0.1)',
-            dtick=5
+    # Percentage van de tijd per bin, lege bins transparant (None)
+    share = (counts.T / total) * 100
+    z = np.where(counts.T > 0, np.round(share, 3), np.nan)
+    
+    return {
+        'x': ((temp_edges[:-1] + temp_edges[1:]) / 2).round(3).tolist(),
+        'y': ((ratio_edges[:-1] + ratio_edges[1:]) / 2).round(3).tolist(),
+        'z': [[None if np.isnan(v) else float(v) for v in row] for row in z],
+        'count': int(total)
+    }
+
+
+def get_density_properties(density, label):
+    """Trace eigenschappen van de dichtheid overlay (of een lege, onzichtbare overlay)"""
+    if not density:
+        return {'x': [], 'y': [], 'z': [], 'visible': False}
+    
+    return {
+        'x': density['x'],
+        'y': density['y'],
+        'z': density['z'],
+        'name': label,
+        'visible': True,
+        'hovertemplate': f'{label}<br>T: %{{x:.1f}}°C<br>ω: %{{y:.1f}} g/kg<br>%{{z:.2f}}%<extra></extra>'
+    }
+
+
+def _empty_density_trace(name):
+    """Heatmap trace voor de dichtheid overlay (onzichtbaar tot er een periode geselecteerd is)"""
+    return go.Heatmap(
+        x=[],
+        y=[],
+        z=[],
+        name=name,
+        colorscale='YlOrRd',
+        opacity=0.6,
+        showscale=False,
+        hoverongaps=False,
+        visible=False,
+        uid=DENSITY_UID
+    )
+
+
+def _empty_marker_trace(name):
+    """Marker trace zonder punt (onzichtbaar tot er een conditie bekend is)"""
+    return go.Scatter(
+        x=[],
+        y=[],
+        mode='markers+text',
+        name=name,
+        marker=dict(
+            size=15,
+            color='#e74c3c',
+            symbol='star',
+            line=dict(width=2, color='white')
         ),
-        height=600,
-        plot_bgcolor='rgba(255,255,255,1)',
-        paper_bgcolor='white',
-        hovermode='closest',
-        legend=dict(
-            x=0.02,
-            y=0.98,
-            bgcolor='rgba(255,255,255,0.9)',
-            bordercolor='#2c3e50',
-            borderwidth=1
-        )
+        textposition='top center',
+        textfont=dict(size=12, color='#e74c3c', family='Arial Black'),
+        showlegend=True,
+        visible=False,
+        uid=MARKER_UID
     )
-    
-    return fig
 
 
-def create_psychrometric_chart_historical(current_temp, current_rh, lang='nl', label='Historische toestand'):
-    """Genereer psychrometrisch diagram met aangepaste label voor historisch punt"""
+@lru_cache(maxsize=None)
+def _build_background(lang):
+    """Bouw de statische achtergrond (verzadigingslijn, RH lijnen, comfortzone) eenmalig per taal"""
     t = TRANSLATIONS[lang]
-    
-    # Temperatuur range voor het diagram (0-40°C)
-    temp_range = np.linspace(0, 40, 200)
+    geometry = compute_chart_geometry()
+    temps = geometry['temps']
     
     # Creëer figure
     fig = go.Figure()
     
-    # Teken verzadigingslijn (100% RH)
-    sat_humidity_ratio = []
-    for temp in temp_range:
-        pws = 611.2 * np.exp(17.62 * temp / (243.12 + temp))
-        ws = 0.622 * pws / (101325 - pws)
-        sat_humidity_ratio.append(ws * 1000)
+    # Dichtheid overlay als eerste trace, zodat de heatmap onder de isolijnen ligt
+    fig.add_trace(_empty_density_trace(t['density_overlay']))
     
+    # Teken verzadigingslijn (100% RH)
     fig.add_trace(go.Scatter(
-        x=temp_range,
-        y=sat_humidity_ratio,
+        x=temps,
+        y=geometry['saturation'],
         mode='lines',
         name='100% RH',
         line=dict(color='#3498db', width=3),
         showlegend=True
     ))
     
-    # Teken RH lijnen (10%, 20%, ..., 90%)
-    rh_levels = [10, 20, 30, 40, 50, 60, 70, 80, 90]
-    colors = ['#ecf0f1', '#d5dbdb', '#bdc3c7', '#95a5a6', '#7f8c8d', '#5d6d7e', '#34495e', '#2c3e50', '#1c2833']
+    # Teken RH lijnen (standaard 10%, 20%, ..., 90%)
+    rh_levels = geometry['rh_levels']
+    colors = sample_colorscale(RH_COLORSCALE, np.linspace(0, 1, len(rh_levels)) if len(rh_levels) > 1 else [0.5])
     
-    for rh, color in zip(rh_levels, colors):
-        humidity_ratio = []
-        for temp in temp_range:
-            pws = 611.2 * np.exp(17.62 * temp / (243.12 + temp))
-            pw = pws * (rh / 100.0)
-            if pw >= 101325:
-                humidity_ratio.append(None)
-            else:
-                w = 0.622 * pw / (101325 - pw)
-                humidity_ratio.append(w * 1000)
-        
+    for rh, line, color in zip(rh_levels, geometry['rh_lines'], colors):
         fig.add_trace(go.Scatter(
-            x=temp_range,
-            y=humidity_ratio,
+            x=temps,
+            y=line,
             mode='lines',
-            name=f'{rh}% RH',
+            name=f'{rh:g}% RH',
             line=dict(color=color, width=1, dash='dash'),
             showlegend=False,
-            hovertemplate=f'{rh}% RH<br>T: %{{x:.1f}}°C<br>ω: %{{y:.1f}} g/kg<extra></extra>'
+            hovertemplate=f'{rh:g}% RH<br>T: %{{x:.1f}}°C<br>ω: %{{y:.1f}} g/kg<extra></extra>'
         ))
     
-    # Comfortzone (typisch 20-26°C en 30-60% RH)
-    comfort_temp_range = np.linspace(20, 26, 50)
-    
-    comfort_lower = []
-    for temp in comfort_temp_range:
-        pws = 611.2 * np.exp(17.62 * temp / (243.12 + temp))
-        pw = pws * 0.30
-        w = 0.622 * pw / (101325 - pw)
-        comfort_lower.append(w * 1000)
-    
-    comfort_upper = []
-    for temp in comfort_temp_range:
-        pws = 611.2 * np.exp(17.62 * temp / (243.12 + temp))
-        pw = pws * 0.60
-        w = 0.622 * pw / (101325 - pw)
-        comfort_upper.append(w * 1000)
+    # Optionele enthalpie- en natte bol lijnen
+    if 'enthalpy_lines' in geometry:
+        fig.add_trace(_family_trace(temps, geometry['enthalpy_lines'], geometry['enthalpy_levels'],
+                                    t['enthalpy'], '#e67e22', 'h: %{customdata:.0f} kJ/kg'))
+    if 'wetbulb_lines' in geometry:
+        fig.add_trace(_family_trace(temps, geometry['wetbulb_lines'], geometry['wetbulb_levels'],
+                                    t['wet_bulb'], '#8e44ad', 'T<sub>wb</sub>: %{customdata:.0f}°C'))
     
+    # Vul comfortzone
+    comfort_temps = geometry['comfort_temps']
     fig.add_trace(go.Scatter(
-        x=list(comfort_temp_range) + list(comfort_temp_range[::-1]),
-        y=comfort_lower + comfort_upper[::-1],
+        x=np.concatenate([comfort_temps, comfort_temps[::-1]]),
+        y=np.concatenate([geometry['comfort_lower'], geometry['comfort_upper'][::-1]]),
         fill='toself',
         fillcolor='rgba(46, 204, 113, 0.2)',
         line=dict(width=0),
@@ -230,30 +284,8 @@ def create_psychrometric_chart_historical(current_temp, current_rh, lang='nl', l
         hoverinfo='skip'
     ))
     
-    # Bereken en markeer punt
-    if current_temp is not None and current_rh is not None:
-        pws_current = 611.2 * np.exp(17.62 * current_temp / (243.12 + current_temp))
-        pw_current = pws_current * (current_rh / 100.0)
-        w_current = 0.622 * pw_current / (101325 - pw_current)
-        w_current_g_kg = w_current * 1000
-        
-        fig.add_trace(go.Scatter(
-            x=[current_temp],
-            y=[w_current_g_kg],
-            mode='markers+text',
-            name=label,
-            marker=dict(
-                size=15,
-                color='#e74c3c',
-                symbol='star',
-                line=dict(width=2, color='white')
-            ),
-            text=[f"{current_temp:.1f}°C<br>{current_rh:.0f}%"],
-            textposition='top center',
-            textfont=dict(size=12, color='#e74c3c', family='Arial Black'),
-            showlegend=True,
-            hovertemplate=f'{label}<br>T: {current_temp:.1f}°C<br>RH: {current_rh:.0f}%<br>ω: {w_current_g_kg:.1f} g/kg<extra></extra>'
-        ))
+    # Marker trace altijd als laatste, zodat de index vast ligt
+    fig.add_trace(_empty_marker_trace(t['current_condition']))
     
     # Layout
     fig.update_layout(
@@ -266,13 +298,13 @@ def create_psychrometric_chart_historical(current_temp, current_rh, lang='nl', l
         xaxis_title=t['dry_bulb_temp'],
         yaxis_title='Vochtigheidsratio ω (g water / kg droge lucht)',
         xaxis=dict(
-            range=[0, 40],
+            range=[CHART_TEMP_MIN, CHART_TEMP_MAX],
             showgrid=True,
             gridcolor='rgba(0,0,0,0.1)',
             dtick=5
         ),
         yaxis=dict(
-            range=[0, 25],
+            range=[0, CHART_HUMIDITY_RATIO_MAX],
             showgrid=True,
             gridcolor='rgba(0,0,0,0.1)',
             dtick=5
@@ -287,7 +319,49 @@ def create_psychrometric_chart_historical(current_temp, current_rh, lang='nl', l
             bgcolor='rgba(255,255,255,0.9)',
             bordercolor='#2c3e50',
             borderwidth=1
-        )
+        ),
+        # Behoud zoom/pan bij updates
+        uirevision='psychrometric'
     )
     
     return fig
+
+
+def get_marker_index(lang='nl'):
+    """Index van de marker trace in de figure (voor Patch updates)"""
+    return len(_build_background(lang).data) - 1
+
+
+def get_marker_properties(current_temp, current_rh, label):
+    """Bereken de trace eigenschappen van de marker voor een conditie"""
+    w_current_g_kg = float(humidity_ratio(current_temp, current_rh))
+    
+    return {
+        'x': [current_temp],
+        'y': [w_current_g_kg],
+        'name': label,
+        'visible': True,
+        'text': [f"{current_temp:.1f}°C<br>{current_rh:.0f}%"],
+        'hovertemplate': f'{label}<br>T: {current_temp:.1f}°C<br>RH: {current_rh:.0f}%<br>ω: {w_current_g_kg:.1f} g/kg<extra></extra>'
+    }
+
+
+def create_psychrometric_chart(current_temp, current_rh, lang='nl', label=None, density=None):
+    """Genereer een psychrometrisch (Mollier) diagram met huidige conditie"""
+    t = TRANSLATIONS[lang]
+    
+    # Kopie van de gecachte achtergrond, alleen de marker (en eventueel de overlay) wordt ingevuld
+    fig = go.Figure(_build_background(lang))
+    
+    if current_temp is not None and current_rh is not None:
+        fig.data[get_marker_index(lang)].update(get_marker_properties(current_temp, current_rh, label or t['current_condition']))
+    
+    if density:
+        fig.data[DENSITY_INDEX].update(get_density_properties(density, t['density_overlay']))
+    
+    return fig
+
+
+def create_psychrometric_chart_historical(current_temp, current_rh, lang='nl', label='Historische toestand'):
+    """Genereer psychrometrisch diagram met aangepaste label voor historisch punt"""
+    return create_psychrometric_chart(current_temp, current_rh, lang, label)
@@ -0,0 +1,125 @@
+"""Snelle start: de poort is direct open, de app volgt zodra de achtergrond initialisatie klaar is
+
+StartupGate is de WSGI app die waitress vanaf het begin serveert. /healthz (leeft het proces) en
+/ready (kan de app requests afhandelen) antwoorden altijd direct; alle andere requests krijgen tot de
+Dash app klaar is een 503 met Retry-After, browsers een pagina die zichzelf ververst.
+
+Dit module importeert bewust alleen de standaard bibliotheek: het hoort bij het pad vóór de poort open is.
+"""
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+HEALTH_PATH = '/healthz'
+READY_PATH = '/ready'
+# Browsers en clients proberen het na zoveel seconden opnieuw
+RETRY_AFTER = 2
+
+STARTING_PAGE = (
+    '<!DOCTYPE html><html><head><meta charset="utf-8">'
+    f'<meta http-equiv="refresh" content="{RETRY_AFTER}">'
+    '<title>XY-MD02 Temperature &amp; Humidity Monitor</title></head>'
+    '<body style="font-family:sans-serif;text-align:center;margin-top:20vh;color:#555">'
+    '<h2>XY-MD02 WebApp</h2><p>{message}</p></body></html>'
+)
+
+
+class StartupGate:
+    """WSGI dispatcher: health/readiness direct, de rest naar de app zodra die is gezet
+
+    initializer(gate) bouwt de app in een achtergrond thread: vanaf start(), of bij de eerste request
+    als een andere WSGI server (waitress-serve app:server) het module alleen importeert.
+    """
+
+    def __init__(self, started=None, initializer=None):
+        self.started = started if started is not None else time.perf_counter()
+        self.app = None
+        self.error = None
+        self.phases = {}  # Fase -> seconden
+        self._lock = threading.Lock()
+        self._initializer = initializer
+        self._init_thread = None
+
+    def start(self):
+        """Start de initializer (één keer) in een achtergrond thread"""
+        with self._lock:
+            if self._initializer is None or self._init_thread is not None:
+                return
+            self._init_thread = threading.Thread(target=self._initializer, args=(self,), daemon=True, name='startup')
+        self._init_thread.start()
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    @contextmanager
+    def phase(self, name):
+        """Meet een fase van de initialisatie: with gate.phase('database'): ..."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.phases[name] = round(time.perf_counter() - start, 3)
+
+    def mark(self, name):
+        """Leg het tijdstip (seconden sinds de start) van een mijlpaal vast, bijv. 'listening'"""
+        with self._lock:
+            self.phases[name] = round(self.elapsed, 3)
+
+    def set_ready(self, app):
+        with self._lock:
+            self.phases['ready'] = round(self.elapsed, 3)
+            self.app = app
+
+    def set_failed(self, error):
+        with self._lock:
+            self.error = str(error) or type(error).__name__
+
+    def status(self):
+        with self._lock:
+            state = 'ready' if self.app is not None else ('failed' if self.error else 'starting')
+            status = {'status': state, 'uptime': round(self.elapsed, 3), 'startup': dict(self.phases)}
+            if self.error:
+                status['error'] = self.error
+            return status
+
+    def __call__(self, environ, start_response):
+        if self._init_thread is None:
+            self.start()
+        path = environ.get('PATH_INFO', '')
+        if path == HEALTH_PATH:
+            return self._json(start_response, '200 OK', {'status': 'ok', 'uptime': round(self.elapsed, 3)})
+
+        app = self.app
+        if path == READY_PATH:
+            status = self.status()
+            return self._json(start_response, '200 OK' if app is not None else '503 Service Unavailable', status)
+        if app is not None:
+            return app(environ, start_response)
+
+        message = 'Opstarten mislukt, zie de log' if self.error else 'Wordt gestart...'
+        if 'text/html' in environ.get('HTTP_ACCEPT', ''):
+            body = STARTING_PAGE.replace('{message}', message).encode('utf-8')
+            content_type = 'text/html; charset=utf-8'
+        else:
+            body = message.encode('utf-8')
+            content_type = 'text/plain; charset=utf-8'
+        start_response('503 Service Unavailable', [
+            ('Content-Type', content_type),
+            ('Content-Length', str(len(body))),
+            ('Retry-After', str(RETRY_AFTER)),
+            ('Cache-Control', 'no-store')
+        ])
+        return [body]
+
+    @staticmethod
+    def _json(start_response, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        start_response(status, [
+            ('Content-Type', 'application/json'),
+            ('Content-Length', str(len(body))),
+            ('Cache-Control', 'no-store')
+        ])
+        return [body]
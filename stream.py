@@ -0,0 +1,134 @@
+import json
+import logging
+import os
+import queue
+import threading
+from collections import deque
+from flask import Response
+from dotenv import load_dotenv
+from timeutils import to_local_epoch
+
+# Laad environment variabelen
+load_dotenv()
+logger = logging.getLogger(__name__)
+LIVE_STREAM_ENABLED = os.getenv('LIVE_STREAM_ENABLED', 'True').lower() == 'true'
+LIVE_STREAM_MAX_CLIENTS = int(os.getenv('LIVE_STREAM_MAX_CLIENTS', '20'))
+
+if LIVE_STREAM_MAX_CLIENTS < 1:
+    logger.warning("LIVE_STREAM_MAX_CLIENTS moet minimaal 1 zijn (%s), gebruik 1", LIVE_STREAM_MAX_CLIENTS)
+    LIVE_STREAM_MAX_CLIENTS = 1
+
+# Keepalive comment zodat proxies de verbinding open houden en afgesloten clients worden opgemerkt
+HEARTBEAT_INTERVAL = 15  # seconden
+# Recente metingen die een nieuwe client direct ontvangt (overbrugt de tijd sinds de laatste grafiek refresh)
+BACKLOG_SIZE = 120
+# Maximaal aantal wachtende berichten per client, daarna vervalt het oudste bericht
+CLIENT_QUEUE_SIZE = 60
+# Reconnect vertraging voor de browser (EventSource 'retry' veld)
+RECONNECT_DELAY_MS = 5000
+
+
+class SampleBroadcaster:
+    """Verdeelt elke nieuwe meting (één keer geserialiseerd) over alle verbonden clients"""
+
+    def __init__(self, max_clients, backlog_size=BACKLOG_SIZE):
+        self.max_clients = max_clients
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._backlog = deque(maxlen=backlog_size)
+
+    @property
+    def client_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def subscribe(self):
+        """Registreer een nieuwe client, geeft None terug als het maximum is bereikt"""
+        with self._lock:
+            if len(self._subscribers) >= self.max_clients:
+                return None
+            client_queue = queue.Queue(maxsize=CLIENT_QUEUE_SIZE)
+            for message in list(self._backlog)[-CLIENT_QUEUE_SIZE:]:
+                client_queue.put_nowait(message)
+            self._subscribers.add(client_queue)
+            return client_queue
+
+    def unsubscribe(self, client_queue):
+        with self._lock:
+            self._subscribers.discard(client_queue)
+
+    def publish(self, sample):
+        """Serialiseer de meting één keer en zet het bericht in de queue van elke client"""
+        message = f"id: {sample['timestamp']}\ndata: {json.dumps(sample, separators=(',', ':'))}\n\n"
+
+        with self._lock:
+            self._backlog.append(message)
+            subscribers = list(self._subscribers)
+
+        for client_queue in subscribers:
+            try:
+                client_queue.put_nowait(message)
+            except queue.Full:
+                # Trage client: laat het oudste bericht vallen in plaats van de acquisitie te blokkeren
+                try:
+                    client_queue.get_nowait()
+                    client_queue.put_nowait(message)
+                except (queue.Empty, queue.Full):
+                    pass
+
+
+broadcaster = SampleBroadcaster(LIVE_STREAM_MAX_CLIENTS)
+
+
+def publish_sample(timestamp, temperature, humidity, dewpoint, absolute_humidity):
+    """Publiceer een nieuwe meting naar alle verbonden browsers (aangeroepen vanuit de Modbus thread)"""
+    if not LIVE_STREAM_ENABLED:
+        return
+
+    # Lokale tijd als epoch milliseconden, zelfde x-as conventie als de grafieken
+    local_ms = to_local_epoch(timestamp) * 1000
+
+    broadcaster.publish({
+        'timestamp': timestamp,
+        'local_ms': local_ms,
+        'temperature': temperature,
+        'humidity': humidity,
+        'dewpoint': round(dewpoint, 2),
+        'absolute_humidity': round(absolute_humidity, 2)
+    })
+
+
+def register_stream_routes(server):
+    """Registreer het Server-Sent Events endpoint (/stream) op de Flask server"""
+    if not LIVE_STREAM_ENABLED:
+        return
+
+    @server.route('/stream')
+    def stream():
+        client_queue = broadcaster.subscribe()
+        if client_queue is None:
+            # Browser valt terug op polling en probeert het later opnieuw
+            return Response('Te veel live verbindingen', status=503, headers={'Retry-After': '30'})
+
+        logger.debug("Live stream client verbonden (%d/%d)", broadcaster.client_count, broadcaster.max_clients)
+
+        def generate():
+            try:
+                yield f"retry: {RECONNECT_DELAY_MS}\n\n"
+                while True:
+                    try:
+                        yield client_queue.get(timeout=HEARTBEAT_INTERVAL)
+                    except queue.Empty:
+                        yield ": keepalive\n\n"
+            finally:
+                broadcaster.unsubscribe(client_queue)
+                logger.debug("Live stream client afgesloten (%d/%d)", broadcaster.client_count, broadcaster.max_clients)
+
+        return Response(
+            generate(),
+            mimetype='text/event-stream',
+            headers={
+                'Cache-Control': 'no-cache',
+                'X-Accel-Buffering': 'no'  # Geen buffering door reverse proxies (nginx)
+            }
+        )
@@ -0,0 +1,65 @@
+"""Gedeelde fixtures: vaste instellingen vóór de modules geïmporteerd worden, en een tijdelijke database
+
+De modules lezen hun instellingen bij het importeren (load_dotenv overschrijft bestaande variabelen
+niet), dus een lokale .env heeft geen invloed op de tests.
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+os.environ.update({
+    'DATABASE_FILE': os.path.join(tempfile.mkdtemp(prefix='xy-md02-tests-'), 'import.db'),
+    'TIMEZONE': 'Europe/Amsterdam',
+    'DATA_RETENTION_DAYS': '0',
+    'RETENTION_TIERS': '',
+    'PARTITION_COMPACTION': 'False',
+    'INGEST_COMPRESSION': 'off',
+    'COMPRESSION_TEMP_DEVIATION': '0.1',
+    'COMPRESSION_HUMIDITY_DEVIATION': '0.5',
+    'COMPRESSION_MAX_INTERVAL': '300',
+    'BACKGROUND_CALLBACKS': 'False',
+    'ALERT_RULES': '',
+    'ALERT_HOLDOFF': '300',
+    'API_PAGE_SIZE': '5000',
+    'DEBUG_LOGGING': 'False',
+})
+
+import pytest  # noqa: E402
+import database  # noqa: E402
+
+
+@pytest.fixture
+def temp_db(tmp_path, monkeypatch):
+    """Pad naar een lege database; database.DB_FILE wijst ernaar"""
+    db_file = str(tmp_path / 'measurements.db')
+    monkeypatch.setattr(database, 'DB_FILE', db_file)
+    conn = sqlite3.connect(db_file)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.close()
+    return db_file
+
+
+def _insert_rows(db_file, rows):
+    conn = sqlite3.connect(db_file)
+    cursor = conn.cursor()
+    by_table = {}
+    for row in rows:
+        by_table.setdefault(database.get_table_name(datetime.fromtimestamp(row[0])), []).append(row)
+    for table_name, table_rows in by_table.items():
+        database.ensure_table_exists(cursor, table_name)
+        cursor.executemany(
+            f'INSERT INTO {table_name} ({database.INSERT_COLUMNS}) VALUES (?, ?, ?, ?, ?)', table_rows
+        )
+    conn.commit()
+    conn.close()
+
+
+@pytest.fixture
+def insert_rows():
+    """insert_rows(db_file, rows): (timestamp, temperature, humidity, dewpoint, absolute_humidity) in hun dagtabel"""
+    return _insert_rows
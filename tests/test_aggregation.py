@@ -0,0 +1,115 @@
+"""Aggregaten over de hele historie: partitie cache en samenvouwen gelijk aan één bucket query"""
+import sqlite3
+from datetime import datetime, timedelta
+import numpy as np
+import pytest
+import aggregation
+import database
+from aggregation import PartitionAggregateCache, aggregate_all_buckets
+
+COLUMNS = ['temperature', 'humidity']
+
+
+def partial(buckets):
+    return {'bucket': np.arange(buckets, dtype=np.int64), 'n': np.ones(buckets)}
+
+
+def test_cache_evicts_least_recently_used_within_budget():
+    size = aggregation._partial_nbytes(partial(10))  # 160 bytes
+    cache = PartitionAggregateCache(budget_bytes=3 * size)
+    for name in 'abc':
+        cache.put((name,), partial(10))
+    assert cache.get(('a',)) is not None  # a is nu het meest recent gebruikt
+    cache.put(('d',), partial(10))
+    assert cache.get(('b',)) is None
+    assert [key[0] for key in cache._entries] == ['c', 'a', 'd']
+    assert cache._size == 3 * size
+
+    # Groter dan het hele budget: niet bewaard, niets verdrongen
+    cache.put(('e',), partial(100))
+    assert cache.get(('e',)) is None and len(cache._entries) == 3
+
+    cache.retain_tables(['a'])
+    assert list(cache._entries) == [('a',)] and cache._size == size
+
+
+class SharedCache(dict):
+    def set(self, key, value, expire=None):
+        self[key] = value
+
+
+def test_shared_cache_is_second_level():
+    shared = SharedCache()
+    writer, reader = PartitionAggregateCache(10_000), PartitionAggregateCache(10_000)
+    writer.shared = reader.shared = shared
+    writer.put(('measurements_20260101', (1, 96)), partial(5))
+    assert ('partition-aggregate', 'measurements_20260101', (1, 96)) in shared
+    assert len(reader.get(('measurements_20260101', (1, 96)))['bucket']) == 5
+    assert ('measurements_20260101', (1, 96)) in reader._entries
+
+
+def rows_for_day(day, step=300):
+    start = int(day.timestamp())
+    return [(ts, 20 + (ts // step) % 40 / 10, 40 + (ts // step) % 70 / 5, 10.0, 8.0)
+            for ts in range(start, min(start + 86400, int(datetime.now().timestamp())), step)]
+
+
+@pytest.fixture
+def history(temp_db, insert_rows, monkeypatch):
+    """Vier afgesloten dagen plus de lopende dag"""
+    monkeypatch.setattr(aggregation, 'partition_cache', PartitionAggregateCache(10 * 1024 * 1024))
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    insert_rows(temp_db, [row for offset in range(4, -1, -1) for row in rows_for_day(today - timedelta(days=offset))])
+    conn = sqlite3.connect(temp_db)
+    yield conn.cursor()
+    conn.close()
+
+
+def expected_buckets(cursor, bucket_seconds):
+    query, _ = database.build_bucket_query(cursor, COLUMNS, bucket_seconds)
+    return cursor.execute(query).fetchall()
+
+
+def assert_matches(df, expected):
+    assert df['bucket'].tolist() == [row[0] for row in expected]
+    assert df['count'].tolist() == [row[1] for row in expected]
+    np.testing.assert_allclose(df[['temperature', 'temperature_min', 'temperature_max',
+                                   'humidity', 'humidity_min', 'humidity_max']].to_numpy(),
+                               np.array([row[2:] for row in expected], dtype=np.float64), rtol=1e-12)
+
+
+@pytest.mark.parametrize('bucket_seconds', [3600, 21600, 86400])
+def test_aggregate_all_buckets_matches_bucket_query(history, bucket_seconds):
+    assert_matches(aggregate_all_buckets(history, COLUMNS, bucket_seconds), expected_buckets(history, bucket_seconds))
+
+
+def test_closed_partitions_come_from_cache(history, temp_db, insert_rows, monkeypatch):
+    queried = []
+    build = aggregation.build_partition_bucket_query
+
+    def tracking(table_name, *args, **kwargs):
+        queried.append(table_name)
+        return build(table_name, *args, **kwargs)
+
+    monkeypatch.setattr(aggregation, 'build_partition_bucket_query', tracking)
+    aggregate_all_buckets(history, COLUMNS, 3600)
+    assert len(queried) == 5
+
+    queried.clear()
+    aggregate_all_buckets(history, COLUMNS, 3600)
+    assert queried == [database.get_table_name()]  # Alleen de lopende dag
+
+    # Nagekomen rij in een afgesloten dag: nieuwe versie, opnieuw gelezen en meegeteld
+    late_day = datetime.now().replace(hour=12, minute=0, second=0, microsecond=0) - timedelta(days=2)
+    insert_rows(temp_db, [(int(late_day.timestamp()) + 7, 35.0, 90.0, 28.0, 35.0)])
+    queried.clear()
+    result = aggregate_all_buckets(history, COLUMNS, 3600)
+    assert sorted(queried) == sorted([database.get_table_name(late_day), database.get_table_name()])
+    assert_matches(result, expected_buckets(history, 3600))
+
+
+def test_rollup_tier_and_newer_raw_rows(history, temp_db, monkeypatch):
+    monkeypatch.setattr(database, 'RETENTION_TIERS', [(3600, 0)])
+    assert database.rollup_partitions() > 0
+    for bucket_seconds in (3600, 86400):
+        assert_matches(aggregate_all_buckets(history, COLUMNS, bucket_seconds), expected_buckets(history, bucket_seconds))
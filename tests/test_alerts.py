@@ -0,0 +1,104 @@
+"""Alert regels: drempel met hysteresis/delay, EWMA helling, z-score en holdoff"""
+import pytest
+from alerts import ZSCORE_MIN_SAMPLES, AlertEngine, RateRule, ZScoreRule, parse_rule, parse_rules
+
+START = 1_700_000_000
+
+
+def feed(rule, values, step=1):
+    """Metingen met vaste tussenpozen -> [(timestamp, overgang)] voor elke gemelde overgang"""
+    events = []
+    for i, value in enumerate(values):
+        state = rule.update(START + i * step, value)
+        if state is not None:
+            events.append((START + i * step, state))
+    return events
+
+
+def test_threshold_delay_and_hysteresis():
+    rule = parse_rule('temperature>28,hysteresis=0.5,delay=2m')
+    # 60 s boven de drempel is korter dan de delay, dan weer eronder: geen melding
+    assert feed(rule, [29] * 60 + [27] * 10) == []
+
+    rule = parse_rule('temperature>28,hysteresis=0.5,delay=2m')
+    values = [29] * 200 + [27.8] * 100 + [27.4] * 10
+    assert feed(rule, values) == [(START + 120, 'alert'), (START + 300, 'resolved')]
+
+
+def test_rate_rule_follows_ramp():
+    rule = parse_rule('rate:temperature>2/10m')
+    assert isinstance(rule, RateRule) and rule.window == 600
+    # 0.5 °C per minuut = 5 °C per 10 minuten; vlak ervoor geen melding
+    values = [20.0] * 600 + [20.0 + i / 120 for i in range(1, 3600)]
+    events = feed(rule, values)
+    assert [state for _, state in events] == ['alert']
+    # EWMA met tijdconstante 600 s: 2/5 van de helling na -600 * ln(3/5) ≈ 306 s
+    assert START + 600 + 200 < events[0][0] < START + 600 + 400
+    assert rule.metric == pytest.approx(5.0, rel=0.02)
+
+
+def test_rate_rule_falling():
+    rule = parse_rule('rate:humidity<-10/1h')
+    values = [60.0 - i / 180 for i in range(4 * 3600)]  # -20 %RH per uur
+    assert [state for _, state in feed(rule, values)] == ['alert']
+
+
+def test_zscore_waits_for_min_samples_then_flags_spike():
+    rule = parse_rule('zscore:humidity>4/1h')
+    assert isinstance(rule, ZScoreRule)
+    # Een sprong direct na de start telt niet: nog te weinig metingen
+    assert feed(rule, [50.0, 50.2, 58.0] + [50.0] * 3) == []
+
+    rule = parse_rule('zscore:humidity>4/1h')
+    noise = [50.0 + (0.2 if i % 2 else -0.2) for i in range(2 * ZSCORE_MIN_SAMPLES)]
+    assert feed(rule, noise) == []
+    assert rule.update(START + len(noise), 53.0) == 'alert'
+    assert rule.update(START + len(noise) + 1, 50.0) == 'resolved'
+
+
+def test_holdoff_suppresses_flapping_and_reports_late():
+    rule = parse_rule('temperature>28,holdoff=5m')
+    assert rule.update(START, 29) == 'alert'
+    assert rule.update(START + 10, 27) == 'resolved'
+    # Binnen de holdoff: actief maar niet gemeld, en dus ook geen 'resolved'
+    assert rule.update(START + 20, 29) is None and rule.active
+    assert rule.update(START + 30, 27) is None and not rule.active
+    assert rule.update(START + 40, 29) is None
+    # Nog steeds actief na de holdoff: alsnog melden
+    assert rule.update(START + 300, 29) == 'alert'
+    assert rule.update(START + 310, 27) == 'resolved'
+
+
+@pytest.mark.parametrize('text', [
+    'temperature=28',
+    'pressure>1000',
+    'temperature>28/10m',
+    'rate:temperature>2/0s',
+    'temperature>28,colour=red',
+    'temperature>28,delay=-5',
+])
+def test_parse_rule_rejects_invalid(text):
+    with pytest.raises(ValueError):
+        parse_rule(text)
+
+
+def test_parse_rules_skips_invalid():
+    rules = parse_rules('temperature>28; pressure>1000 ;rate:humidity<-10/1h;')
+    assert [rule.name for rule in rules] == ['temperature>28', 'rate:humidity<-10/1h']
+
+
+class CollectingDispatcher:
+    def __init__(self):
+        self.events = []
+
+    def submit(self, event):
+        self.events.append(event)
+
+
+def test_engine_emits_event_per_transition():
+    dispatcher = CollectingDispatcher()
+    engine = AlertEngine([parse_rule('humidity<30')], dispatcher, 'test')
+    engine.evaluate((START, 21.0, 25.0, 0.7, 4.6))
+    engine.evaluate((START + 1, 21.0, 35.0, 5.0, 6.4))
+    assert [(event['state'], event['value'], event['measurement']) for event in dispatcher.events] == \
+        [('alert', 25.0, 25.0), ('resolved', 35.0, 35.0)]
@@ -0,0 +1,128 @@
+"""JSON API: keyset paginering over partities, cursors en conditional requests"""
+import os
+import sqlite3
+import subprocess
+import sys
+from datetime import datetime
+import pytest
+from flask import Flask
+import api
+import database
+from timeutils import LOCAL_ZONE
+
+# Drie afgesloten dagen, elke 10 minuten een meting; elk uur een dubbele timestamp
+START = int(datetime(2026, 6, 10, tzinfo=LOCAL_ZONE).timestamp())
+END = START + 3 * 86400 - 1
+
+
+def make_rows():
+    rows = []
+    for i, timestamp in enumerate(range(START, END + 1, 600)):
+        rows.append((timestamp, 20 + (i % 50) / 10, 50 + (i % 30) / 2, 10.0, 8.0))
+        if timestamp % 3600 == 0:
+            rows.append((timestamp, 30.0, 40.0, 15.0, 9.0))
+    return rows
+
+
+@pytest.fixture
+def client(temp_db, insert_rows, monkeypatch):
+    insert_rows(temp_db, make_rows())
+    monkeypatch.setattr(api, 'DB_FILE', temp_db)
+    server = Flask(__name__)
+    api.register_api_routes(server)
+    return server.test_client()
+
+
+def fetch_all(client, **query):
+    """Alle pagina's via next_cursor -> (data, aantal pagina's)"""
+    data, pages, cursor = [], 0, None
+    while True:
+        args = dict(query, **({'cursor': cursor} if cursor else {}))
+        response = client.get('/api/v1/measurements', query_string=args)
+        assert response.status_code == 200, response.get_json()
+        body = response.get_json()
+        data += body['data']
+        pages += 1
+        cursor = body['next_cursor']
+        assert ('Link' in response.headers) == (cursor is not None)
+        if cursor is None:
+            return data, pages
+
+
+def test_raw_pages_match_ordered_query(client, temp_db):
+    data, pages = fetch_all(client, start=START, end=END, resolution='raw', limit=7, fields='temperature,humidity')
+    assert pages > 3 * 24 * 6 / 7
+
+    conn = sqlite3.connect(temp_db)
+    expected = []
+    for table_name in sorted(database.get_tables_for_timerange(conn.cursor(), START, END)):
+        expected += conn.execute(
+            f'SELECT timestamp, temperature, humidity FROM {table_name} ORDER BY timestamp, rowid'
+        ).fetchall()
+    conn.close()
+    assert [(row['timestamp'], row['temperature'], row['humidity']) for row in data] == expected
+
+
+def test_raw_page_keeps_duplicate_timestamps_together(client):
+    # limit=1 op een uur: de tweede rij met dezelfde timestamp komt op dezelfde pagina
+    response = client.get('/api/v1/measurements', query_string={'start': START, 'end': END, 'resolution': 'raw', 'limit': 1})
+    body = response.get_json()
+    assert [row['timestamp'] for row in body['data']] == [START, START]
+    assert api.decode_cursor(body['next_cursor'], 'after') == START
+
+
+def test_cursor_roundtrip_and_validation(client):
+    assert api.decode_cursor(api.encode_cursor('after', START), 'after') == START
+    base = {'start': START, 'end': END, 'resolution': 'raw'}
+    for cursor in ('not-base64!', api.encode_cursor('from', START), api.encode_cursor('after', END + 10)):
+        response = client.get('/api/v1/measurements', query_string=dict(base, cursor=cursor))
+        assert response.status_code == 400
+        assert 'error' in response.get_json()
+
+
+@pytest.mark.parametrize('query', [
+    {'start': 'inf'},
+    {'end': '1e400'},
+    {'start': 'nan'},
+    {'end': '1e15'},
+    {'start': '-1e15', 'end': '0'},
+    {'start': 'yesterday'},
+    {'resolution': '400d'},
+    {'resolution': '0'},
+    {'limit': 'ten'},
+])
+def test_invalid_parameters_return_400(client, query):
+    response = client.get('/api/v1/measurements', query_string=query)
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+
+
+def test_bucket_pages_match_single_page(client):
+    query = {'start': START, 'end': END, 'resolution': '1h'}
+    single = client.get('/api/v1/measurements', query_string=query).get_json()
+    assert single['next_cursor'] is None
+    assert len(single['data']) == 72
+
+    paged, pages = fetch_all(client, limit=5, **query)
+    assert pages == 15
+    assert paged == single['data']
+    assert sum(bucket['count'] for bucket in paged) == len(make_rows())
+
+
+def test_etag_gives_304_and_closed_window_is_cacheable(client):
+    query = {'start': START, 'end': END, 'resolution': 'raw', 'limit': 10}
+    response = client.get('/api/v1/measurements', query_string=query)
+    assert response.headers['Cache-Control'].startswith('public')
+    etag = response.headers['ETag']
+
+    cached = client.get('/api/v1/measurements', query_string=query, headers={'If-None-Match': etag})
+    assert cached.status_code == 304
+    other = client.get('/api/v1/measurements', query_string=dict(query, limit=11), headers={'If-None-Match': etag})
+    assert other.status_code == 200
+
+
+def test_api_does_not_load_the_ui():
+    """Machine clients lopen niet via de Dash callbacks (eigen proces: de andere tests importeren ze wel)"""
+    code = "import sys, api; sys.exit(int('callbacks' in sys.modules or 'dash' in sys.modules))"
+    subprocess.run([sys.executable, '-c', code], cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                   check=True)
@@ -0,0 +1,91 @@
+"""Compactie van dagtabellen tot maandtabellen: geen meting mag verloren gaan"""
+import sqlite3
+from datetime import datetime
+import pytest
+import database
+
+COLUMNS = ['timestamp', 'temperature', 'humidity', 'dewpoint', 'absolute_humidity']
+
+
+def day_rows(day, count=96):
+    """Elk kwartier een meting op een (lokale) dag, ook een dubbele timestamp"""
+    start = int(day.timestamp())
+    rows = [(start + i * 900, 20 + i / 100, 50 + i / 10, 10.0, 8.0) for i in range(count)]
+    return rows + [rows[-1]]
+
+
+def tables(db_file):
+    conn = sqlite3.connect(db_file)
+    names = database.get_all_measurement_tables(conn.cursor())
+    conn.close()
+    return names
+
+
+def read_all(db_file):
+    conn = sqlite3.connect(db_file)
+    query, _ = database.build_union_query(conn.cursor(), COLUMNS, order_by='timestamp, temperature')
+    rows = conn.execute(query).fetchall()
+    conn.close()
+    return rows
+
+
+@pytest.fixture
+def compaction(temp_db, monkeypatch):
+    monkeypatch.setattr(database, 'PARTITION_COMPACTION', True)
+    return temp_db
+
+
+def test_closed_month_is_compacted_and_current_month_untouched(compaction, insert_rows):
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    june = [datetime(today.year - 1, 6, day) for day in (1, 2, 30)]
+    current = [today.replace(day=1), today]
+    insert_rows(compaction, [row for day in june + current for row in day_rows(day)])
+    month_table = database.get_month_table_name(june[0])
+    current_tables = sorted({database.get_table_name(day) for day in current})
+    before = read_all(compaction)
+
+    assert database.compact_closed_months() == 3
+    assert tables(compaction) == [month_table] + current_tables
+    assert read_all(compaction) == before
+
+    conn = sqlite3.connect(compaction)
+    # Gesorteerd gekopieerd en geïndexeerd
+    timestamps = [row[0] for row in conn.execute(f'SELECT timestamp FROM {month_table} ORDER BY rowid')]
+    assert timestamps == sorted(timestamps) and len(timestamps) == 3 * 97
+    assert conn.execute(f"SELECT COUNT(*) FROM sqlite_master WHERE type = 'index' AND tbl_name = '{month_table}'").fetchone()[0] == 1
+    conn.close()
+
+    # Niets meer te doen: de lopende maand blijft in dagen
+    assert database.compact_closed_months() == 0
+    assert tables(compaction) == [month_table] + current_tables
+
+
+def test_late_days_are_appended_to_existing_month(compaction, insert_rows):
+    insert_rows(compaction, day_rows(datetime(2025, 3, 10)) + day_rows(datetime(2025, 3, 12)))
+    assert database.compact_closed_months() == 2
+
+    # Nagekomen dag (bijv. een teruggezette backup), ook met een timestamp die al in de maand staat
+    insert_rows(compaction, day_rows(datetime(2025, 3, 11)) + [day_rows(datetime(2025, 3, 12))[0]])
+    before = read_all(compaction)
+    assert tables(compaction) == ['measurements_202503', 'measurements_20250311', 'measurements_20250312']
+
+    assert database.compact_closed_months() == 2
+    assert tables(compaction) == ['measurements_202503']
+    assert read_all(compaction) == before
+    assert len(before) == 3 * 97 + 1
+
+
+def test_failed_copy_keeps_day_tables(compaction, insert_rows):
+    insert_rows(compaction, day_rows(datetime(2025, 3, 10)))
+    before = read_all(compaction)
+    conn = sqlite3.connect(compaction)
+    database.ensure_table_exists(conn.cursor(), 'measurements_202503')
+    # Een rij die onderweg verdwijnt: het aantal in de maand klopt niet, dus geen DROP
+    conn.execute('CREATE TRIGGER lose_row AFTER INSERT ON measurements_202503 WHEN NEW.temperature = 20 '
+                 'BEGIN DELETE FROM measurements_202503 WHERE rowid = NEW.rowid; END')
+    conn.commit()
+    conn.close()
+
+    assert database.compact_closed_months() == 0
+    assert tables(compaction) == ['measurements_202503', 'measurements_20250310']
+    assert read_all(compaction) == before
@@ -0,0 +1,114 @@
+"""Deadband en swinging door: de reconstructie blijft binnen de afwijking, flush sluit de reeks af"""
+import numpy as np
+import pandas as pd
+import pytest
+from compression import (COMPRESSED_COLUMNS, COMPRESSION_MAX_INTERVAL, EPSILON, MEASUREMENT_COLUMNS,
+                         DeadbandCompressor, SwingingDoorCompressor, _complete_row, reconstruct_series)
+
+START = 1_700_000_000
+# Projectie wordt op 3 decimalen afgerond
+ROUNDING = 0.0005 + EPSILON
+
+
+def make_samples(count=4 * 3600, seed=1):
+    """1 Hz metingen op register resolutie: langzame golf plus ruis"""
+    rng = np.random.default_rng(seed)
+    t = np.arange(count)
+    temperature = np.round(21 + 1.5 * np.sin(t / 2000) + rng.normal(0, 0.03, count), 1)
+    humidity = np.round(50 + 8 * np.sin(t / 3000 + 1) + rng.normal(0, 0.2, count), 1)
+    return [_complete_row([START + int(i), float(temp), float(rh), 0.0, 0.0])
+            for i, temp, rh in zip(t, temperature, humidity)]
+
+
+def compress(compressor, samples):
+    stored = [row for sample in samples for row in compressor.offer(tuple(sample))]
+    return stored + compressor.flush()
+
+
+def test_deadband_step_reconstruction_within_deviation():
+    samples = make_samples()
+    stored = compress(DeadbandCompressor(COMPRESSED_COLUMNS, COMPRESSION_MAX_INTERVAL), samples)
+    assert len(stored) < len(samples) / 2
+
+    timestamps = np.array([row[0] for row in stored])
+    for index, deviation in COMPRESSED_COLUMNS.items():
+        raw = np.array([sample[index] for sample in samples])
+        values = np.array([row[index] for row in stored])
+        # Trap: de laatst bewaarde waarde geldt tot de volgende
+        reconstructed = values[np.searchsorted(timestamps, [sample[0] for sample in samples], side='right') - 1]
+        assert np.abs(raw - reconstructed).max() <= deviation + EPSILON
+    assert np.diff(timestamps).max() <= COMPRESSION_MAX_INTERVAL
+
+
+def test_swinging_door_linear_reconstruction_within_deviation():
+    samples = make_samples()
+    stored = compress(SwingingDoorCompressor(COMPRESSED_COLUMNS, COMPRESSION_MAX_INTERVAL, _complete_row), samples)
+    assert len(stored) < len(samples) / 5
+
+    timestamps = np.array([row[0] for row in stored])
+    assert stored[0][0] == samples[0][0] and stored[-1][0] == samples[-1][0]
+    assert np.diff(timestamps).min() > 0
+    assert np.diff(timestamps).max() <= COMPRESSION_MAX_INTERVAL + 1
+    for index, deviation in COMPRESSED_COLUMNS.items():
+        raw = np.array([sample[index] for sample in samples])
+        reconstructed = np.interp([sample[0] for sample in samples], timestamps, [row[index] for row in stored])
+        assert np.abs(raw - reconstructed).max() <= deviation + ROUNDING
+
+
+def test_swinging_door_recomputes_derived_columns():
+    samples = make_samples(count=900)
+    for row in compress(SwingingDoorCompressor(COMPRESSED_COLUMNS, COMPRESSION_MAX_INTERVAL, _complete_row), samples):
+        assert tuple(row) == tuple(_complete_row(list(row)))
+
+
+def test_swinging_door_flush_stores_held_point_and_restarts():
+    compressor = SwingingDoorCompressor(COMPRESSED_COLUMNS, COMPRESSION_MAX_INTERVAL)
+    ramp = [(START + i, 20 + 0.01 * i, 50.0, 0.0, 0.0) for i in range(120)]
+    stored = [row for sample in ramp for row in compressor.offer(sample)]
+    assert [row[0] for row in stored] == [START]
+
+    flushed = compressor.flush()
+    assert [row[0] for row in flushed] == [ramp[-1][0]]
+    assert flushed[0][1] == pytest.approx(ramp[-1][1], abs=0.1)
+    assert compressor.flush() == []
+    # Nieuwe reeks (bijv. de eerste meting van de volgende dag) wordt direct bewaard
+    next_sample = (START + 200, 21.0, 50.0, 0.0, 0.0)
+    assert compressor.offer(next_sample) == [next_sample]
+
+
+def test_deadband_flush_stores_last_unstored_sample():
+    compressor = DeadbandCompressor(COMPRESSED_COLUMNS, COMPRESSION_MAX_INTERVAL)
+    samples = [(START + i, 20.0, 50.0, 0.0, 0.0) for i in range(10)]
+    assert [row for sample in samples for row in compressor.offer(sample)] == [samples[0]]
+    assert compressor.flush() == [samples[-1]]
+    assert compressor.flush() == []
+    assert compressor.offer(samples[-1]) == [samples[-1]]
+
+
+def frame(rows):
+    return pd.DataFrame(rows, columns=list(MEASUREMENT_COLUMNS))
+
+
+def test_reconstruct_series_interpolates_start_and_ends_at_latest_sample():
+    previous = (START, 20.0, 50.0, 10.0, 9.0)
+    df = frame([(START + 100, 21.0, 52.0, 11.0, 9.5), (START + 200, 22.0, 54.0, 12.0, 10.0)])
+    latest = (START + 350, 23.5, 57.0, 13.5, 10.75)
+    result = reconstruct_series(df, previous, START + 50, START + 400, mode='swinging_door', latest=latest)
+
+    assert result['timestamp'].tolist() == [START + 50, START + 100, START + 200, START + 350]
+    assert result.iloc[0]['temperature'] == pytest.approx(20.5)
+    assert tuple(result.iloc[-1]) == pytest.approx(latest)
+
+
+def test_reconstruct_series_without_latest_follows_last_slope():
+    df = frame([(START, 20.0, 50.0, 10.0, 9.0), (START + 100, 21.0, 50.0, 10.0, 9.0)])
+    result = reconstruct_series(df, None, START, START + 150, mode='swinging_door')
+    assert result['timestamp'].tolist()[-1] == START + 150
+    assert result.iloc[-1]['temperature'] == pytest.approx(21.5)
+
+
+def test_reconstruct_series_deadband_tail_bounded_by_heartbeat():
+    df = frame([(START, 20.0, 50.0, 10.0, 9.0)])
+    result = reconstruct_series(df, None, START, START + 10 * COMPRESSION_MAX_INTERVAL, mode='deadband')
+    assert result['timestamp'].tolist() == [START, START + COMPRESSION_MAX_INTERVAL]
+    assert result['temperature'].tolist() == [20.0, 20.0]
@@ -0,0 +1,62 @@
+"""Lookup tabellen voor afgeleide grootheden tegen de exacte formules (zie modbus_reader, README)"""
+import math
+import numpy as np
+import pytest
+from derived import absolute_humidity, comfort_score, dewpoint, humidex
+
+# Alle temperaturen op register resolutie, luchtvochtigheid in stappen van 0.5
+TEMPERATURES, HUMIDITIES = np.meshgrid(np.arange(-500, 1001) / 10, np.arange(0, 201) / 2)
+TEMPERATURES, HUMIDITIES = TEMPERATURES.ravel(), HUMIDITIES.ravel()
+
+
+def exact_absolute_humidity(temperature, humidity):
+    return (6.112 * math.exp((17.67 * temperature) / (temperature + 243.5)) * humidity * 2.1674) / (273.15 + temperature)
+
+
+def exact_humidex(temperature, humidity):
+    dewpoint_kelvin = temperature - (100 - humidity) / 5 + 273.15
+    e = 6.11 * math.exp(5417.7530 * ((1 / 273.16) - (1 / dewpoint_kelvin)))
+    return temperature + 0.5555 * (e - 10)
+
+
+def test_absolute_humidity_matches_formula_over_sensor_range():
+    expected = np.array([exact_absolute_humidity(t, rh) for t, rh in zip(TEMPERATURES, HUMIDITIES)])
+    np.testing.assert_allclose(absolute_humidity(TEMPERATURES, HUMIDITIES), expected, rtol=1e-12, atol=1e-12)
+
+
+def test_humidex_matches_formula_over_sensor_range():
+    expected = np.array([exact_humidex(t, rh) for t, rh in zip(TEMPERATURES, HUMIDITIES)])
+    np.testing.assert_allclose(humidex(TEMPERATURES, HUMIDITIES), expected, rtol=1e-12, atol=1e-9)
+
+
+@pytest.mark.parametrize('temperature, humidity', [(21.3, 47.5), (-12.4, 88.0), (35.0, 60.1), (0.0, 0.0)])
+def test_scalar_path_equals_array_path(temperature, humidity):
+    assert absolute_humidity(temperature, humidity) == pytest.approx(
+        absolute_humidity(np.array([temperature]), np.array([humidity]))[0], rel=1e-12)
+    assert humidex(temperature, humidity) == pytest.approx(humidex(np.array([temperature]), np.array([humidity]))[0], rel=1e-12)
+    assert dewpoint(temperature, humidity) == pytest.approx(temperature - (100 - humidity) / 5)
+
+
+def test_inputs_round_to_register_resolution():
+    assert humidex(21.04, 50.03) == humidex(21.0, 50.0)
+    assert absolute_humidity(21.04, 50.0) == pytest.approx(exact_absolute_humidity(21.0, 50.0))
+
+
+def test_out_of_range_and_nan_give_nan():
+    assert math.isnan(absolute_humidity(100.1, 50.0))
+    assert math.isnan(humidex(20.0, 100.1))
+    assert math.isnan(humidex(float('nan'), 50.0))
+    values = humidex(np.array([20.0, -50.1, np.nan]), np.array([50.0, 50.0, 50.0]))
+    assert not math.isnan(values[0]) and np.isnan(values[1:]).all()
+
+
+def test_comfort_score_follows_humidex_scale():
+    # Zelfde indeling als get_comfort_level: <20 0, <27 4, <30 5, <35 6, <40 3, <46 2, <54 1, anders 0
+    temperatures = np.arange(0, 601) / 10
+    humidities = np.full_like(temperatures, 60.0)
+    values = humidex(temperatures, humidities)
+    expected = np.select([values < 20, values < 27, values < 30, values < 35, values < 40, values < 46, values < 54],
+                         [0, 4, 5, 6, 3, 2, 1], 0)
+    np.testing.assert_array_equal(comfort_score(temperatures, humidities), expected)
+    assert comfort_score(25.0, 60.0) == expected[250]
+    assert math.isnan(comfort_score(float('nan'), 50.0))
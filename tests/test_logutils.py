@@ -0,0 +1,49 @@
+"""RateLimitFilter: per (logger, template) hooguit limit berichten per interval, en de telling van wat wegviel"""
+import logging
+import pytest
+import logutils
+from logutils import RateLimitFilter, TextFormatter
+
+
+def record(message, *args, name='modbus_reader'):
+    return logging.LogRecord(name, logging.ERROR, __file__, 1, message, args, None)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(logutils.time, 'monotonic', lambda: now[0])
+    return now
+
+
+def test_suppressed_count_reported_on_next_window(clock):
+    rate_limit = RateLimitFilter(limit=3, interval=60)
+    passed = [rate_limit.filter(record("Modbus fout (%s): %s", 'timeout', i)) for i in range(10)]
+    assert passed == [True] * 3 + [False] * 7
+
+    clock[0] += 59
+    assert not rate_limit.filter(record("Modbus fout (%s): %s", 'timeout', 10))
+    clock[0] += 1
+    next_record = record("Modbus fout (%s): %s", 'timeout', 11)
+    assert rate_limit.filter(next_record)
+    assert next_record.suppressed == 8
+    assert TextFormatter('%(message)s').format(next_record) == \
+        'Modbus fout (timeout): 11 (8 vergelijkbare berichten onderdrukt)'
+
+    # Zonder onderdrukte berichten in het vorige venster geen telling
+    clock[0] += 60
+    quiet = record("Modbus fout (%s): %s", 'timeout', 12)
+    assert rate_limit.filter(quiet) and not hasattr(quiet, 'suppressed')
+
+
+def test_limit_is_per_logger_and_template(clock):
+    rate_limit = RateLimitFilter(limit=1, interval=60)
+    assert rate_limit.filter(record("Modbus fout (%s): %s", 'timeout', 1))
+    assert not rate_limit.filter(record("Modbus fout (%s): %s", 'crc', 2))
+    assert rate_limit.filter(record("Buffer niet opgeslagen: %s", 'locked'))
+    assert rate_limit.filter(record("Modbus fout (%s): %s", 'timeout', 1, name='alerts'))
+
+
+def test_zero_limit_lets_everything_through(clock):
+    rate_limit = RateLimitFilter(limit=0)
+    assert all(rate_limit.filter(record("Modbus fout (%s): %s", 'timeout', i)) for i in range(100))
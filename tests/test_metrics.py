@@ -0,0 +1,63 @@
+"""Metrics registry: summaries, Prometheus tekst en de gedeelde queue van background processen"""
+from collections import deque
+import pytest
+from metrics import METRIC_PREFIX, MetricsRegistry
+
+
+@pytest.fixture
+def registry():
+    registry = MetricsRegistry(window=10)
+    registry.describe('db_query_seconds', 'summary', 'Duur van een database query in seconden')
+    registry.describe('alerts_notifications_total', 'counter', 'Verstuurde alert meldingen')
+    return registry
+
+
+def test_summary_keeps_window_but_counts_everything(registry):
+    for value in range(1, 101):
+        registry.observe('db_query_seconds', value, source='graph')
+    series = registry.snapshot()['db_query_seconds']['series']
+    assert series == [{'labels': {'source': 'graph'}, 'count': 100, 'sum': 5050.0,
+                       'p50': 95.5, 'p95': 99.55, 'p99': 99.91, 'max': 100.0}]
+
+
+def test_to_prometheus_exposition_format(registry):
+    registry.observe('db_query_seconds', 0.25, source='api')
+    registry.inc('alerts_notifications_total', rule='temperature>28', state='alert')
+    registry.inc('alerts_notifications_total', 2, rule='temperature>28', state='alert')
+    registry.set('buffer_depth', 7, device='say "hi"\n')
+
+    name = f'{METRIC_PREFIX}db_query_seconds'
+    counter = f'{METRIC_PREFIX}alerts_notifications_total'
+    lines = registry.to_prometheus().splitlines()
+    assert lines[:7] == [
+        f'# HELP {name} Duur van een database query in seconden',
+        f'# TYPE {name} summary',
+        f'{name}{{source="api",quantile="0.5"}} 0.25',
+        f'{name}{{source="api",quantile="0.95"}} 0.25',
+        f'{name}{{source="api",quantile="0.99"}} 0.25',
+        f'{name}_sum{{source="api"}} 0.25',
+        f'{name}_count{{source="api"}} 1',
+    ]
+    assert f'# TYPE {counter} counter' in lines
+    assert f'{counter}{{rule="temperature>28",state="alert"}} 3' in lines
+    # Niet beschreven metric: type uit de actie, labels ge-escaped
+    assert f'# TYPE {METRIC_PREFIX}buffer_depth gauge' in lines
+    assert f'{METRIC_PREFIX}buffer_depth{{device="say \\"hi\\"\\n"}} 7' in lines
+    assert registry.to_prometheus(prefix='alerts_').startswith(f'# HELP {counter} ')
+
+
+def test_child_process_records_go_through_shared_queue(registry):
+    registry.shared = deque()
+    parent = registry._pid
+    registry._pid = parent + 1  # Zoals een background callback proces: andere pid dan de registry
+    registry.observe('db_query_seconds', 0.5, source='background')
+    registry.inc('alerts_notifications_total', rule='humidity<30', state='alert')
+    registry._pid = parent
+
+    # Pas bij het uitlezen in het hoofdproces verwerkt
+    assert len(registry.shared) == 2
+    assert registry._metrics['db_query_seconds']['series'] == {}
+    snapshot = registry.snapshot()
+    assert not registry.shared
+    assert snapshot['db_query_seconds']['series'][0]['count'] == 1
+    assert snapshot['alerts_notifications_total']['series'][0]['value'] == 1
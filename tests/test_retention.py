@@ -0,0 +1,119 @@
+"""Tiered retentie: uuraggregaten blijven gelijk als ruwe data en de 1m tier verlopen
+
+75 dagen metingen met RETENTION_TIERS=raw:30,1m:60,1h:0. Elke 10 s in plaats van 1 Hz, zodat de
+test snel blijft; de rollups en de retentie werken per bucket en per partitie, niet per meting.
+"""
+import sqlite3
+import time
+import numpy as np
+import pytest
+import database
+
+DAY = 86400
+RETENTION = 'raw:30,1m:60,1h:0'
+INTERVAL = 10
+NOW = int(time.time())
+FIRST = NOW - 75 * DAY
+# Eerste rollup: de klok staat op LATE, de laatste batch (LATE_BATCH seconden) is nog niet geschreven
+LATE = NOW - 3 * DAY + 1234
+LATE_BATCH = 200
+# (bucket seconden, start, end): alles per uur, per 5 minuten uit de 1m tier, en vensters die niet op een
+# tier bucket beginnen of eindigen (de ruwe data bestaat daar nog, dus de buckets zijn geknipt)
+WINDOWS = [
+    (3600, database._align_to_bucket(FIRST, 3600), NOW),
+    (300, database._align_to_bucket(NOW - 55 * DAY, 300), NOW),
+    (3600, NOW - 10 * DAY + 1234, NOW - 5 * DAY + 777),
+    (300, NOW - 20 * DAY + 17, NOW - 2 * DAY - 17),
+]
+
+
+def make_rows():
+    timestamps = np.arange(FIRST, NOW, INTERVAL)
+    t = timestamps - FIRST
+    temperature = np.round(21 + 2 * np.sin(t / 40000) + 0.5 * np.sin(t / 700), 1)
+    humidity = np.round(50 + 10 * np.sin(t / 90000 + 1) + np.sin(t / 500), 1)
+    dewpoint = np.round(temperature - (100 - humidity) / 5, 2)
+    absolute_humidity = np.round(humidity / 5, 2)
+    return list(zip(timestamps.tolist(), temperature.tolist(), humidity.tolist(), dewpoint.tolist(),
+                    absolute_humidity.tolist()))
+
+
+def read_buckets(db_file, bucket_seconds, start, end):
+    conn = sqlite3.connect(db_file)
+    cursor = conn.cursor()
+    query, _ = database.build_bucket_query(cursor, database.ROLLUP_COLUMNS, bucket_seconds, start, end)
+    rows = cursor.execute(query).fetchall()
+    conn.close()
+    return rows
+
+
+def assert_same_buckets(before, after):
+    assert [row[:2] for row in after] == [row[:2] for row in before]  # bucket, count
+    for expected, actual in zip(before, after):
+        assert actual[2:] == pytest.approx(expected[2:], abs=1e-9)
+
+
+def test_aggregates_survive_tiered_cleanup(temp_db, insert_rows, monkeypatch):
+    raw_days, tiers = database._parse_retention_tiers(RETENTION)
+    monkeypatch.setattr(database, 'RETENTION_TIERS', tiers)
+    monkeypatch.setattr(database, 'DATA_RETENTION_DAYS', raw_days)
+    rows = make_rows()
+
+    # Eerste rollup op tijdstip LATE, de laatste batch komt pas daarna binnen
+    insert_rows(temp_db, [row for row in rows if row[0] < LATE - LATE_BATCH])
+    with monkeypatch.context() as clock:
+        clock.setattr(database.time, 'time', lambda: LATE)
+        assert database.rollup_partitions() > 0
+    conn = sqlite3.connect(temp_db)
+    watermarks = dict(conn.execute('SELECT bucket_seconds, rolled_until FROM rollup_state').fetchall())
+    conn.close()
+    assert watermarks[60] == database._align_to_bucket(LATE - database.CLOSED_PARTITION_GRACE, 60)
+    assert watermarks[3600] == database._align_to_bucket(watermarks[60], 3600)
+    assert watermarks[60] < LATE - LATE_BATCH
+
+    insert_rows(temp_db, [row for row in rows if row[0] >= LATE - LATE_BATCH])
+
+    # Referentie: dezelfde vensters uit alleen de ruwe partities
+    with monkeypatch.context() as raw_only:
+        raw_only.setattr(database, 'RETENTION_TIERS', [])
+        before = [read_buckets(temp_db, *window) for window in WINDOWS]
+    assert sum(row[1] for row in before[0]) == len(rows)
+
+    database.cleanup_old_data()
+
+    conn = sqlite3.connect(temp_db)
+    cursor = conn.cursor()
+    watermarks = dict(cursor.execute('SELECT bucket_seconds, rolled_until FROM rollup_state').fetchall())
+    assert NOW - database.CLOSED_PARTITION_GRACE - 60 < watermarks[60] <= time.time()
+    assert watermarks[60] == database._align_to_bucket(watermarks[60], 60)
+    assert watermarks[3600] == database._align_to_bucket(watermarks[60], 3600)
+    # Ruwe partities tot de cutoff zijn weg, de rest is compleet
+    raw_oldest = database._oldest_timestamp(cursor, None)
+    assert NOW - (raw_days + 1) * DAY <= raw_oldest <= time.time() - raw_days * DAY
+    assert sum(cursor.execute(f'SELECT COUNT(*) FROM {table_name}').fetchone()[0]
+               for table_name in database.get_all_measurement_tables(cursor)) == \
+        sum(1 for row in rows if row[0] >= raw_oldest)
+    # De 1m tier verliest alleen rijen ouder dan 60 dagen, de 1h tier houdt alles
+    minute_oldest = cursor.execute('SELECT MIN(timestamp) FROM rollup_60').fetchone()[0]
+    assert NOW - 60 * DAY <= minute_oldest <= time.time() - 60 * DAY + 60
+    hour_oldest, hour_count = cursor.execute('SELECT MIN(timestamp), SUM(n) FROM rollup_3600').fetchone()
+    assert hour_oldest == database._align_to_bucket(FIRST, 3600)
+    assert hour_count == sum(1 for row in rows if row[0] < watermarks[3600])
+    conn.close()
+
+    after = [read_buckets(temp_db, *window) for window in WINDOWS]
+    for expected, actual in zip(before, after):
+        assert_same_buckets(expected, actual)
+
+
+def test_partial_bucket_without_raw_data_counts_whole_tier_bucket(temp_db, insert_rows, monkeypatch):
+    """Is de ruwe data van een deels in het venster vallende tier bucket al weg, dan telt de hele tier bucket"""
+    raw_days, tiers = database._parse_retention_tiers(RETENTION)
+    monkeypatch.setattr(database, 'RETENTION_TIERS', tiers)
+    monkeypatch.setattr(database, 'DATA_RETENTION_DAYS', raw_days)
+    start = database._align_to_bucket(NOW - 45 * DAY, 3600) + 1800
+    insert_rows(temp_db, [row for row in make_rows() if row[0] >= start - 7200])
+    database.cleanup_old_data()
+
+    buckets = read_buckets(temp_db, 3600, start, start + 7200)
+    assert [row[1] for row in buckets] == [3600 // INTERVAL] * 3
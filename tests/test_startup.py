@@ -0,0 +1,82 @@
+"""StartupGate: health direct, de rest 503 met Retry-After tot de app klaar is"""
+import json
+import threading
+from startup import HEALTH_PATH, READY_PATH, RETRY_AFTER, StartupGate
+
+
+def call(gate, path, accept='*/*'):
+    """WSGI request -> (status, headers, body)"""
+    response = {}
+
+    def start_response(status, headers):
+        response['status'] = status
+        response['headers'] = dict(headers)
+
+    body = b''.join(gate({'PATH_INFO': path, 'HTTP_ACCEPT': accept}, start_response))
+    return response['status'], response['headers'], body
+
+
+def ready_app(environ, start_response):
+    start_response('200 OK', [('Content-Type', 'text/plain')])
+    return [b'dash']
+
+
+def test_gate_returns_503_until_ready():
+    release = threading.Event()
+    initialized = threading.Event()
+
+    def initializer(gate):
+        with gate.phase('database'):
+            release.wait(5)
+        gate.set_ready(ready_app)
+        initialized.set()
+
+    gate = StartupGate(initializer=initializer)
+    status, headers, body = call(gate, '/')
+    assert status.startswith('503')
+    assert headers['Retry-After'] == str(RETRY_AFTER)
+    assert headers['Cache-Control'] == 'no-store'
+    assert body == 'Wordt gestart...'.encode()
+    # Browsers krijgen een pagina die zichzelf ververst
+    status, headers, body = call(gate, '/', accept='text/html,application/xhtml+xml')
+    assert status.startswith('503') and headers['Content-Type'].startswith('text/html')
+    assert f'http-equiv="refresh" content="{RETRY_AFTER}"'.encode() in body
+
+    assert call(gate, HEALTH_PATH)[0] == '200 OK'
+    status, _, body = call(gate, READY_PATH)
+    assert status.startswith('503') and json.loads(body)['status'] == 'starting'
+
+    # De eerste request startte de initializer (waitress-serve app:server importeert alleen)
+    release.set()
+    assert initialized.wait(5)
+    assert call(gate, '/') == ('200 OK', {'Content-Type': 'text/plain'}, b'dash')
+    status, _, body = call(gate, READY_PATH)
+    assert status == '200 OK'
+    assert set(json.loads(body)['startup']) == {'database', 'ready'}
+
+
+def test_failed_startup_stays_503_with_error():
+    gate = StartupGate()
+    gate.set_failed(RuntimeError('geen database'))
+    status, headers, body = call(gate, '/')
+    assert status.startswith('503') and 'Retry-After' in headers
+    assert body == 'Opstarten mislukt, zie de log'.encode()
+    status, _, body = call(gate, READY_PATH)
+    assert json.loads(body)['status'] == 'failed' and json.loads(body)['error'] == 'geen database'
+
+
+def test_start_runs_initializer_once():
+    calls = []
+    done = threading.Event()
+
+    def initializer(gate):
+        calls.append(threading.current_thread().name)
+        done.set()
+
+    gate = StartupGate(initializer=initializer)
+    gate.start()
+    gate.start()
+    call(gate, HEALTH_PATH)
+    assert done.wait(5)
+    gate._init_thread.join(5)
+    assert calls == ['startup']
@@ -0,0 +1,67 @@
+"""Live stream: begrensde queue per client en een maximum aantal clients"""
+import json
+import pytest
+from flask import Flask
+import stream
+from stream import CLIENT_QUEUE_SIZE, SampleBroadcaster
+
+
+def sample(timestamp):
+    return {'timestamp': timestamp, 'temperature': 21.0, 'humidity': 50.0}
+
+
+def drain(client_queue):
+    messages = []
+    while not client_queue.empty():
+        messages.append(client_queue.get_nowait())
+    return [json.loads(message.split('data: ', 1)[1])['timestamp'] for message in messages]
+
+
+def test_slow_client_drops_oldest_messages():
+    broadcaster = SampleBroadcaster(max_clients=5, backlog_size=10)
+    slow, fast = broadcaster.subscribe(), broadcaster.subscribe()
+    for timestamp in range(CLIENT_QUEUE_SIZE + 5):
+        broadcaster.publish(sample(timestamp))
+        if timestamp == 2:
+            assert drain(fast) == [0, 1, 2]
+    assert drain(slow) == list(range(5, CLIENT_QUEUE_SIZE + 5))
+    assert drain(fast) == list(range(3, CLIENT_QUEUE_SIZE + 5))[-CLIENT_QUEUE_SIZE:]
+
+
+def test_new_client_gets_backlog_and_limit_is_enforced():
+    broadcaster = SampleBroadcaster(max_clients=2, backlog_size=3)
+    for timestamp in range(5):
+        broadcaster.publish(sample(timestamp))
+    first = broadcaster.subscribe()
+    assert drain(first) == [2, 3, 4]
+    second = broadcaster.subscribe()
+    assert broadcaster.subscribe() is None
+    broadcaster.unsubscribe(second)
+    assert broadcaster.client_count == 1
+    assert broadcaster.subscribe() is not None
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(stream, 'broadcaster', SampleBroadcaster(max_clients=1))
+    server = Flask(__name__)
+    stream.register_stream_routes(server)
+    return server.test_client()
+
+
+def test_stream_route_returns_503_when_full(client):
+    stream.publish_sample(1_700_000_000, 21.0, 50.0, 10.0, 9.2)
+    response = client.get('/stream', buffered=False)
+    assert response.status_code == 200
+    assert response.mimetype == 'text/event-stream'
+    chunks = response.response
+    assert next(chunks) == f'retry: {stream.RECONNECT_DELAY_MS}\n\n'.encode()
+    assert next(chunks).startswith(b'id: 1700000000\ndata: ')
+
+    full = client.get('/stream')
+    assert full.status_code == 503
+    assert full.headers['Retry-After'] == '30'
+
+    # Afgesloten client geeft zijn plek vrij
+    response.close()
+    assert stream.broadcaster.client_count == 0
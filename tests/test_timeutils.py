@@ -0,0 +1,50 @@
+"""DST-bewuste offset segmenten (TIMEZONE=Europe/Amsterdam, zie conftest)"""
+import sqlite3
+from datetime import datetime, timezone
+import numpy as np
+from timeutils import LOCAL_ZONE, get_offset_segments, local_timestamp_sql, to_local_epoch, to_local_epochs
+
+
+def utc(*args):
+    return int(datetime(*args, tzinfo=timezone.utc).timestamp())
+
+
+def reference_local(epoch):
+    return epoch + int(datetime.fromtimestamp(epoch, LOCAL_ZONE).utcoffset().total_seconds())
+
+
+def test_segments_split_exactly_at_dst_transitions():
+    segments = get_offset_segments(utc(2026, 1, 1), utc(2026, 12, 31))
+    assert segments == (
+        (utc(2026, 1, 1), 3600),
+        (utc(2026, 3, 29, 1), 7200),
+        (utc(2026, 10, 25, 1), 3600),
+    )
+
+
+def test_single_segment_without_transition():
+    assert get_offset_segments(utc(2026, 6, 1), utc(2026, 6, 30)) == ((utc(2026, 6, 1), 7200),)
+
+
+def test_to_local_epochs_matches_zoneinfo_around_transitions():
+    epochs = np.concatenate([
+        np.arange(utc(2026, 3, 28, 22), utc(2026, 3, 29, 4), 61),
+        np.arange(utc(2026, 10, 24, 22), utc(2026, 10, 25, 4), 61),
+    ])
+    expected = [reference_local(int(epoch)) for epoch in epochs]
+    assert to_local_epochs(epochs).tolist() == expected
+    assert [to_local_epoch(epoch) for epoch in epochs] == expected
+
+
+def test_to_local_epochs_empty():
+    assert len(to_local_epochs([])) == 0
+
+
+def test_local_timestamp_sql_matches_python():
+    start, end = utc(2026, 10, 24), utc(2026, 10, 26)
+    epochs = list(range(start, end, 397))
+    conn = sqlite3.connect(':memory:')
+    conn.execute('CREATE TABLE t (timestamp INTEGER)')
+    conn.executemany('INSERT INTO t VALUES (?)', [(epoch,) for epoch in epochs])
+    result = [row[0] for row in conn.execute(f'SELECT {local_timestamp_sql(start, end)} FROM t ORDER BY timestamp')]
+    assert result == to_local_epochs(epochs).tolist()
@@ -0,0 +1,97 @@
+import logging
+import os
+from datetime import datetime, timezone
+from functools import lru_cache
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+import numpy as np
+from dotenv import load_dotenv
+
+# Laad environment variabelen
+load_dotenv()
+logger = logging.getLogger(__name__)
+TIMEZONE = os.getenv('TIMEZONE', 'Europe/Amsterdam')
+
+try:
+    LOCAL_ZONE = ZoneInfo(TIMEZONE)
+except (ZoneInfoNotFoundError, ValueError):
+    logger.warning("Onbekende TIMEZONE '%s', gebruik UTC", TIMEZONE)
+    TIMEZONE = 'UTC'
+    LOCAL_ZONE = ZoneInfo('UTC')
+
+# Tijdzone overgangen (DST) vallen altijd op een kwartiergrens
+OFFSET_RESOLUTION = 900  # seconden
+# Tussen twee overgangen zit minstens enkele maanden, dus per venster van 30 dagen hooguit één
+TRANSITION_SCAN_STEP = 30 * 86400  # seconden
+
+# Lokale epoch = UTC epoch + offset; de grafieken tonen lokale epochs als 'UTC' (geen conversie in de browser)
+
+
+@lru_cache(maxsize=8192)
+def _offset_for_slot(slot):
+    return int(datetime.fromtimestamp(slot * OFFSET_RESOLUTION, LOCAL_ZONE).utcoffset().total_seconds())
+
+
+def utc_offset(epoch):
+    """UTC offset (seconden) van TIMEZONE op een UTC epoch"""
+    return _offset_for_slot(int(epoch) // OFFSET_RESOLUTION)
+
+
+@lru_cache(maxsize=1024)
+def get_offset_segments(start, end):
+    """Deel [start, end] op in segmenten met een constante offset: ((segment_start, offset), ...)"""
+    segments = [(start, utc_offset(start))]
+    position = start
+    while position < end:
+        next_position = min(position + TRANSITION_SCAN_STEP, end)
+        current_offset = segments[-1][1]
+        if utc_offset(next_position) != current_offset:
+            # Zoek het kwartier van de overgang (bisectie)
+            low, high = position // OFFSET_RESOLUTION, next_position // OFFSET_RESOLUTION
+            while high - low > 1:
+                middle = (low + high) // 2
+                if _offset_for_slot(middle) == current_offset:
+                    low = middle
+                else:
+                    high = middle
+            segments.append((high * OFFSET_RESOLUTION, _offset_for_slot(high)))
+        position = next_position
+    return tuple(segments)
+
+
+def to_local_epoch(epoch):
+    """UTC epoch seconden -> lokale epoch seconden"""
+    return int(epoch) + utc_offset(epoch)
+
+
+def to_local_epochs(epochs):
+    """UTC epoch seconden -> lokale epoch seconden (int64), gevectoriseerd per offset segment"""
+    epochs = np.asarray(epochs, dtype=np.int64)
+    if not len(epochs):
+        return epochs
+
+    segments = get_offset_segments(int(epochs.min()), int(epochs.max()))
+    if len(segments) == 1:
+        return epochs + segments[0][1]
+
+    starts = np.array([segment[0] for segment in segments], dtype=np.int64)
+    offsets = np.array([segment[1] for segment in segments], dtype=np.int64)
+    return epochs + offsets[np.searchsorted(starts, epochs, side='right') - 1]
+
+
+@lru_cache(maxsize=4096)
+def local_timestamp_sql(start, end, column='timestamp'):
+    """SQL expressie voor de lokale epoch van een kolom binnen [start, end] (vooraf berekend per partitie)"""
+    segments = get_offset_segments(start, end)
+    if len(segments) == 1:
+        return f'({column} + {segments[0][1]})'
+
+    cases = ' '.join(
+        f'WHEN {column} >= {segment_start} THEN {offset}'
+        for segment_start, offset in reversed(segments[1:])
+    )
+    return f'({column} + CASE {cases} ELSE {segments[0][1]} END)'
+
+
+def format_local_epoch(epoch, fmt='%d-%m-%Y %H:%M:%S'):
+    """Formatteer een lokale epoch (alleen aanroepen voor punten die echt getoond worden)"""
+    return datetime.fromtimestamp(int(epoch), timezone.utc).strftime(fmt)
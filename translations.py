@@ -20,6 +20,7 @@ TRANSLATIONS = {
         'time_period': '📅 Tijdsperiode:',
         'database': '📊 Database:',
         'measurements': 'metingen',
+        'loading': 'Laden',
         'last_1min': '⏱️ Laatste 1 minuut',
         'last_5min': '⏱️ Laatste 5 minuten',
         'last_15min': '⏱️ Laatste 15 minuten',
@@ -47,6 +48,9 @@ TRANSLATIONS = {
         'dry_bulb_temp': 'Droge bol temperatuur (°C)',
         'relative_humidity': 'Relatieve vochtigheid (%)',
         'comfort_zone': 'Comfortzone',
+        'enthalpy': 'Enthalpie (kJ/kg)',
+        'wet_bulb': 'Natte bol temperatuur',
+        'density_overlay': 'Verblijfsdichtheid',
         'historical_replay': 'Historische Data Analyse',
         'select_period': 'Selecteer periode:',
         'time_position': 'Tijdstip:',
@@ -78,6 +82,7 @@ TRANSLATIONS = {
         'time_period': '📅 Time Period:',
         'database': '📊 Database:',
         'measurements': 'measurements',
+        'loading': 'Loading',
         'last_1min': '⏱️ Last 1 minute',
         'last_5min': '⏱️ Last 5 minutes',
         'last_15min': '⏱️ Last 15 minutes',
@@ -105,6 +110,9 @@ TRANSLATIONS = {
         'dry_bulb_temp': 'Dry bulb temperature (°C)',
         'relative_humidity': 'Relative humidity (%)',
         'comfort_zone': 'Comfort zone',
+        'enthalpy': 'Enthalpy (kJ/kg)',
+        'wet_bulb': 'Wet bulb temperature',
+        'density_overlay': 'Time density',
         'historical_replay': 'Historical Data Analysis',
         'select_period': 'Select period:',
         'time_position': 'Time position:',
@@ -136,6 +144,7 @@ TRANSLATIONS = {
         'time_period': '📅 Zeitraum:',
         'database': '📊 Datenbank:',
         'measurements': 'Messungen',
+        'loading': 'Laden',
         'last_1min': '⏱️ Letzte 1 Minute',
         'last_5min': '⏱️ Letzte 5 Minuten',
         'last_15min': '⏱️ Letzte 15 Minuten',
@@ -163,6 +172,9 @@ TRANSLATIONS = {
         'dry_bulb_temp': 'Trockentemperatur (°C)',
         'relative_humidity': 'Relative Luftfeuchtigkeit (%)',
         'comfort_zone': 'Komfortzone',
+        'enthalpy': 'Enthalpie (kJ/kg)',
+        'wet_bulb': 'Feuchtkugeltemperatur',
+        'density_overlay': 'Aufenthaltsdichte',
         'historical_replay': 'Historische Datenanalyse',
         'select_period': 'Zeitraum wählen:',
         'time_position': 'Zeitpunkt:',
@@ -194,6 +206,7 @@ TRANSLATIONS = {
         'time_period': '📅 Période:',
         'database': '📊 Base de données:',
         'measurements': 'mesures',
+        'loading': 'Chargement',
         'last_1min': '⏱️ Dernière 1 minute',
         'last_5min': '⏱️ Dernières 5 minutes',
         'last_15min': '⏱️ Dernières 15 minutes',
@@ -221,6 +234,9 @@ TRANSLATIONS = {
         'dry_bulb_temp': 'Température sèche (°C)',
         'relative_humidity': 'Humidité relative (%)',
         'comfort_zone': 'Zone de confort',
+        'enthalpy': 'Enthalpie (kJ/kg)',
+        'wet_bulb': 'Température humide',
+        'density_overlay': 'Densité temporelle',
         'historical_replay': 'Analyse de données historiques',
         'select_period': 'Sélectionner période:',
         'time_position': 'Position temporelle:',
@@ -252,6 +268,7 @@ TRANSLATIONS = {
         'time_period': '📅 Período:',
         'database': '📊 Base de datos:',
         'measurements': 'mediciones',
+        'loading': 'Cargando',
         'last_1min': '⏱️ Último 1 minuto',
         'last_5min': '⏱️ Últimos 5 minutos',
         'last_15min': '⏱️ Últimos 15 minutos',
@@ -279,6 +296,9 @@ TRANSLATIONS = {
         'dry_bulb_temp': 'Temperatura de bulbo seco (°C)',
         'relative_humidity': 'Humedad relativa (%)',
         'comfort_zone': 'Zona de confort',
+        'enthalpy': 'Entalpía (kJ/kg)',
+        'wet_bulb': 'Temperatura de bulbo húmedo',
+        'density_overlay': 'Densidad temporal',
         'historical_replay': 'Análisis de datos históricos',
         'select_period': 'Seleccionar período:',
         'time_position': 'Posición temporal:',